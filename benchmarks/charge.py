@@ -0,0 +1,352 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import queue
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from utils.CalculateurDeScore import CalculateurDeScore
+from utils.Protocole import (Code, MODE_AUTO, MODE_CREER, MODE_REJOINDRE, RELANCE_NON, RELANCE_OUI, REPONSES,
+                             decoder, encoder)
+from utils.Simulation import StrategieGloutonne
+from utils.Tableau import Tableau
+from utils.Trames import encoder_trame, lire_trame_async
+
+# -------------------------------------------------------------------
+# Test de charge : combien de parties simultanées un serveur tient-il ?
+#
+# Le serveur est lancé en local (launch_server.py) puis des milliers de
+# joueurs automatiques s'y connectent par de vrais sockets et suivent le
+# même échange que le client (YahtzeeClient.gestion_prompt) : nom, mode
+# (création puis ralliement, ou appariement automatique), taille de
+# table, relances, figure. Ils jouent la stratégie gloutonne de
+# utils.Simulation.
+#
+# Les joueurs sont répartis sur plusieurs processus pilotes, chacun
+# menant les siens sur une boucle asyncio : le harnais ne doit pas être
+# le goulot d'étranglement (son propre temps CPU est rapporté).
+#
+# Mesures :
+# - parties terminées par seconde ;
+# - établissement de la connexion (jusqu'à la première question) ;
+# - latence question -> réponse du serveur : temps entre l'envoi d'une
+#   réponse et l'arrivée de la question suivante, pour les seules
+#   réponses après lesquelles le serveur n'attend pas d'autres joueurs
+#   (pas après la taille de table, le choix de la partie ou la figure) ;
+# - RSS et CPU du serveur (et de ses processus de jeu) au fil du test,
+#   lus dans /proc.
+#
+# Usage : python -m benchmarks.charge --joueurs 2000 --serveur asyncio
+# -------------------------------------------------------------------
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+POURCENTILES = (50, 95, 99)
+PAUSE_DEMARRAGE = 1.0  # Secondes laissées au serveur pour ouvrir son socket
+# Après ces réponses, la question suivante attend les autres joueurs : ce n'est pas une latence du serveur.
+REPONSES_ATTENDUES = {Code.DEMANDE_NB_JOUEURS, Code.DEMANDE_PARTIE, Code.DEMANDE_FIGURE}
+
+
+class Joueur:
+    # -------------------------------------------------------------------
+    # Joueur automatique : répond aux questions du serveur et note ses
+    # mesures.
+    #
+    # :param nom: Nom du joueur, unique sur le serveur.
+    # :param taille: Taille de table demandée.
+    # :param auto: True pour l'appariement automatique.
+    # :param createur: Nom du créateur de la table à rallier, None si ce
+    #                  joueur crée la sienne (ou s'il est apparié).
+    # :param table_creee: asyncio.Event levé quand la table est créée.
+    # :param reflexion: Temps de réflexion moyen avant chaque réponse.
+    # -------------------------------------------------------------------
+
+    strategie = StrategieGloutonne()
+
+    def __init__(self, nom, taille, auto, createur, table_creee, reflexion, generateur):
+        self.nom = nom
+        self.taille = taille
+        self.auto = auto
+        self.createur = createur
+        self.table_creee = table_creee
+        self.reflexion = reflexion
+        self.generateur = generateur
+        self.des = [1] * 5
+        self.garde = 0b11111
+        self.parties = []  # Identifiants des tables de la liste reçue
+
+    async def jouer(self, hote, port, mesures):
+        debut = time.perf_counter()
+        reader, writer = await asyncio.open_connection(hote, port)
+        try:
+            envoi, question = None, None
+            while True:
+                code, valeur = decoder(await lire_trame_async(reader))
+                arrivee = time.perf_counter()
+                if envoi is None:
+                    mesures['connexions'].append(arrivee - debut)
+                if code == Code.FIN_PARTIE:
+                    return True
+                if code == Code.ATTENTE and self.createur is None:
+                    self.table_creee.set()
+                if code not in REPONSES:
+                    self.noter(code, valeur)
+                    continue
+                if envoi is not None and question not in REPONSES_ATTENDUES:
+                    mesures['latences'].append(arrivee - envoi)
+                if self.reflexion:
+                    await asyncio.sleep(self.generateur.uniform(0, 2 * self.reflexion))
+                reponse = await self.repondre(code, valeur)
+                writer.write(encoder_trame(reponse))
+                envoi, question = time.perf_counter(), code
+        finally:
+            writer.close()
+            if self.createur is None:
+                self.table_creee.set()  # Même en échec : ses ralliés ne l'attendent pas indéfiniment
+
+    def noter(self, code, valeur):
+        if code == Code.DES:
+            self.des = valeur[1]
+        elif code == Code.LISTE_PARTIES:
+            self.parties = [resume[0] for resume in valeur if self.createur in resume[6]]
+
+    async def repondre(self, code, valeur):
+        if code == Code.DEMANDE_NOM:
+            return encoder(Code.NOM, self.nom)
+        if code == Code.DEMANDE_MODE:
+            if self.auto:
+                return encoder(Code.MODE, MODE_AUTO)
+            if self.createur is None:
+                return encoder(Code.MODE, MODE_CREER)
+            await self.table_creee.wait()
+            return encoder(Code.MODE, MODE_REJOINDRE)
+        if code == Code.DEMANDE_NB_JOUEURS:
+            return encoder(Code.NB_JOUEURS, self.taille)
+        if code == Code.DEMANDE_PARTIE:
+            if not self.parties:
+                raise ConnectionAbortedError(f"Table de {self.createur} introuvable")
+            return encoder(Code.CHOIX_PARTIE, self.parties.pop())
+        if code == Code.DEMANDE_RELANCE:
+            self.garde = self.strategie.garder(self.des, valeur, None)
+            return encoder(Code.RELANCE, RELANCE_NON if self.garde == 0b11111 else RELANCE_OUI)
+        if code == Code.DEMANDE_INDICES:
+            return encoder(Code.INDICES, ~self.garde & 0b11111)
+        disponibles = valeur[0]
+        scores = CalculateurDeScore.scores_for(self.des)
+        return encoder(Code.FIGURE, max((position for position in range(len(scores)) if disponibles >> position & 1),
+                                        key=scores.__getitem__))
+
+
+async def _piloter(indice, tables, options, compteur):
+    mesures = {'connexions': [], 'latences': []}
+    generateur = random.Random(indice)
+    taches = []
+    for numero in range(tables):
+        table_creee = asyncio.Event()
+        createur = f"p{indice}t{numero}j0"
+        for siege in range(options['taille']):
+            joueur = Joueur(f"p{indice}t{numero}j{siege}", options['taille'], options['auto'],
+                            None if siege == 0 else createur, table_creee, options['reflexion'], generateur)
+            taches.append(_jouer_apres(joueur, generateur.uniform(0, options['montee']), options, mesures, compteur))
+    resultats = await asyncio.gather(*taches, return_exceptions=True)
+    mesures['reussites'] = sum(resultat is True for resultat in resultats)
+    mesures['echecs'] = len(resultats) - mesures['reussites']
+    mesures['erreurs'] = sorted({repr(resultat) for resultat in resultats if isinstance(resultat, BaseException)})[:5]
+    return mesures
+
+
+async def _jouer_apres(joueur, attente, options, mesures, compteur):
+    await asyncio.sleep(attente)
+    try:
+        return await asyncio.wait_for(joueur.jouer(options['hote'], options['port'], mesures), options['delai'])
+    finally:
+        with compteur.get_lock():
+            compteur.value += 1
+
+
+def piloter(indice, tables, options, compteur, resultats):
+    # -------------------------------------------------------------------
+    # Processus pilote : joue ses tables sur sa boucle asyncio, puis
+    # renvoie ses mesures et son temps CPU.
+    # -------------------------------------------------------------------
+    mesures = asyncio.run(_piloter(indice, tables, options, compteur))
+    mesures['cpu'] = time.process_time()
+    resultats.put(mesures)
+
+
+def recueillir(pilotes, tables, taille, resultats, attente):
+    # -------------------------------------------------------------------
+    # Recueille les mesures des pilotes. Un pilote arrêté sans les avoir
+    # envoyées (exception, manque de mémoire) n'est pas attendu : ses
+    # joueurs comptent en échec.
+    #
+    # :param attente: Secondes entre deux vérifications des pilotes.
+    # -------------------------------------------------------------------
+    mesures = []
+    while True:
+        tombes = [(indice, pilote.exitcode) for indice, pilote in enumerate(pilotes)
+                  if pilote.exitcode not in (None, 0)]
+        if len(mesures) + len(tombes) >= len(pilotes):
+            break
+        try:
+            mesures.append(resultats.get(timeout=attente))
+        except queue.Empty:
+            pass
+    for indice, code in tombes:
+        joueurs = len(range(indice, tables, len(pilotes))) * taille
+        mesures.append({'connexions': [], 'latences': [], 'reussites': 0, 'echecs': joueurs, 'cpu': 0.0,
+                        'erreurs': [f"Pilote {indice} arrêté (code {code}) : ses {joueurs} joueurs sont en échec"]})
+    return mesures
+
+
+def _arbre_processus(racine):
+    # PID du serveur et de ses descendants (processus de jeu de --processus).
+    enfants = {}
+    for pid in os.listdir('/proc'):
+        if pid.isdigit():
+            try:
+                with open(f'/proc/{pid}/stat') as fichier:
+                    parent = int(fichier.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            enfants.setdefault(parent, []).append(int(pid))
+    arbre, a_voir = [], [racine]
+    while a_voir:
+        pid = a_voir.pop()
+        arbre.append(pid)
+        a_voir.extend(enfants.get(pid, ()))
+    return arbre
+
+
+def mesurer_processus(racine):
+    # -------------------------------------------------------------------
+    # :return: (RSS en octets, temps CPU en secondes) cumulés du serveur
+    #          et de ses descendants.
+    # -------------------------------------------------------------------
+    rss, cpu = 0, 0.0
+    for pid in _arbre_processus(racine):
+        try:
+            with open(f'/proc/{pid}/stat') as fichier:
+                champs = fichier.read().rsplit(')', 1)[1].split()
+            with open(f'/proc/{pid}/statm') as fichier:
+                rss += int(fichier.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, IndexError, ValueError):
+            continue
+        cpu += (int(champs[11]) + int(champs[12])) / os.sysconf('SC_CLK_TCK')  # utime + stime
+    return rss, cpu
+
+
+def pourcentile(valeurs_triees, pourcentage):
+    if not valeurs_triees:
+        return float('nan')
+    return valeurs_triees[min(len(valeurs_triees) - 1, len(valeurs_triees) * pourcentage // 100)]
+
+
+def lancer_serveur(arguments):
+    commande = [sys.executable, os.path.join(RACINE, 'launch_server.py'), '--graine', str(arguments.graine)]
+    if arguments.serveur == 'asyncio':
+        commande.append('--asyncio')
+    elif arguments.serveur == 'processus':
+        commande += ['--processus', str(arguments.processus_serveur)]
+    # La sortie du serveur (tableaux des scores) est écartée : ses écritures restent dans la mesure.
+    return subprocess.Popen(commande, cwd=RACINE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def rendre_rapport(mesures, echantillons, duree, tables, taille, cpu_harnais) -> str:
+    connexions = sorted(temps for mesure in mesures for temps in mesure['connexions'])
+    latences = sorted(temps for mesure in mesures for temps in mesure['latences'])
+    echecs = sum(mesure['echecs'] for mesure in mesures)
+    terminees = sum(mesure['reussites'] for mesure in mesures) / taille  # Parties jouées jusqu'au bout
+    lignes = [f"Parties : {terminees:.0f} terminées sur {tables} tables de {taille} joueurs en {duree:.1f} s, "
+              f"{terminees / duree:.1f} parties/s, {echecs} joueurs en échec"]
+    for mesure in mesures:
+        lignes.extend(f"  {erreur}" for erreur in mesure['erreurs'])
+    lignes.append(Tableau(["Mesure (ms)", "Échantillons", *(f"p{p}" for p in POURCENTILES), "max"],
+                          [(nom, len(valeurs), *(f"{pourcentile(valeurs, p) * 1000:.2f}" for p in POURCENTILES),
+                            f"{valeurs[-1] * 1000:.2f}" if valeurs else "-")
+                           for nom, valeurs in (("Connexion", connexions), ("Question", latences))]).afficher())
+    if echantillons:  # Le détail au fil du test est affiché pendant le test
+        lignes.append(f"Serveur : RSS max {max(e[2] for e in echantillons) / 1e6:.0f} Mo, "
+                      f"CPU moyen {sum(e[3] for e in echantillons) / len(echantillons):.0f} %")
+    lignes.append(f"Harnais : {cpu_harnais / duree:.0%} d'un cœur sur {len(mesures)} pilotes "
+                  f"({os.cpu_count()} cœurs)")
+    return "\n".join(lignes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge du serveur Yahtzee")
+    parser.add_argument('--joueurs', type=int, default=1000, help="Nombre de joueurs automatiques")
+    parser.add_argument('--taille', type=int, default=2, help="Joueurs par table")
+    parser.add_argument('--auto', action='store_true',
+                        help="Appariement automatique (A) au lieu de la création (C) puis du ralliement (R)")
+    parser.add_argument('--pilotes', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Processus pilotant les joueurs")
+    parser.add_argument('--montee', type=float, default=5.0,
+                        help="Secondes sur lesquelles les connexions sont étalées")
+    parser.add_argument('--reflexion', type=float, default=0.0,
+                        help="Temps de réflexion moyen d'un joueur avant chaque réponse, en secondes")
+    parser.add_argument('--delai', type=float, default=600.0,
+                        help="Secondes au-delà desquelles un joueur qui n'a pas fini sa partie est en échec")
+    parser.add_argument('--serveur', choices=('threads', 'asyncio', 'processus'), default='threads')
+    parser.add_argument('--processus-serveur', type=int, default=-1, metavar='N',
+                        help="Processus de jeu du serveur en mode processus (-1 : un par cœur)")
+    parser.add_argument('--graine', type=int, default=0, help="Graine des dés du serveur")
+    parser.add_argument('--externe', metavar='HOTE:PORT',
+                        help="Charge un serveur déjà lancé, sans mesurer sa mémoire ni son CPU")
+    parser.add_argument('--intervalle', type=float, default=1.0, help="Secondes entre deux relevés du serveur")
+    arguments = parser.parse_args()
+
+    tables = arguments.joueurs // arguments.taille
+    hote, port = arguments.externe.rsplit(':', 1) if arguments.externe else ('127.0.0.1', 65430)
+    options = {'hote': hote, 'port': int(port), 'taille': arguments.taille, 'auto': arguments.auto,
+               'montee': arguments.montee, 'reflexion': arguments.reflexion, 'delai': arguments.delai}
+    serveur = None if arguments.externe else lancer_serveur(arguments)
+    time.sleep(0 if serveur is None else PAUSE_DEMARRAGE)
+    if serveur is not None and serveur.poll() is not None:
+        parser.error(f"le serveur s'est arrêté au démarrage (code {serveur.returncode}) : port {port} déjà pris ?")
+
+    compteur = multiprocessing.Value('l', 0)  # Joueurs terminés ou en échec
+    resultats = multiprocessing.Queue()
+    pilotes = [multiprocessing.Process(target=piloter, args=(indice, len(range(indice, tables, arguments.pilotes)),
+                                                             options, compteur, resultats))
+               for indice in range(arguments.pilotes)]
+    echantillons, fini = [], threading.Event()
+
+    def relever():
+        precedent, instant_precedent = mesurer_processus(serveur.pid)[1], time.perf_counter()
+        while not fini.wait(arguments.intervalle):
+            rss, cpu = mesurer_processus(serveur.pid)
+            instant = time.perf_counter()
+            echantillons.append((instant - debut, compteur.value, rss,
+                                 100 * (cpu - precedent) / (instant - instant_precedent)))
+            precedent, instant_precedent = cpu, instant
+            print(f"{echantillons[-1][0]:6.0f} s  {compteur.value:>7} joueurs terminés  "
+                  f"RSS {rss / 1e6:6.0f} Mo  CPU {echantillons[-1][3]:4.0f} %", flush=True)
+
+    debut = time.perf_counter()
+    if serveur is not None:
+        threading.Thread(target=relever, daemon=True).start()
+    for pilote in pilotes:
+        pilote.start()
+    mesures = recueillir(pilotes, tables, arguments.taille, resultats, arguments.intervalle)
+    duree = time.perf_counter() - debut
+    fini.set()
+    for pilote in pilotes:
+        pilote.join()
+    if serveur is not None:
+        for pid in reversed(_arbre_processus(serveur.pid)):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        serveur.wait()
+    print(rendre_rapport(mesures, echantillons, duree, tables, arguments.taille,
+                         sum(mesure['cpu'] for mesure in mesures)))
+
+
+if __name__ == "__main__":
+    main()
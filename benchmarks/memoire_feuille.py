@@ -0,0 +1,68 @@
+import tracemalloc
+
+from utils.FeuilleScore import FeuilleScore
+
+# -------------------------------------------------------------------
+# Mesure la mémoire occupée par une feuille de score, avant et après
+# le passage à la représentation compacte (__slots__, masque, octets).
+#
+# La représentation « avant » reproduit l'ancienne FeuilleScore : deux
+# dictionnaires de 14 entrées indexés par le nom des figures, plus
+# l'entrée du joueur dans le dictionnaire `scores` de Partie.
+#
+# Usage : python -m benchmarks.memoire_feuille
+# -------------------------------------------------------------------
+
+NB_FEUILLES = 10000
+COUPS = [('1', 3), ('4', 12), ('Brelan', 22), ('Full', 25), ('Chance', 19)]  # Feuille à moitié remplie
+
+
+class FeuilleDictionnaire:
+    # Ancienne représentation, conservée ici comme point de comparaison.
+    def __init__(self):
+        self.scores = {figure: None for figure in ('1', '2', '3', '4', '5', '6', 'Brelan', 'Carré', 'Full',
+                                                   'Petite suite', 'Grande suite', 'Yahtzee', 'Chance')}
+        self.scores['Bonus Section Supérieure'] = 0
+        self.remplissage = {key: False for key in self.scores}
+
+    def noter_score(self, figure, valeur):
+        self.scores[figure] = valeur
+
+
+def octets_par_feuille(fabrique) -> float:
+    # -------------------------------------------------------------------
+    # Mémoire allouée par feuille, moyenne sur NB_FEUILLES feuilles.
+    #
+    # :param fabrique: Fonction sans argument créant une feuille remplie.
+    # :return: Nombre moyen d'octets par feuille.
+    # -------------------------------------------------------------------
+    tracemalloc.start()
+    avant = tracemalloc.get_traced_memory()[0]
+    feuilles = [fabrique() for _ in range(NB_FEUILLES)]
+    apres = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del feuilles
+    return (apres - avant) / NB_FEUILLES
+
+
+def _ancienne_feuille():
+    feuille = FeuilleDictionnaire()
+    for figure, valeur in COUPS:
+        feuille.noter_score(figure, valeur)
+    # Partie tenait en plus un total par joueur : {nom: somme}.
+    return feuille, {'joueur': sum(valeur for valeur in feuille.scores.values() if valeur is not None)}
+
+
+def _nouvelle_feuille():
+    feuille = FeuilleScore(verbeux=False)
+    for figure, valeur in COUPS:
+        feuille.noter_score(figure, valeur)
+    return feuille
+
+
+if __name__ == "__main__":
+    avant = octets_par_feuille(_ancienne_feuille)
+    apres = octets_par_feuille(_nouvelle_feuille)
+    print(f"Avant (dictionnaires) : {avant:.0f} octets par feuille")
+    print(f"Après (compacte)      : {apres:.0f} octets par feuille")
+    print(f"Gain                  : {1 - apres / avant:.0%}")
@@ -0,0 +1,223 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+import tracemalloc
+from collections import deque
+from itertools import starmap
+
+from utils.CalculateurDeScore import CalculateurDeScore, FIGURES, LANCERS
+from utils.FeuilleScore import FeuilleScore, _rendre_feuille
+from utils.Protocole import Code, decoder, encoder
+from utils.Tableau import Tableau, rendre_classement
+from utils.Trames import encoder_trame
+
+# -------------------------------------------------------------------
+# Microbenchmarks des fonctions chaudes du moteur : calcul des scores,
+# rendu des feuilles et des classements, encodage des messages.
+#
+# Chaque mesure appelle une fonction sur un lot d'arguments préparé à
+# l'avance (les 252 lancers, par exemple) et rapporte :
+# - les opérations par seconde (meilleur de plusieurs répétitions) ;
+# - la vitesse relative : opérations par seconde rapportées à celles
+#   d'une boucle étalon, chronométrée juste avant chaque répétition
+#   (médiane des répétitions). Elle dépend bien moins qu'une vitesse
+#   absolue de la machine et de sa charge du moment ;
+# - les octets alloués par opération (pic tracemalloc d'un appel, en
+#   moyenne sur le lot).
+#
+# Les résultats sont comparés à la référence versionnée
+# (reference_micro.json). Une mesure plus lente en vitesse relative au-delà
+# de SEUIL_VITESSE, ou qui alloue plus au-delà de SEUIL, est une
+# régression : le code de sortie vaut alors 1. Les allocations et les
+# vitesses relatives dépendent de la version de Python : avec une autre
+# version que celle de la référence, les écarts sont seulement indiqués.
+#
+# Usage : python -m benchmarks.micro [--filtre calculer] [--enregistrer]
+# -------------------------------------------------------------------
+
+REFERENCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reference_micro.json')
+SEUIL = 0.15  # Écart d'allocations toléré par rapport à la référence
+SEUIL_VITESSE = 0.35  # Baisse de vitesse relative tolérée (la médiane varie encore d'une exécution à l'autre)
+MARGE_OCTETS = 32  # Octets par opération tolérés en plus du seuil (arrondis de l'allocateur)
+REPETITIONS = 5
+DUREE_MIN = 0.2  # Secondes par répétition au moins
+COUPS = [('1', 3), ('4', 12), ('Brelan', 22), ('Full', 25), ('Chance', 19)]  # Feuille à moitié remplie
+
+
+def _feuille():
+    feuille = FeuilleScore(verbeux=False)
+    for figure, valeur in COUPS:
+        feuille.noter_score(figure, valeur)
+    return feuille
+
+
+def _joueurs(nombre):
+    return {f"joueur{numero}": 37 * numero % 300 for numero in range(nombre)}
+
+
+def _etalon(des):
+    # Boucle étalon : comptage des faces d'un lancer, du Python pur comme les fonctions mesurées.
+    faces = {}
+    for de in des:
+        faces[de] = faces.get(de, 0) + 1
+    return max(faces.values())
+
+
+ARGUMENTS_ETALON = [(list(lancer),) for lancer in LANCERS]
+
+
+def cas():
+    # -------------------------------------------------------------------
+    # :return: [(nom, fonction, arguments)] : chaque mesure appelle la
+    #          fonction sur chaque tuple d'arguments.
+    # -------------------------------------------------------------------
+    lancers = [(list(lancer),) for lancer in LANCERS]
+    feuille = _feuille()
+    etat_feuille = (feuille.masque, feuille.valeurs.tobytes(), feuille.bonus)
+    mesures = [(f"CalculateurDeScore.{nom}", getattr(CalculateurDeScore, nom), lancers)
+               for nom in sorted(vars(CalculateurDeScore)) if nom.startswith('calculer_') and nom != 'calculer_scores_lot']
+    mesures += [
+        ("FeuilleScore.calculer_score", feuille.calculer_score,
+         [(figure, des) for (des,) in lancers for figure in FIGURES]),
+        ("FeuilleScore.afficher_score", feuille.afficher_score, lancers),
+        ("FeuilleScore.afficher_score (hors mémo)", _rendre_feuille.__wrapped__,
+         [(*etat_feuille, indice) for indice in range(len(LANCERS))]),
+        ("Tableau.afficher", lambda lignes: Tableau(["Figure", "Score réalisé", "Score théorique"], lignes).afficher(),
+         [([(figure, valeur, valeur * 2) for figure, valeur in zip(FIGURES, range(decalage, decalage + 13))],)
+          for decalage in range(50)]),
+    ]
+    mesures += [(f"Partie.afficher_tableauScore ({nombre} joueurs)", rendre_classement, [(_joueurs(nombre),)] * 50)
+                for nombre in (2, 4, 8)]
+
+    messages = {
+        'DES': [(Code.DES, relance, des) for relance in range(3) for (des,) in lancers[::7]],
+        'FEUILLE': [(Code.FEUILLE, *etat_feuille)] * 50,
+        'CLASSEMENT': [(Code.CLASSEMENT, _joueurs(4).items())] * 50,
+        'INSTANTANE': [(Code.INSTANTANE, 12, 13, 1, 1, [3, 3, 5, 6, 6],
+                        [(nom, *etat_feuille) for nom in _joueurs(4)])] * 50,
+        'LISTE_PARTIES': [(Code.LISTE_PARTIES, [(numero, 1, 2, 0, 13, False, ['joueur0'])
+                                                for numero in range(50)])] * 10,
+    }
+    for nom, arguments in messages.items():
+        mesures.append((f"encoder {nom}", encoder, arguments))
+        mesures.append((f"decoder {nom}", decoder, [(encoder(*valeurs),) for valeurs in arguments]))
+    mesures.append(("encoder_trame", encoder_trame, [(encoder(*valeurs),) for valeurs in messages['DES']]))
+    return mesures
+
+
+def _minuteur(fonction, arguments):
+    # :return: (minuteur d'un passage sur le lot, passages par répétition).
+    minuteur = timeit.Timer(lambda: deque(starmap(fonction, arguments), maxlen=0))
+    nombre, _ = minuteur.autorange()
+    return minuteur, max(1, int(nombre * DUREE_MIN / 0.2))
+
+
+def chronometrer(fonction, arguments, repetitions=REPETITIONS) -> tuple[float, float]:
+    # -------------------------------------------------------------------
+    # :return: (opérations par seconde sur la meilleure répétition,
+    #          vitesse relative à la boucle étalon, médiane des
+    #          répétitions).
+    # -------------------------------------------------------------------
+    minuteur, nombre = _minuteur(fonction, arguments)
+    etalon, nombre_etalon = _minuteur(_etalon, ARGUMENTS_ETALON)
+    vitesses, relatives = [], []
+    for _ in range(repetitions):
+        vitesse_etalon = nombre_etalon * len(ARGUMENTS_ETALON) / etalon.timeit(nombre_etalon)
+        vitesses.append(nombre * len(arguments) / minuteur.timeit(nombre))
+        relatives.append(vitesses[-1] / vitesse_etalon)
+    return max(vitesses), statistics.median(relatives)
+
+
+def octets_par_operation(fonction, arguments) -> float:
+    # -------------------------------------------------------------------
+    # :return: Pic d'allocation moyen d'un appel, en octets (résultat
+    #          compris).
+    # -------------------------------------------------------------------
+    deque(starmap(fonction, arguments), maxlen=0)  # Caches remplis, comme en régime établi
+    tracemalloc.start()
+    total = 0
+    for valeurs in arguments:
+        tracemalloc.reset_peak()
+        avant = tracemalloc.get_traced_memory()[0]
+        fonction(*valeurs)
+        total += tracemalloc.get_traced_memory()[1] - avant
+    tracemalloc.stop()
+    return total / len(arguments)
+
+
+def comparer(resultat, reference, seuil, seuil_vitesse):
+    # -------------------------------------------------------------------
+    # :return: Motif de la régression, ou "" si la mesure est dans la
+    #          tolérance (ou absente de la référence).
+    # -------------------------------------------------------------------
+    if reference is None:
+        return ""
+    motifs = []
+    if resultat['relatif'] < reference['relatif'] * (1 - seuil_vitesse):
+        motifs.append("plus lent")
+    if resultat['octets_par_op'] > reference['octets_par_op'] * (1 + seuil) + MARGE_OCTETS:
+        motifs.append("plus d'allocations")
+    return ", ".join(motifs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks du moteur Yahtzee")
+    parser.add_argument('--filtre', default='', help="Ne lance que les mesures dont le nom contient ce texte")
+    parser.add_argument('--reference', default=REFERENCE, help="Fichier JSON de référence (défaut : %(default)s)")
+    parser.add_argument('--enregistrer', action='store_true', help="Enregistre les résultats comme référence")
+    parser.add_argument('--seuil', type=float, default=SEUIL,
+                        help="Hausse des allocations tolérée (défaut : %(default)s)")
+    parser.add_argument('--seuil-vitesse', type=float, default=SEUIL_VITESSE,
+                        help="Baisse de la vitesse relative tolérée (défaut : %(default)s)")
+    parser.add_argument('--repetitions', type=int, default=REPETITIONS)
+    arguments = parser.parse_args()
+
+    try:
+        with open(arguments.reference) as fichier:
+            contenu = json.load(fichier)
+    except FileNotFoundError:
+        contenu = {'mesures': {}}
+    reference = contenu['mesures']
+    version = '.'.join(platform.python_version_tuple()[:2])
+    comparable = contenu.get('python', platform.python_version()).rsplit('.', 1)[0] == version
+    if not comparable:
+        print(f"Référence enregistrée avec Python {contenu['python']} : les écarts sont seulement indiqués",
+              file=sys.stderr)
+
+    resultats, lignes, regressions = {}, [], 0
+    for nom, fonction, valeurs in cas():
+        if arguments.filtre not in nom:
+            continue
+        ops_par_seconde, relatif = chronometrer(fonction, valeurs, arguments.repetitions)
+        resultat = {'ops_par_seconde': ops_par_seconde, 'relatif': relatif,
+                    'octets_par_op': octets_par_operation(fonction, valeurs)}
+        resultats[nom] = resultat
+        precedent = reference.get(nom)
+        motif = comparer(resultat, precedent, arguments.seuil, arguments.seuil_vitesse)
+        regressions += bool(motif) and comparable
+        lignes.append((nom, f"{ops_par_seconde:,.0f}", f"{1e9 / ops_par_seconde:.0f}", f"{relatif:.3f}",
+                       f"{resultat['octets_par_op']:.0f}",
+                       f"{relatif / precedent['relatif'] - 1:+.1%}" if precedent else "-",
+                       motif or "ok"))
+        print(f"{nom} : {lignes[-1][1]} ops/s", file=sys.stderr, flush=True)
+    print(Tableau(["Mesure", "Ops/s", "ns/op", "Relatif", "Octets/op", "Écart", "Statut"], lignes).afficher())
+
+    if arguments.enregistrer:
+        with open(arguments.reference, 'w') as fichier:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(),
+                       'processeur': platform.processor(), 'mesures': {**reference, **resultats}},
+                      fichier, indent=2, ensure_ascii=False, sort_keys=True)
+            fichier.write("\n")
+        print(f"Référence enregistrée dans {arguments.reference}")
+    elif regressions:
+        print(f"{regressions} régression(s) : vitesse relative en baisse de plus de "
+              f"{arguments.seuil_vitesse:.0%}, ou allocations en hausse de plus de {arguments.seuil:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,30 @@
 import socket
 import threading
+import time
 from tkinter import *
 
+from utils.CalculateurDeScore import FIGURES, INDEX_FIGURE
+from utils.Conseiller import texte_conseil_figure, texte_conseil_gardes
+from utils.FeuilleScore import FeuilleScore
+from utils.Protocole import (AUCUN_JOUEUR, AUCUNE_ERREUR, Code, ERREUR_DEJA_REMPLIE, ERREUR_INVALIDE, ERREUR_NOM_PRIS,
+                             FIGURE_CONSEIL, MODE_AUTO, MODE_CREER, MODE_REJOINDRE, MODE_SPECTATEUR, RELANCE_CONSEIL,
+                             RELANCE_NON, RELANCE_OUI, decoder, encoder)
+from utils.Tableau import rendre_classement, rendre_fin_partie
+from utils.Trames import LecteurTrames, envoyer_trames
+
+CHOIX_MODE = {'C': MODE_CREER, 'R': MODE_REJOINDRE, 'A': MODE_AUTO, 'S': MODE_SPECTATEUR}
+CHOIX_RELANCE = {'O': RELANCE_OUI, 'N': RELANCE_NON, 'C': RELANCE_CONSEIL}
+ESSAIS_RECONNEXION = 5  # Tentatives de reprise de la session après une coupure
+PAUSE_RECONNEXION = 2.0  # Secondes entre deux tentatives
+ERREURS_FIGURE = {
+    ERREUR_INVALIDE: "Serveur : Figure invalide.",
+    ERREUR_DEJA_REMPLIE: "Serveur : Figure déjà remplie.",
+}
+
+
+def indices_valides(saisie):
+    return saisie == "" or all(indice.strip() in ('1', '2', '3', '4', '5') for indice in saisie.split(','))
+
 
 # -------------------------------------------------------------------
 # Classe représentant le client Yahtzee.
@@ -20,7 +43,14 @@ class YahtzeeClient:
         self.port = port
         self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.client_chat_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.lecteur = LecteurTrames(self.client_socket)  # Un message du serveur = une trame
+        self.lecteur_chat = LecteurTrames(self.client_chat_socket)
         self.connected = False
+        self.des = []  # Derniers dés reçus, pour afficher la feuille
+        self.jeton = None  # Jeton de session, présenté au serveur de chat
+        self.chat_connecte = False
+        self.spectateur = False
+        self.feuilles = {}  # Feuilles des joueurs, tenues à jour en spectateur
 
     # -------------------------------------------------------------------
     # Établit une connexion avec le serveur Yahtzee pour le jeu.
@@ -41,6 +71,32 @@ class YahtzeeClient:
             print(f"Erreur de connexion : {e}")  # En cas d'échec, affiche l'erreur
             exit()
 
+    # -------------------------------------------------------------------
+    # Rouvre la connexion de jeu après une coupure et présente le jeton de
+    # session à la place du nom.
+    #
+    # Le serveur rend sa place au joueur et lui envoie l'état de la partie
+    # (INSTANTANE) ; si la place est perdue, il redemande le nom et
+    # l'accueil reprend normalement.
+    #
+    # :return: True si la connexion a été rouverte.
+    # -------------------------------------------------------------------
+
+    def reprendre_session(self):
+        for _ in range(ESSAIS_RECONNEXION):
+            self.client_socket.close()
+            try:
+                self.client_socket = socket.create_connection((self.host, self.port))
+                self.lecteur = LecteurTrames(self.client_socket)
+                code, _ = decoder(self.lecteur.lire())
+                if code == Code.DEMANDE_NOM:
+                    envoyer_trames(self.client_socket, encoder(Code.REPRISE, self.jeton))
+                    return True
+            except OSError:
+                pass
+            time.sleep(PAUSE_RECONNEXION)
+        return False
+
     # -------------------------------------------------------------------
     # Établit une connexion avec le serveur de chat.
     #
@@ -55,11 +111,27 @@ class YahtzeeClient:
     def connexion_chat(self):
         try:
             self.client_chat_socket.connect((self.host, self.port + 1))  # Connexion au serveur de chat
+            self.chat_connecte = True
             print("Connexion au serveur de chat réussie.")  # Message de confirmation
+            if self.jeton is not None:
+                self.presenter_jeton()
         except Exception as e:
             print(f"Erreur de connexion : {e}")  # En cas d'échec, affiche l'erreur
             exit()
 
+    # -------------------------------------------------------------------
+    # Présente le jeton de session au serveur de chat.
+    #
+    # Le serveur de chat retrouve ainsi le joueur et ne relaye ses
+    # messages qu'aux joueurs de sa partie.
+    # -------------------------------------------------------------------
+
+    def presenter_jeton(self):
+        try:
+            envoyer_trames(self.client_chat_socket, self.jeton)
+        except Exception as e:
+            print(f"Erreur lors de l'envoi des données : {e}")  # En cas d'échec, affiche l'erreur
+
     # -------------------------------------------------------------------
     # Envoie des données encodées au serveur de chat.
     #
@@ -72,16 +144,16 @@ class YahtzeeClient:
 
     def envoyer_donnees_chat(self, data):
         try:
-            self.client_chat_socket.send(data.encode())  # Envoie les données encodées
+            envoyer_trames(self.client_chat_socket, data.encode())  # Envoie les données dans une trame
         except Exception as e:
             print(f"Erreur lors de l'envoi des données : {e}")  # En cas d'échec, affiche l'erreur
 
     # -------------------------------------------------------------------
-    # Envoie des données encodées au serveur de jeu.
+    # Envoie un message au serveur de jeu.
     #
-    # Cette méthode envoie les données au serveur de jeu après les avoir
-    # encodées. Elle est utilisée pour envoyer des commandes ou des réponses
-    # pendant la partie.
+    # Cette méthode envoie au serveur de jeu un message déjà encodé (voir
+    # utils.Protocole). Elle est utilisée pour envoyer les réponses aux
+    # questions du serveur pendant la partie.
     #
     # :raises Exception: Si l'envoi échoue, une exception est levée.
     # :return: Aucun retour. Affiche un message d'erreur en cas de problème.
@@ -89,7 +161,7 @@ class YahtzeeClient:
 
     def envoyer_donnees(self, data):
         try:
-            self.client_socket.send(data.encode())  # Envoie les données encodées
+            envoyer_trames(self.client_socket, data)  # Envoie les données dans une trame
         except Exception as e:
             print(f"Erreur lors de l'envoi des données : {e}")  # En cas d'échec, affiche l'erreur
 
@@ -106,7 +178,7 @@ class YahtzeeClient:
 
     def recevoir_donnees_chat(self):
         try:
-            return self.client_chat_socket.recv(1024).decode()  # Reçoit et décode les données
+            return self.lecteur_chat.lire().decode()  # Reçoit et décode une trame complète
         except Exception as e:
             print(f"Erreur lors de la réception des données : {e}")  # En cas d'échec, affiche l'erreur
             return None
@@ -114,17 +186,17 @@ class YahtzeeClient:
     # -------------------------------------------------------------------
     # Reçoit des données du serveur de jeu.
     #
-    # Cette méthode reçoit des données envoyées par le serveur de jeu,
-    # les décode et les retourne pour un traitement ultérieur. Elle est
+    # Cette méthode reçoit le prochain message envoyé par le serveur de jeu
+    # et le retourne pour être décodé (voir utils.Protocole). Elle est
     # utilisée pour écouter les messages ou commandes envoyées par le serveur.
     #
     # :raises Exception: Si la réception échoue, une exception est levée.
-    # :return: Les données reçues après décodage, ou None en cas d'erreur.
+    # :return: Le message reçu, ou None en cas d'erreur.
     # -------------------------------------------------------------------
 
     def recevoir_donnees(self):
         try:
-            return self.client_socket.recv(1024).decode()  # Reçoit et décode les données
+            return self.lecteur.lire()  # Reçoit une trame complète
         except Exception as e:
             print(f"Erreur lors de la réception des données : {e}")  # En cas d'échec, affiche l'erreur
             return None
@@ -149,50 +221,171 @@ class YahtzeeClient:
             print("Entrée invalide. Veuillez réessayer.")  # Si invalide, redemande l'entrée
 
     # -------------------------------------------------------------------
-    # Gère les messages envoyés par le serveur et les réponses du client.
+    # Affichage des messages du serveur et réponses du client.
     #
-    # Cette méthode traite les messages du serveur, détermine si l'utilisateur
-    # doit saisir quelque chose en fonction du message reçu et retourne la saisie
-    # appropriée. Elle gère également l'affichage des messages de chat.
-    #
-    # :param message: Le message reçu du serveur à traiter.
-    # :return: La réponse de l'utilisateur ou None si aucun traitement particulier.
+    # Chaque code de message reçu (voir utils.Protocole) est associé à une
+    # méthode dans GESTIONNAIRES. La méthode met le message en forme pour
+    # le joueur et, si c'est une question, retourne la réponse encodée à
+    # envoyer au serveur (None sinon).
     # -------------------------------------------------------------------
 
-    def gestion_prompt(self, message):
-        if "Serveur :" in message:  # Si le message provient du serveur de jeu
-            # Traite les différents types de prompts envoyés par le serveur
-            if "Entrez votre nom" in message:
-                return self.gestion_entree(">> ")
-            # Autres conditions spécifiques aux messages du serveur (création de partie, etc.)
-
-            elif "Vous souhaitez créer une nouvelle partie ou rejoindre une partie existante?" in message:
-                return self.gestion_entree(">> ")
-            elif "Choisissez une partie à rejoindre" in message:
-                return self.gestion_entree(">> ", lambda x: x.isdigit() and int(x) > 0)
-            elif "La partie est déjà pleine" in message:
-                return self.gestion_entree(">> ", lambda x: x.isdigit() and int(x) > 0)
-            elif "Choix invalide" in message:
-                return self.gestion_entree(">> ", lambda x: x.isdigit() and int(x) > 0)
-            elif "Combien de joueurs vont participer?" in message:
-                return self.gestion_entree(">> ", lambda x: x.isdigit() and int(x) > 1)
-            elif "Voulez-vous relancer des dés" in message:
-                return self.gestion_entree(">> ", lambda x: x.upper() in ['O', 'N']).upper()
-            elif "Indiquez les indices des dés à relancer" in message:
-                return self.gestion_entree(
-                    "Entrez les indices des dés à relancer (ex: 1,3,5 ou rien pour conserver tous les dés): ")
-            elif "Choisissez une figure à remplir" in message:
-                return self.gestion_entree(
-                    ">> ",
-                    lambda x: x.capitalize() in ['1', '2', '3', '4', '5', '6', 'Brelan', 'Petite suite', 'Grande suite',
-                                                 'Full', 'Yahtzee', 'Chance', 'Carré']
-                ).capitalize()
-            else:
-                return None  # Aucun traitement particulier
+    def repondre_nom(self, _):
+        print("Serveur : Entrez votre nom:")
+        return encoder(Code.NOM, self.gestion_entree(">> ", lambda x: 0 < len(x.encode()) < 256))
+
+    def enregistrer_session(self, jeton):
+        self.jeton = jeton
+        if self.chat_connecte:
+            self.presenter_jeton()
+
+    def repondre_mode(self, _):
+        print("Serveur : Vous souhaitez créer une nouvelle partie ou rejoindre une partie existante? "
+              "(C/R, A pour être placé automatiquement, S pour regarder une partie): ")
+        choix = self.gestion_entree(">> ", lambda x: x.upper() in CHOIX_MODE).upper()
+        self.spectateur = CHOIX_MODE[choix] == MODE_SPECTATEUR
+        return encoder(Code.MODE, CHOIX_MODE[choix])
+
+    def repondre_nb_joueurs(self, erreur):
+        if erreur == AUCUNE_ERREUR:
+            print("Serveur : Combien de joueurs vont participer? ")
         else:
-            # Messages provenant du chat
-            print(f"[Chat] {message}")  # Affiche les messages de chat reçus
-            return None
+            print("Serveur : Le nombre de joueurs doit être au moins 2. Réessayez: ")
+        nombre = self.gestion_entree(">> ", lambda x: x.isdigit() and 1 < int(x) < 256)
+        return encoder(Code.NB_JOUEURS, int(nombre))
+
+    def afficher_parties(self, resumes):
+        for numero, joueurs, requis, tour, tours_max, commencee, noms in resumes:
+            print(f"Serveur : Partie {numero}. Nombre de joueurs: {joueurs} / {requis} - Tour actuel: {tour} / "
+                  f"{tours_max} - Joueurs: {', '.join(noms)} - Partie commencée: {bool(commencee)}")
+
+    def repondre_partie(self, erreur):
+        if erreur == AUCUNE_ERREUR:
+            print(f"Serveur : Choisissez une partie à {'regarder' if self.spectateur else 'rejoindre'}: ")
+        elif erreur == ERREUR_NOM_PRIS:
+            print("Serveur : Un joueur porte déjà votre nom dans cette partie. Choisissez-en une autre : ")
+        else:
+            print("Serveur : Choix invalide. Entrez le numéro d'une partie ouverte : ")
+        choix = self.gestion_entree(">> ", lambda x: x.isdigit() and 0 < int(x) < 1 << 32)
+        return encoder(Code.CHOIX_PARTIE, int(choix))
+
+    def afficher_partie_pleine(self, _):
+        print("Serveur : La partie est déjà pleine.")
+
+    def afficher_attente(self, manquants):
+        print(f"Serveur : En attente de {manquants} joueur(s) pour démarrer la partie...")
+
+    def afficher_debut_partie(self, _):
+        print("Tous les joueurs sont connectés. La partie commence!")
+
+    def afficher_tour(self, nom):
+        if self.spectateur:
+            print(f"Serveur : C'est au tour de {nom}.")
+        else:
+            print(f"Serveur : C'est votre tour, {nom}.")
+
+    def afficher_des(self, valeur):
+        relance, self.des = valeur
+        if relance == 0:
+            print(f"Serveur : Résultat initial des dés: {self.des}")
+        else:
+            print(f"Serveur : Résultat après relance: {self.des}")
+
+    def repondre_relance(self, _):
+        print("Serveur : Voulez-vous relancer des dés ? (O/N, C pour un conseil):")
+        choix = self.gestion_entree(">> ", lambda x: x.upper() in CHOIX_RELANCE).upper()
+        return encoder(Code.RELANCE, CHOIX_RELANCE[choix])
+
+    def repondre_indices(self, _):
+        print("Serveur : Indiquez les indices des dés à relancer (ex: 1,3,5):")
+        saisie = self.gestion_entree(
+            "Entrez les indices des dés à relancer (ex: 1,3,5 ou rien pour conserver tous les dés): ", indices_valides)
+        masque = 0
+        for indice in filter(None, saisie.split(',')):
+            masque |= 1 << (int(indice) - 1)
+        return encoder(Code.INDICES, masque)
+
+    def afficher_conseil_gardes(self, classement):
+        print(f"Serveur : {texte_conseil_gardes(classement)}")
+
+    def afficher_conseil_figure(self, position):
+        print(f"Serveur : {texte_conseil_figure(FIGURES[position])}")
+
+    def afficher_feuille(self, etat):
+        # La feuille est rendue ici, avec les scores théoriques des derniers dés.
+        print(FeuilleScore.depuis_etat(*etat).afficher_score(self.des))
+
+    def repondre_figure(self, valeur):
+        disponibles, erreur = valeur
+        if erreur in ERREURS_FIGURE:
+            print(ERREURS_FIGURE[erreur])
+        figures = [figure for position, figure in enumerate(FIGURES) if disponibles >> position & 1]
+        print("Serveur :  Choisissez une figure à remplir:" + ",".join(figures) + ":")
+        figure = self.gestion_entree(">> ", lambda x: x.capitalize() in figures or x.capitalize() == 'Conseil')
+        figure = figure.capitalize()
+        return encoder(Code.FIGURE, FIGURE_CONSEIL if figure == 'Conseil' else INDEX_FIGURE[figure])
+
+    def afficher_points(self, valeur):
+        _, score, total = valeur
+        print(f"Serveur : Points ajoutés: {score}. Score total: {total}")
+
+    def afficher_score_marque(self, valeur):
+        position, score, nom = valeur
+        print(f"{nom} a marqué {score} points pour la figure {FIGURES[position]}.")
+        if nom in self.feuilles:
+            self.feuilles[nom].noter_score(FIGURES[position], score)
+            print(rendre_classement({joueur: feuille.total for joueur, feuille in self.feuilles.items()}))
+
+    def afficher_instantane(self, etat):
+        # État de la partie à l'arrivée d'un spectateur ou au retour d'un joueur, complété
+        # ensuite par les changements.
+        tour, tours_max, courant, relance, des, feuilles = etat
+        par_joueur = {nom: FeuilleScore.depuis_etat(masque, valeurs, bonus) for nom, masque, valeurs, bonus in feuilles}
+        if self.spectateur:
+            self.feuilles = par_joueur
+            print(f"Serveur : Vous regardez la partie (tour {tour}, {tours_max} tours par joueur).")
+        else:
+            print(f"Serveur : Vous avez retrouvé votre place (tour {tour}, {tours_max} tours par joueur).")
+        print(rendre_classement({nom: feuille.total for nom, feuille in par_joueur.items()}))
+        if courant != AUCUN_JOUEUR:
+            print(f"Serveur : C'est au tour de {feuilles[courant][0]}.")
+            if any(des):
+                self.afficher_des((relance, des))
+
+    def afficher_classement(self, scores):
+        print(rendre_classement(dict(scores)))
+
+    def afficher_delai_depasse(self, _):
+        print("Serveur : Temps écoulé, le serveur a joué à votre place.")
+
+    def afficher_fin_partie(self, scores):
+        print(rendre_fin_partie(dict(scores)))
+        print("Merci d'avoir joué!")
+
+    GESTIONNAIRES = {
+        Code.DEMANDE_NOM: repondre_nom,
+        Code.DEMANDE_MODE: repondre_mode,
+        Code.DEMANDE_NB_JOUEURS: repondre_nb_joueurs,
+        Code.LISTE_PARTIES: afficher_parties,
+        Code.DEMANDE_PARTIE: repondre_partie,
+        Code.PARTIE_PLEINE: afficher_partie_pleine,
+        Code.ATTENTE: afficher_attente,
+        Code.DEBUT_PARTIE: afficher_debut_partie,
+        Code.VOTRE_TOUR: afficher_tour,
+        Code.DES: afficher_des,
+        Code.DEMANDE_RELANCE: repondre_relance,
+        Code.DEMANDE_INDICES: repondre_indices,
+        Code.CONSEIL_GARDES: afficher_conseil_gardes,
+        Code.CONSEIL_FIGURE: afficher_conseil_figure,
+        Code.FEUILLE: afficher_feuille,
+        Code.DEMANDE_FIGURE: repondre_figure,
+        Code.POINTS: afficher_points,
+        Code.SCORE_MARQUE: afficher_score_marque,
+        Code.CLASSEMENT: afficher_classement,
+        Code.FIN_PARTIE: afficher_fin_partie,
+        Code.SESSION: enregistrer_session,
+        Code.DELAI_DEPASSE: afficher_delai_depasse,
+        Code.INSTANTANE: afficher_instantane,
+    }
 
     # -------------------------------------------------------------------
     # Gère le déroulement complet du jeu de Yahtzee et l'intégration du chat.
@@ -215,22 +408,20 @@ class YahtzeeClient:
                 # Écoute les messages entrants
                 data = self.recevoir_donnees()
                 if not data:
+                    if self.jeton is not None and not self.spectateur:
+                        print("Connexion perdue, reprise de la session...")
+                        if self.reprendre_session():
+                            continue
                     print("Déconnexion du serveur.")
                     break
 
                 # Traite le message reçu
-                print(data)
-                user_input = self.gestion_prompt(data)
+                code, valeur = decoder(data)
+                user_input = self.GESTIONNAIRES[code](self, valeur)
                 if user_input is not None:
                     self.envoyer_donnees(user_input)
 
-                # Permet à l'utilisateur d'envoyer des messages de chat à tout moment
-                # chat_message = input("Message (laisser vide pour passer) : ").strip()
-                # if chat_message.lower().startswith("chat:"):
-                #     self.envoyer_donnees(chat_message)
-
-                if "La partie est terminée" in data:
-                    print("Merci d'avoir joué!")
+                if code == Code.FIN_PARTIE:
                     break
 
             except Exception as e:
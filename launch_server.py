@@ -1,5 +1,8 @@
+import argparse
 import threading
 from server.server import YahtzeeServer
+from utils.Connexion import DELAI_REPONSE
+from utils.Partie import DELAI_RECONNEXION, DELAI_TOUR
 
 
 # -------------------------------------------------------------------
@@ -9,15 +12,84 @@ from server.server import YahtzeeServer
 # son exécution dans un thread séparé. Cela permet au serveur de fonctionner
 # en arrière-plan sans bloquer le reste du programme.
 #
+# :param options: Réglages du serveur (délais), transmis à YahtzeeServer.
 # :return: Aucun retour. Lance le serveur dans un thread séparé.
 # -------------------------------------------------------------------
 
-def demarrer_serveur():
-    server = YahtzeeServer()  # Crée une instance du serveur Yahtzee.
+def demarrer_serveur(**options):
+    server = YahtzeeServer(**options)  # Crée une instance du serveur Yahtzee.
     server.demarrer()  # Démarre le serveur pour qu'il écoute les connexions.
 
 
+# -------------------------------------------------------------------
+# Démarre le serveur Yahtzee en mode asyncio.
+#
+# Toutes les connexions et les parties tournent sur une seule boucle
+# d'événements ; l'appel bloque jusqu'à l'arrêt du serveur.
+# -------------------------------------------------------------------
+
+def demarrer_serveur_async(**options):
+    from server.server_async import YahtzeeServerAsync
+    YahtzeeServerAsync(**options).demarrer()
+
+
+# -------------------------------------------------------------------
+# Démarre le serveur Yahtzee réparti sur plusieurs processus.
+#
+# Le processus courant accueille les joueurs et sert le chat ; les
+# parties complètes sont jouées par les processus de jeu.
+#
+# :param processus: Nombre de processus de jeu.
+# -------------------------------------------------------------------
+
+def demarrer_serveur_multi(processus, **options):
+    from server.server_multi import YahtzeeServerMulti
+    YahtzeeServerMulti(processus, **options).demarrer()
+
+
 if __name__ == "__main__":  # Vérifie si ce script est exécuté directement (et non importé).
+    parser = argparse.ArgumentParser(description="Serveur Yahtzee")
+    parser.add_argument('--asyncio', action='store_true',
+                        help="Sert toutes les connexions sur une boucle asyncio au lieu d'un thread par joueur")
+    parser.add_argument('--delai-reponse', type=float, default=DELAI_REPONSE,
+                        help="Secondes accordées pour répondre à une question (défaut : %(default)s)")
+    parser.add_argument('--delai-tour', type=float, default=DELAI_TOUR,
+                        help="Secondes accordées pour jouer un tour entier (défaut : %(default)s)")
+    parser.add_argument('--delai-reconnexion', type=float, default=DELAI_RECONNEXION,
+                        help="Secondes pendant lesquelles un joueur déconnecté garde sa place (défaut : %(default)s)")
+    parser.add_argument('--journal', metavar='DOSSIER',
+                        help="Journalise les parties dans ce dossier et reprend au démarrage celles "
+                             "qu'un arrêt du serveur a interrompues")
+    parser.add_argument('--statistiques', metavar='FICHIER',
+                        help="Enregistre les statistiques des joueurs et le classement général dans cette "
+                             "base SQLite (consultable avec python -m utils.Statistiques FICHIER)")
+    parser.add_argument('--rejeu', metavar='FICHIER',
+                        help="Ajoute chaque tour des parties terminées à ce fichier de rejeux "
+                             "(analysable avec python -m utils.Rejeu FICHIER)")
+    parser.add_argument('--graine', type=int,
+                        help="Graine des dés : le même serveur relancé avec la même graine donne les mêmes "
+                             "dés à chaque partie (tests de charge, rejeux)")
+    parser.add_argument('--metriques', type=int, metavar='PORT',
+                        help="Sert les mesures du serveur (connexions, parties, tours, durées des phases, "
+                             "octets, chat) au format Prometheus sur http://127.0.0.1:PORT/metrics")
+    parser.add_argument('--processus', type=int, default=0, metavar='N',
+                        help="Joue les parties dans N processus (un par cœur si N vaut -1), "
+                             "au lieu du seul processus du serveur")
+    arguments = parser.parse_args()
+    if arguments.processus and arguments.asyncio:
+        parser.error("--processus et --asyncio ne peuvent pas être combinés")
+    if arguments.processus and arguments.journal:
+        parser.error("--processus et --journal ne peuvent pas être combinés")
+    options = {'delai_reponse': arguments.delai_reponse, 'delai_tour': arguments.delai_tour,
+               'delai_reconnexion': arguments.delai_reconnexion, 'journal': arguments.journal,
+               'statistiques': arguments.statistiques, 'rejeu': arguments.rejeu, 'graine': arguments.graine,
+               'metriques': arguments.metriques}
+
     print("Démarrage du serveur...")  # Affiche un message pour informer que le serveur démarre.
-    server_thread = threading.Thread(target=demarrer_serveur)  # Crée un thread pour démarrer le serveur.
-    server_thread.start()  # Lance le thread qui démarre le serveur.
+    if arguments.processus:
+        demarrer_serveur_multi(max(arguments.processus, 0), **options)
+    elif arguments.asyncio:
+        demarrer_serveur_async(**options)
+    else:
+        server_thread = threading.Thread(target=demarrer_serveur, kwargs=options)  # Crée un thread pour démarrer le serveur.
+        server_thread.start()  # Lance le thread qui démarre le serveur.
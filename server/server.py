@@ -1,8 +1,25 @@
 import socket
 import threading
-from typing import List
-from utils.Partie import Partie
-
+import time
+
+from utils.Chat import MembreChat
+from utils.Connexion import DELAI_REPONSE, Connexion, ConnexionRompue
+from utils.Conseiller import Conseiller
+from utils.Echeancier import Echeancier
+from utils.Journal import Journal
+from utils.Mesures import Compteur, JaugeCalculee, servir_mesures
+from utils.Partie import DELAI_RECONNEXION, DELAI_TOUR, Partie
+from utils.Protocole import (AUCUNE_ERREUR, Code, ERREUR_INVALIDE, ERREUR_NOM_PRIS, ERREUR_TROP_PEU, MODE_AUTO,
+                             MODE_CREER, MODE_REJOINDRE, MODE_SPECTATEUR, encoder)
+from utils.Rejeu import EcrivainRejeu
+from utils.Salon import Salon
+from utils.Solveur import CHEMIN_PAR_DEFAUT, TablePolitique
+from utils.Statistiques import Statistiques
+from utils.Trames import LecteurTrames
+
+PERIODE_RECOLTE = 5.0  # Secondes entre deux passages du récolteur de parties
+PARTIES = JaugeCalculee('yahtzee_parties', "Parties du salon par état", 'etat')  # Source : le salon du serveur
+MESSAGES_CHAT = Compteur('yahtzee_messages_chat_total', "Messages de chat relayés")
 
 # -------------------------------------------------------------------
 # Classe représentant le serveur Yahtzee.
@@ -22,23 +39,57 @@ class YahtzeeServer:
     #
     # Cette méthode initialise le serveur en configurant l'adresse et le
     # port de connexion, en créant le socket de serveur et en initialisant
-    # une liste de parties.
+    # le salon des parties. La table de stratégie optimale, si elle a été
+    # construite (python -m utils.Solveur), est projetée en mémoire et
+    # partagée par toutes les parties.
     #
     # :param host: L'adresse IP du serveur (par défaut '127.0.0.1').
     # :param port: Le port sur lequel le serveur écoute (par défaut 65430).
+    # :param chemin_politique: Fichier de la table de stratégie optimale.
+    # :param delai_reponse: Secondes accordées pour répondre à une question.
+    # :param delai_tour: Secondes accordées pour jouer un tour entier.
+    # :param delai_reconnexion: Secondes pendant lesquelles un joueur
+    #                           déconnecté peut retrouver sa place.
+    # :param journal: Dossier du journal des parties (utils.Journal), ou
+    #                 None pour ne pas journaliser.
+    # :param statistiques: Base des statistiques des joueurs
+    #                      (utils.Statistiques), ou None.
+    # :param rejeu: Fichier des rejeux des parties terminées
+    #               (utils.Rejeu), ou None.
+    # :param graine: Graine des dés : la même graine redonne les mêmes dés
+    #                à chaque partie (utils.Des), ou None.
+    # :param metriques: Port local où servir les mesures du serveur
+    #                   (utils.Mesures), ou None.
     # -------------------------------------------------------------------
 
-    def __init__(self, host='127.0.0.1', port=65430):
+    def __init__(self, host='127.0.0.1', port=65430, chemin_politique=CHEMIN_PAR_DEFAUT,
+                 delai_reponse=DELAI_REPONSE, delai_tour=DELAI_TOUR, delai_reconnexion=DELAI_RECONNEXION,
+                 journal=None, statistiques=None, rejeu=None, graine=None, metriques=None):
         self.host = host  # L'adresse IP où le serveur écoute.
         self.port = port  # Le port du serveur pour les connexions des joueurs.
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)  # Création du socket de serveur.
-        self.parties: List[Partie] = []  # Liste des parties en cours.
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)  # Redémarrage sans attente
+        self.salon = Salon(self.creer_partie)  # Parties en cours et appariement des joueurs.
+        self.politique = TablePolitique.ouvrir(chemin_politique)  # None si la table n'a pas été construite.
+        if self.politique is None:
+            print(f"Table de stratégie introuvable ({chemin_politique}) : conseils limités au tour en cours.")
+        self.conseiller = Conseiller(self.politique)  # Conseils mémorisés, partagés par toutes les parties.
+        self.delai_reponse = delai_reponse
+        self.delai_tour = delai_tour
+        self.delai_reconnexion = delai_reconnexion
+        self.journal = Journal(journal) if journal is not None else None  # Relu dès l'ouverture
+        self.statistiques = Statistiques(statistiques) if statistiques is not None else None
+        self.rejeu = EcrivainRejeu(rejeu) if rejeu is not None else None
+        self.graine = graine
+        self.metriques = metriques
+        self.echeancier = None  # Délais des connexions du mode threadé, créé au démarrage
 
     # -------------------------------------------------------------------
     # Démarre le serveur pour écouter les connexions des joueurs et du chat.
     #
-    # Cette méthode démarre deux threads : un pour gérer les connexions
-    # des joueurs et un autre pour démarrer le serveur de chat. Elle
+    # Cette méthode démarre trois threads : un pour gérer les connexions
+    # des joueurs, un autre pour démarrer le serveur de chat et le
+    # récolteur qui retire périodiquement les parties terminées. Elle
     # écoute les connexions entrantes des joueurs et crée des threads
     # pour gérer chaque connexion.
     #
@@ -46,132 +97,196 @@ class YahtzeeServer:
     # -------------------------------------------------------------------
 
     def demarrer(self):
+        self.echeancier = Echeancier()  # Un seul thread pour les délais de toutes les connexions.
+        self.servir_mesures()
+        for partie in self.restaurer_parties():
+            threading.Thread(target=partie.demarrer).start()
+
         # Démarre l'écoute des connexions des joueurs.
         def demarrer_jeu():
             self.server_socket.bind((self.host, self.port))  # Lie le serveur à l'adresse et au port spécifiés.
-            self.server_socket.listen(5)  # Le serveur commence à écouter les connexions entrantes (max 5).
+            self.server_socket.listen(socket.SOMAXCONN)  # File d'attente du noyau : absorbe les afflux de connexions.
             print(f"Le serveur Yahtzee est en écoute sur {self.host}:{self.port}")
 
             # Accepte les connexions des clients et crée un thread pour gérer chaque joueur.
             while True:
                 client_socket, addr = self.server_socket.accept()
                 client_handler = threading.Thread(target=self.gerer_joueur, args=(client_socket, addr))
-                threading.Thread(
-                    target=self.supprimer_partie_si_terminee).start()  # Vérifie les parties terminées en parallèle.
                 client_handler.start()
 
+        # Retire les parties terminées ou abandonnées, même sans nouvelle connexion.
+        def recolter():
+            while True:
+                time.sleep(PERIODE_RECOLTE)
+                self.supprimer_partie_si_terminee()
+
         # Démarre le serveur de chat.
         def demarrer_chat():
-            chat_server = ChatServer()  # Crée une instance du serveur de chat.
+            chat_server = ChatServer(self.salon, self.host, self.port + 1)  # Crée une instance du serveur de chat.
             chat_server.demarrer()  # Lance le serveur de chat.
 
         threading.Thread(target=demarrer_chat).start()  # Démarre le serveur de chat dans un thread.
         threading.Thread(target=demarrer_jeu).start()  # Démarre le serveur de jeu dans un thread.
+        threading.Thread(target=recolter, daemon=True).start()  # Démarre le récolteur de parties.
 
     # -------------------------------------------------------------------
     # Gère la connexion et les interactions avec un joueur.
     #
     # Cette méthode permet à un joueur de se connecter, de choisir de
-    # créer une nouvelle partie ou de rejoindre une partie existante.
-    # Elle gère également l'entrée du nombre de joueurs nécessaires
-    # pour la création d'une partie et ajoute la partie à la liste des
-    # parties en attente.
+    # créer une nouvelle partie, de rejoindre une partie existante ou
+    # d'être placé automatiquement dans une partie. Elle gère également
+    # l'entrée du nombre de joueurs nécessaires. La partie démarre dès
+    # que le joueur qui la complète est assis.
     #
     # :param client_socket: Socket du client.
     # :param addr: Adresse du client.
     # :return: Aucun retour. Gère les interactions avec un joueur.
     # -------------------------------------------------------------------
     def gerer_joueur(self, client_socket, addr):
+        self.accueillir(Connexion(client_socket, addr, self.echeancier, self.delai_reponse), addr)
+
+    def accueillir(self, connexion, addr):
+        # Mène l'accueil sur une connexion déjà ouverte, dans le thread appelant.
         try:
-            client_socket.send("Serveur : Entrez votre nom:".encode())
-            player_name = client_socket.recv(1024).decode().strip()
-
-            client_socket.send(
-                "Serveur : Vous souhaitez créer une nouvelle partie ou rejoindre une partie existante? (C/R): ".encode())
-            response = client_socket.recv(1024).decode().strip().upper()
-            if response == "C":
-                client_socket.send("Serveur : Combien de joueurs vont participer? ".encode())
-                while True:
-                    try:
-                        required_players = int(client_socket.recv(1024).decode().strip())
-                        if required_players > 1:
-                            break
-                        else:
-                            client_socket.send(
-                                "Serveur : Le nombre de joueurs doit être au moins 2. Réessayez: ".encode())
-                    except ValueError:
-                        client_socket.send("Serveur : Entrée invalide. Entrez un nombre entier: ".encode())
-                print(f"{player_name} a créé une nouvelle partie pour {required_players} joueurs.")
-                partie = Partie(player=player_name, socket=client_socket, required_players=required_players)
-                self.parties.append(partie)
-
-                threading.Thread(target=partie.attendre_joueurs).start()
-
-            elif response == "R":
-                for i, partie in enumerate(self.parties):
-                    client_socket.send(f"Serveur : Partie {i + 1}. {partie.information_partie()}\n".encode())
-                client_socket.send("Serveur : Choisissez une partie à rejoindre: ".encode())
-
-                while True:
-                    try:
-                        # Recevoir et décoder la réponse du client
-                        data = client_socket.recv(1024).decode().strip()
-                        if not data.isdigit():
-                            # Si l'entrée n'est pas un nombre
-                            client_socket.send("Serveur : Entrée invalide. Entrez un nombre valide : ".encode())
-                            continue
-
-                        # Convertir l'entrée en entier
-                        choice = int(data)
-                        if 1 <= choice <= len(self.parties) and self.parties[choice - 1].peut_rejoindre():
-                            # Si le choix est valide, on sort de la boucle
-                            self.parties[choice - 1].rejoindre_partie(player_name, client_socket)
-
-                            break
-
-                        else:
-                            # Si le choix est en dehors de l'intervalle
-                            client_socket.send(
-                                f"Serveur : Choix invalide. Entrez un nombre entre 1 et {len(self.parties)} : ".encode())
-                    except ValueError:
-                        # Gestion des erreurs de conversion explicite (peu probable ici grâce à `isdigit()`)
-                        client_socket.send("Serveur : Entrée invalide. Entrez un nombre valide : ".encode())
-                    except Exception as e:
-                        # Pour toute autre exception, fournir un message d'erreur générique et logger l'erreur côté serveur
-                        print(f"Erreur inattendue : {e}")
-                        client_socket.send("Serveur : Une erreur inattendue s'est produite. Réessayez : ".encode())
-
-                # Si on atteint ici, `choice` est valide
+            partie = connexion.executer(self.accueil(connexion))
+            if partie is not None:
+                threading.Thread(target=partie.demarrer).start()  # La partie vient d'être complétée.
+        except (BrokenPipeError, ConnectionResetError):
+            print(f"Le joueur à l'adresse {addr} s'est déconnecté.")
+            connexion.fermer()
 
+    # -------------------------------------------------------------------
+    # Échange d'accueil d'un joueur : nom, puis création, choix ou
+    # appariement automatique d'une partie, ou choix d'une partie à
+    # regarder en spectateur. Un joueur déconnecté en cours de partie
+    # présente à la place de son nom le jeton de sa session, et retrouve
+    # sa place (voir Partie.reprendre).
+    #
+    # C'est un générateur (voir utils.Connexion) partagé par le serveur
+    # threadé et le serveur asyncio : chaque question est produite par
+    # `yield` et reçoit la réponse du joueur.
+    #
+    # :param connexion: Connexion du joueur.
+    # :return: La partie que ce joueur a complétée (à démarrer par
+    #          l'appelant), sinon None.
+    # -------------------------------------------------------------------
 
+    def accueil(self, connexion):
+        player_name = yield encoder(Code.DEMANDE_NOM)
+        while isinstance(player_name, bytes):  # Jeton de session (REPRISE) au lieu d'un nom
+            session = self.salon.reprendre(player_name, connexion)
+            if session is not None:
+                return None  # La partie en cours joue déjà les tours du joueur
+            player_name = yield encoder(Code.DEMANDE_NOM)  # Session inconnue ou place perdue : accueil normal
+        session = self.salon.ouvrir_session(player_name, connexion)
+
+        response = yield encoder(Code.SESSION, session.jeton), encoder(Code.DEMANDE_MODE)
+        if response == MODE_CREER:
+            required_players = yield from self.demander_nb_joueurs()
+            print(f"{player_name} a créé une nouvelle partie pour {required_players} joueurs.")
+            self.salon.creer_partie(session, required_players)
+
+        elif response == MODE_AUTO:
+            required_players = yield from self.demander_nb_joueurs()
+            print(f"{player_name} cherche une partie à {required_players} joueurs.")
+            return self.salon.placer(session, required_players)
+
+        elif response == MODE_REJOINDRE:
+            # La liste des parties et la question partent en une seule écriture.
+            choice = yield (encoder(Code.LISTE_PARTIES, self.salon.resumes()),
+                            encoder(Code.DEMANDE_PARTIE, AUCUNE_ERREUR))
 
+            while True:
+                assis, partie = self.salon.rejoindre(choice, session)
+                if assis:
+                    return partie
+                # Si la partie n'existe pas, n'est plus ouverte, ou a déjà un joueur de ce nom
+                erreur = ERREUR_NOM_PRIS if self.salon.nom_pris(choice, player_name) else ERREUR_INVALIDE
+                choice = yield encoder(Code.DEMANDE_PARTIE, erreur)
+
+        elif response == MODE_SPECTATEUR:
+            # Le spectateur ne répond plus à rien une fois la partie choisie.
+            choice = yield (encoder(Code.LISTE_PARTIES, self.salon.resumes()),
+                            encoder(Code.DEMANDE_PARTIE, AUCUNE_ERREUR))
+            while not self.salon.observer(choice, connexion):
+                choice = yield encoder(Code.DEMANDE_PARTIE, ERREUR_INVALIDE)
+            print(f"{player_name} regarde la partie {choice}.")
+        return None
+
+    def demander_nb_joueurs(self):
+        # -------------------------------------------------------------------
+        # Demande la taille de table, jusqu'à obtenir au moins 2 joueurs.
+        # -------------------------------------------------------------------
+        erreur = AUCUNE_ERREUR
+        while True:
+            required_players = yield encoder(Code.DEMANDE_NB_JOUEURS, erreur)
+            if required_players > 1:
+                return required_players
+            erreur = ERREUR_TROP_PEU
+
+    def servir_mesures(self):
+        # -------------------------------------------------------------------
+        # Sert les mesures du serveur (connexions, parties par état, tours,
+        # durées des phases des tours, octets, chat) au format Prometheus
+        # sur http://host:metriques/metrics, si un port a été choisi.
+        # -------------------------------------------------------------------
+        PARTIES.source = self.salon.compter
+        if self.metriques is not None:
+            servir_mesures(self.host, self.metriques)
+
+    def creer_partie(self, player_name, connexion, required_players):
+        return Partie(player=player_name, connexion=connexion, required_players=required_players,
+                      conseiller=self.conseiller, delai_tour=self.delai_tour,
+                      delai_reconnexion=self.delai_reconnexion, journal=self.journal,
+                      statistiques=self.statistiques, rejeu=self.rejeu, graine=self.graine)
 
+    # -------------------------------------------------------------------
+    # Recrée les parties inachevées relues dans le journal, avant
+    # l'ouverture du serveur. Leurs joueurs sont absents jusqu'à leur
+    # retour avec le jeton de leur session ; passé le délai de
+    # reconnexion, la partie est abandonnée.
+    #
+    # :return: Les parties recréées, à démarrer par l'appelant.
+    # -------------------------------------------------------------------
 
-        except (BrokenPipeError, ConnectionResetError):
-            print(f"Le joueur à l'adresse {addr} s'est déconnecté.")
+    def restaurer_parties(self):
+        if self.journal is None:
+            return []
+        parties = []
+        for etat in self.journal.inachevees:
+            (premier, _), *autres = etat.joueurs
+            partie = self.creer_partie(premier, ConnexionRompue(), len(etat.joueurs))
+            for nom, _ in autres:
+                partie.rejoindre_partie(nom, ConnexionRompue())
+            partie.restaurer(etat)
+            self.salon.restaurer(partie, etat.joueurs)
+            parties.append(partie)
+        self.salon.reserver_identifiants(self.journal.dernier_identifiant)
+        if parties:
+            print(f"{len(parties)} partie(s) inachevée(s) reprise(s) depuis le journal.")
+        return parties
 
     # -------------------------------------------------------------------
-    # Supprime une partie de la liste des parties si elle est terminée.
+    # Supprime les parties terminées ou abandonnées du registre.
     #
-    # Cette méthode vérifie chaque partie dans la liste des parties en
-    # cours et supprime celles qui sont terminées.
+    # Cette méthode est appelée périodiquement par le récolteur : une
+    # partie finie est libérée, et ses connexions fermées, au plus
+    # PERIODE_RECOLTE secondes après sa fin.
     #
     # :return: Aucun retour. Supprime les parties terminées.
     # -------------------------------------------------------------------
 
     def supprimer_partie_si_terminee(self):
-        parties_terminees = [partie for partie in self.parties if
-                             partie.est_terminee()]  # Trouve les parties terminées.
-        for partie in parties_terminees:
-            self.parties.remove(partie)  # Supprime les parties terminées de la liste.
-            print(f"La partie {partie} est terminée et a été supprimée.")
+        for partie in self.salon.recolter():  # Retire les parties terminées du registre.
+            print(f"La partie {partie.identifiant} est terminée et a été supprimée.")
 
 
 # -------------------------------------------------------------------
 # Classe représentant le serveur de chat.
 #
 # Cette classe gère les connexions réseau des clients de chat et
-# permet la communication en temps réel entre les joueurs.
+# permet la communication en temps réel entre les joueurs d'une même
+# partie (voir utils.Chat).
 #
 # :return: Aucun retour. Gère les connexions et le chat entre les clients.
 # -------------------------------------------------------------------
@@ -184,15 +299,17 @@ class ChatServer:
     # Cette méthode initialise le serveur de chat en configurant l'adresse
     # et le port de connexion, et en créant le socket de serveur.
     #
+    # :param salon: Salon du serveur de jeu, qui retrouve les joueurs par leur jeton.
     # :param host: L'adresse IP du serveur de chat (par défaut '127.0.0.1').
     # :param port: Le port sur lequel le serveur de chat écoute (par défaut 65431).
     # -------------------------------------------------------------------
 
-    def __init__(self, host='127.0.0.1', port=65431):
+    def __init__(self, salon, host='127.0.0.1', port=65431):
         self.host = host  # L'adresse IP du serveur de chat.
         self.port = port  # Le port du serveur de chat pour les connexions.
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)  # Création du socket du serveur de chat.
-        self.clients = []  # Liste des clients connectés au chat.
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.salon = salon  # Sessions des joueurs.
 
     # -------------------------------------------------------------------
     # Démarre le serveur de chat pour écouter les connexions des clients.
@@ -207,7 +324,7 @@ class ChatServer:
     def demarrer(self):
         def demarrer_chat():
             self.server_socket.bind((self.host, self.port))  # Lie le serveur de chat à l'adresse et au port spécifiés.
-            self.server_socket.listen(5)  # Le serveur commence à écouter les connexions (max 5).
+            self.server_socket.listen(socket.SOMAXCONN)  # Le serveur commence à écouter les connexions.
             print(f"Le serveur de chat est en écoute sur {self.host}:{self.port}")
             while True:
                 client_socket, addr = self.server_socket.accept()  # Accepte les connexions des clients.
@@ -220,9 +337,10 @@ class ChatServer:
     # -------------------------------------------------------------------
     # Gère la connexion et les interactions avec un client de chat.
     #
-    # Cette méthode reçoit les messages d'un client, puis les envoie à
-    # tous les autres clients connectés. Elle permet ainsi la communication
-    # en temps réel entre les clients du chat.
+    # Le client présente d'abord le jeton de session reçu sur la connexion
+    # de jeu, qui désigne le joueur. Chaque message reçu ensuite est
+    # relayé aux autres joueurs de sa partie, par leurs files sortantes :
+    # l'envoi ne bloque jamais ce thread.
     #
     # :param client_socket: Socket du client.
     # :param addr: Adresse du client.
@@ -230,29 +348,30 @@ class ChatServer:
     # -------------------------------------------------------------------
 
     def gerer_chat(self, client_socket, addr):
+        lecteur = LecteurTrames(client_socket)
+        membre = None
         try:
-            print(f"Connexion établie avec {addr}")
-            self.clients.append(
-                {"name": f"Joueur {len(self.clients) + 1}", "socket": client_socket})  # Ajoute le client à la liste.
+            session = self.salon.session(lecteur.lire())  # Première trame : le jeton de session.
+            if session is None:
+                print(f"Jeton de chat inconnu depuis {addr}.")
+                return
+            print(f"Connexion établie avec {addr} ({session.nom})")
+            membre = MembreChat(client_socket, session.nom)
+            self.salon.rattacher_chat(session, membre)
             while True:
-                data = client_socket.recv(1024).decode()  # Récupère le message du client.
-                if not data:
-                    break  # Si le client se déconnecte, quitte la boucle.
-                print(f"Message de {addr}: {data}")  # Affiche le message du client.
-                name = [client["name"] for client in self.clients if client["socket"] == client_socket][
-                    0]  # Trouve le nom du client.
-                for client in self.clients:  # Envoie le message à tous les autres clients.
-                    if client["socket"] != client_socket:
-                        try:
-                            client["socket"].send(f'{name}: {data}'.encode())
-                        except (BrokenPipeError, ConnectionResetError):
-                            pass  # Ignore les erreurs si un client est déconnecté.
-                            print(f"Le client à l'adresse {addr} s'est déconnecté.")
-        except (BrokenPipeError, ConnectionResetError):
+                data = lecteur.lire().decode()  # Récupère le message du client (une trame).
+                print(f"Message de {session.nom}: {data}")  # Affiche le message du client.
+                MESSAGES_CHAT.ajouter()
+                if session.partie is not None:  # Relaye aux joueurs de la même partie.
+                    session.partie.chat.diffuser(membre, f'{session.nom}: {data}')
+        except (BrokenPipeError, ConnectionResetError, UnicodeDecodeError):
             print(f"Le client à l'adresse {addr} s'est déconnecté.")
         finally:
-            client_socket.close()  # Ferme la connexion.
-            self.clients.remove(client_socket)  # Retire le client de la liste.
+            if membre is not None:
+                self.salon.detacher_chat(session, membre)
+                membre.fermer()
+            else:
+                client_socket.close()  # Ferme la connexion.
             print(f"Connexion avec {addr} fermée.")
 
 
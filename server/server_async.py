@@ -0,0 +1,182 @@
+import asyncio
+import time
+
+from server.server import MESSAGES_CHAT, PERIODE_RECOLTE, YahtzeeServer
+from utils.Chat import MembreChatAsync
+from utils.Connexion import Calcul, ConnexionAsync
+from utils.Partie import Partie
+from utils.Protocole import Code, encoder
+from utils.Trames import lire_trame_async
+
+
+# -------------------------------------------------------------------
+# Partie jouée sur la boucle d'événements asyncio.
+#
+# Les règles et les questions posées aux joueurs sont celles de Partie
+# (générateur deroulement_tour) ; seuls le démarrage et la boucle des
+# tours deviennent des coroutines, sans thread dédié. Les conseils, qui
+# peuvent coûter quelques millisecondes de calcul, sont exécutés hors de
+# la boucle d'événements pour ne pas retarder les autres parties.
+# -------------------------------------------------------------------
+
+class PartieAsync(Partie):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.revenu = asyncio.Event()  # Signale le retour d'un joueur absent à la coroutine des tours
+
+    async def demarrer(self):
+        # -------------------------------------------------------------------
+        # Démarre la partie, dès que le nombre requis de joueurs est atteint.
+        # -------------------------------------------------------------------
+        self.game_started = True
+        self.noter_debut()
+
+        try:
+            self.broadcast(encoder(Code.DEBUT_PARTIE))
+            await self.tour()
+            self.noter_fin()
+        finally:
+            self.terminee = True
+
+    async def tour(self):
+        # -------------------------------------------------------------------
+        # Fait jouer chaque joueur à tour de rôle jusqu'à la fin de la partie.
+        # -------------------------------------------------------------------
+        while self.current_turn < self.max_turns * len(self.players) and not self.est_abandonnee():
+            if await self.attendre_retour(self.players[self.current_turn % len(self.players)]):
+                connexion, player_name = self.joueur_courant()
+                await self.jouer_tour(connexion, player_name)
+            else:
+                self.passer_tour()
+            self.current_turn += 1
+
+        if self.current_turn >= self.max_turns * len(self.players):
+            self.annoncer_vainqueur()
+
+    def signaler_retour(self):
+        self.revenu.set()
+
+    async def attendre_retour(self, player):
+        while self._absent(player):
+            restant = player['depart'] + self.delai_reconnexion - time.monotonic()
+            if restant <= 0:
+                return False
+            self.revenu.clear()
+            try:
+                await asyncio.wait_for(self.revenu.wait(), restant)
+            except asyncio.TimeoutError:
+                pass
+        return True
+
+    def calculer(self, fonction, *arguments):
+        return (yield Calcul(fonction, *arguments))  # Exécuté par ConnexionAsync.executer
+
+    async def jouer_tour(self, connexion, player_name):
+        await connexion.executer(self.deroulement_tour(connexion, player_name), time.monotonic() + self.delai_tour)
+
+
+# -------------------------------------------------------------------
+# Classe représentant le serveur Yahtzee en mode asyncio.
+#
+# Toutes les connexions (jeu et chat) et toutes les parties tournent sur
+# une seule boucle d'événements avec des flux non bloquants : une
+# connexion inactive ne coûte qu'un objet transport, sans thread. Le
+# déroulement (C/R, nombre de joueurs, relances, figures) est le même
+# que celui du serveur threadé.
+# -------------------------------------------------------------------
+
+class YahtzeeServerAsync(YahtzeeServer):
+
+    def creer_partie(self, player_name, connexion, required_players):
+        return PartieAsync(player=player_name, connexion=connexion, required_players=required_players,
+                           conseiller=self.conseiller, delai_tour=self.delai_tour,
+                           delai_reconnexion=self.delai_reconnexion, journal=self.journal,
+                           statistiques=self.statistiques, rejeu=self.rejeu, graine=self.graine)
+
+    # -------------------------------------------------------------------
+    # Gère la connexion d'un joueur : accueil, puis, s'il a complété une
+    # partie, les tours de cette partie.
+    #
+    # :param reader: Flux de lecture du joueur.
+    # :param writer: Flux d'écriture du joueur.
+    # -------------------------------------------------------------------
+
+    async def gerer_joueur(self, reader, writer):
+        connexion = ConnexionAsync(reader, writer, self.delai_reponse)
+        try:
+            partie = await connexion.executer(self.accueil(connexion))
+            if partie is not None:
+                await partie.demarrer()
+        except (BrokenPipeError, ConnectionResetError):
+            print(f"Le joueur à l'adresse {connexion.adresse} s'est déconnecté.")
+            connexion.fermer()
+
+    async def servir(self):
+        # -------------------------------------------------------------------
+        # Ouvre les serveurs de jeu et de chat et les sert indéfiniment.
+        # -------------------------------------------------------------------
+        serveur_jeu = await asyncio.start_server(self.gerer_joueur, self.host, self.port, backlog=1024)
+        chat_server = ChatServerAsync(self.salon, self.host, self.port + 1)
+        serveur_chat = await chat_server.ouvrir()
+        print(f"Le serveur Yahtzee (asyncio) est en écoute sur {self.host}:{self.port}")
+        # Les tâches des parties reprises sont gardées : la boucle n'en tient qu'une référence faible.
+        self.restaurees = [asyncio.ensure_future(partie.demarrer()) for partie in self.restaurer_parties()]
+        async with serveur_jeu, serveur_chat:
+            await asyncio.gather(serveur_jeu.serve_forever(), serveur_chat.serve_forever(), self.recolter())
+
+    async def recolter(self):
+        # -------------------------------------------------------------------
+        # Retire périodiquement les parties terminées ou abandonnées.
+        # -------------------------------------------------------------------
+        while True:
+            await asyncio.sleep(PERIODE_RECOLTE)
+            self.supprimer_partie_si_terminee()
+
+    def demarrer(self):
+        self.server_socket.close()  # Le socket du mode threadé n'est pas utilisé.
+        self.servir_mesures()  # Dans un thread à part : la boucle d'événements n'est jamais bloquée
+        asyncio.run(self.servir())
+
+
+# -------------------------------------------------------------------
+# Serveur de chat sur la même boucle d'événements : chaque message est
+# relayé aux autres joueurs de la partie de l'expéditeur, comme dans
+# ChatServer, par les files sortantes des membres (utils.Chat).
+# -------------------------------------------------------------------
+
+class ChatServerAsync:
+
+    def __init__(self, salon, host='127.0.0.1', port=65431):
+        self.salon = salon  # Sessions des joueurs
+        self.host = host
+        self.port = port
+
+    async def ouvrir(self):
+        server = await asyncio.start_server(self.gerer_chat, self.host, self.port, backlog=1024)
+        print(f"Le serveur de chat (asyncio) est en écoute sur {self.host}:{self.port}")
+        return server
+
+    async def gerer_chat(self, reader, writer):
+        addr = writer.get_extra_info('peername')
+        membre = None
+        try:
+            session = self.salon.session(await lire_trame_async(reader))  # Première trame : le jeton de session.
+            if session is None:
+                print(f"Jeton de chat inconnu depuis {addr}.")
+                return
+            membre = MembreChatAsync(writer, session.nom)
+            self.salon.rattacher_chat(session, membre)
+            while True:
+                data = await lire_trame_async(reader)
+                MESSAGES_CHAT.ajouter()
+                if session.partie is not None:  # Relaye aux joueurs de la même partie.
+                    session.partie.chat.diffuser(membre, f'{session.nom}: {data.decode()}')
+        except (ConnectionResetError, UnicodeDecodeError):
+            print(f"Le client à l'adresse {addr} s'est déconnecté.")
+        finally:
+            if membre is not None:
+                self.salon.detacher_chat(session, membre)
+                membre.fermer()
+            else:
+                writer.close()
@@ -0,0 +1,407 @@
+import json
+import multiprocessing
+import os
+import socket
+import threading
+
+from server.server import YahtzeeServer
+from utils.Connexion import DELAI_REPONSE, Connexion
+from utils.Conseiller import Conseiller
+from utils.Echeancier import Echeancier
+from utils.Partie import DELAI_RECONNEXION, DELAI_TOUR, TOURS, Partie
+from utils.Solveur import CHEMIN_PAR_DEFAUT, TablePolitique
+from utils.Rejeu import EcrivainRejeu
+from utils.Statistiques import Statistiques
+
+TAILLE_MESSAGE = 65536  # Taille maximale d'un message entre processus
+MAX_JOUEURS = 255  # Sockets transmis au plus avec une table (nombre de joueurs sur un octet)
+
+
+# -------------------------------------------------------------------
+# Serveur réparti sur plusieurs processus, pour occuper tous les cœurs.
+#
+# Le processus d'accueil accepte toutes les connexions (jeu et chat),
+# mène l'accueil et tient le salon : c'est l'annuaire de toutes les
+# parties, qui peuvent donc être listées (R) quel que soit le processus
+# qui les joue. Dès qu'une partie est complète, ses joueurs sont confiés
+# au processus de jeu le moins chargé : leurs sockets lui sont transmis
+# (SCM_RIGHTS) avec la composition de la table, sur un canal Unix propre
+# à chaque processus. La partie y est jouée entièrement (tours, conseils,
+# tableaux de scores), hors du GIL du processus d'accueil ; le processus
+# de jeu rend compte de son avancement (tour, fin) sur le même canal,
+# pour la liste des parties et leur récolte.
+#
+# Un joueur déconnecté revient par le processus d'accueil, qui
+# authentifie son jeton puis transmet son nouveau socket au processus de
+# jeu de sa partie, par le même canal. Si sa place est perdue entre-temps,
+# le processus de jeu rend le socket et l'accueil reprend du début.
+# -------------------------------------------------------------------
+
+class PartieDeleguee(Partie):
+    # -------------------------------------------------------------------
+    # Partie vue du processus d'accueil : elle réunit ses joueurs, puis
+    # est jouée par un processus de jeu.
+    #
+    # :param deleguer: Fonction (partie) qui confie la partie complète à
+    #                  un processus de jeu.
+    # -------------------------------------------------------------------
+
+    def __init__(self, deleguer, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.deleguer = deleguer
+        self.processus = None  # Processus de jeu qui joue la partie, une fois confiée
+
+    def demarrer(self):
+        self.game_started = True
+        self.deleguer(self)
+
+    def peut_observer(self):
+        return False  # Les changements de la partie restent dans le processus de jeu
+
+    def reprendre(self, nom, connexion):
+        if not self.game_started:
+            return super().reprendre(nom, connexion)
+        # Les places sont dans le processus de jeu : le joueur y est transmis.
+        return self.processus is not None and self.processus.reprendre(self, nom, connexion)
+
+    def est_abandonnee(self):
+        return not self.players  # Une fois confiée, seule la fin rapportée la retire
+
+
+class PartieSuivie(Partie):
+    # -------------------------------------------------------------------
+    # Partie jouée dans un processus de jeu, qui rend compte de son
+    # avancement au processus d'accueil.
+    #
+    # :param canal: Canal vers le processus d'accueil.
+    # -------------------------------------------------------------------
+
+    def __init__(self, canal, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.canal = canal
+
+    def rapporter(self, **rapport):
+        try:
+            self.canal.send(json.dumps({'partie': self.identifiant, **rapport}).encode())
+        except OSError:
+            pass  # Processus d'accueil arrêté
+
+    def joueur_courant(self):
+        self.rapporter(tour=self.current_turn)
+        return super().joueur_courant()
+
+    def demarrer(self):
+        try:
+            super().demarrer()
+        finally:
+            self.rapporter(fin=True)
+            self.fermer()  # Pas de récolteur dans un processus de jeu
+
+
+def servir_parties(canal, options):
+    # -------------------------------------------------------------------
+    # Boucle principale d'un processus de jeu : reçoit les tables
+    # complètes et joue chacune dans son thread, et rend leur place aux
+    # joueurs revenus (voir ProcessusJeu.reprendre).
+    #
+    # :param canal: Canal vers le processus d'accueil.
+    # :param options: Réglages du serveur (chemin_politique, delai_reponse,
+    #                 delai_tour, delai_reconnexion, statistiques, rejeu,
+    #                 graine).
+    # -------------------------------------------------------------------
+    conseiller = Conseiller(TablePolitique.ouvrir(options['chemin_politique']))
+    echeancier = Echeancier()
+    # Chaque processus de jeu a son rédacteur ; SQLite sérialise leurs transactions.
+    statistiques = Statistiques(options['statistiques']) if options['statistiques'] is not None else None
+    # Les rejeux d'une partie partent en une écriture en mode ajout : le fichier est partagé tel quel.
+    rejeu = EcrivainRejeu(options['rejeu']) if options['rejeu'] is not None else None
+    parties = {}  # Identifiant -> partie en cours dans ce processus
+
+    def connecter(descripteur, tampon):
+        client_socket = socket.socket(fileno=descripteur)
+        try:
+            adresse = client_socket.getpeername()
+        except OSError:
+            adresse = None
+        connexion = Connexion(client_socket, adresse, echeancier, options['delai_reponse'])
+        connexion.lecteur.tampon += bytes.fromhex(tampon)
+        return connexion
+
+    def jouer(partie):
+        try:
+            partie.demarrer()
+        finally:
+            parties.pop(partie.identifiant, None)
+
+    def reprendre(identifiant, nom, connexion):
+        partie = parties.get(identifiant)
+        if partie is None or not partie.reprendre(nom, connexion):
+            rendre(canal, identifiant, connexion)
+
+    while True:
+        recu = recevoir(canal, MAX_JOUEURS)
+        if recu is None:
+            return  # Processus d'accueil arrêté
+        table, descripteurs = recu
+        if 'reprise' in table:
+            # Rendre le socket attend ses derniers envois : la boucle continue de recevoir pendant ce temps.
+            connexion = connecter(descripteurs[0], table['tampon'])
+            threading.Thread(target=reprendre, args=(table['partie'], table['reprise'], connexion),
+                             daemon=True).start()
+            continue
+        partie = None
+        for nom, descripteur, tampon in zip(table['noms'], descripteurs, table['tampons']):
+            connexion = connecter(descripteur, tampon)
+            if partie is None:
+                partie = PartieSuivie(canal, required_players=table['requis'], player=nom, connexion=connexion,
+                                      conseiller=conseiller, delai_tour=options['delai_tour'],
+                                      delai_reconnexion=options['delai_reconnexion'], statistiques=statistiques,
+                                      rejeu=rejeu, graine=options['graine'])
+            else:
+                partie.rejoindre_partie(nom, connexion)
+        partie.identifiant = table['partie']
+        parties[partie.identifiant] = partie
+        threading.Thread(target=jouer, args=(partie,), daemon=True).start()
+
+
+def envoyer(canal, message, sockets):
+    # -------------------------------------------------------------------
+    # Envoie un message JSON sur un canal, avec les sockets qu'il
+    # accompagne.
+    #
+    # :raise ValueError: Si le message dépasse TAILLE_MESSAGE (il serait
+    #                    tronqué à la réception).
+    # :raise OSError: Si l'autre processus est arrêté.
+    # -------------------------------------------------------------------
+    donnees = json.dumps(message).encode()
+    if len(donnees) > TAILLE_MESSAGE:
+        raise ValueError(f"Message trop long ({len(donnees)} octets)")
+    socket.send_fds(canal, [donnees], [client_socket.fileno() for client_socket in sockets])
+
+
+def recevoir(canal, max_descripteurs):
+    # -------------------------------------------------------------------
+    # Reçoit le prochain message JSON d'un canal, avec ses descripteurs.
+    # Un message illisible (tronqué ou mal formé) est ignoré et ses
+    # descripteurs sont fermés : il ne doit pas arrêter le processus.
+    #
+    # :return: (message, descripteurs), ou None si le canal est fermé.
+    # -------------------------------------------------------------------
+    while True:
+        try:
+            donnees, descripteurs, drapeaux, _ = socket.recv_fds(canal, TAILLE_MESSAGE, max_descripteurs)
+        except OSError:
+            return None
+        if not donnees:
+            return None
+        try:
+            if drapeaux & (socket.MSG_TRUNC | socket.MSG_CTRUNC):
+                raise ValueError("message tronqué")
+            return json.loads(donnees), descripteurs
+        except ValueError as erreur:
+            print(f"Message ignoré ({len(donnees)} octets) : {erreur}")
+            for descripteur in descripteurs:
+                os.close(descripteur)
+
+
+def rendre(canal, identifiant, connexion):
+    # -------------------------------------------------------------------
+    # Rend au processus d'accueil le socket d'un joueur qui n'a pas
+    # retrouvé sa place : il y recommence l'accueil.
+    # -------------------------------------------------------------------
+    detachee = connexion.detacher()
+    if detachee is None:
+        return  # Le joueur est reparti
+    client_socket, tampon = detachee
+    try:
+        envoyer(canal, {'partie': identifiant, 'rendu': tampon.hex()}, [client_socket])
+    except (OSError, ValueError):
+        pass  # Processus d'accueil arrêté, ou octets en attente trop nombreux
+    finally:
+        client_socket.close()
+
+
+class ProcessusJeu:
+    # -------------------------------------------------------------------
+    # Processus de jeu, vu du processus d'accueil.
+    #
+    # Le canal est un socketpair SOCK_SEQPACKET : chaque envoi est un
+    # message entier, et les sockets transmis accompagnent le message de
+    # leur table.
+    #
+    # :param numero: Numéro du processus (pour les messages du serveur).
+    # :param options: Réglages transmis à servir_parties.
+    # :param accueillir: Fonction (socket, adresse, octets déjà reçus) qui
+    #                    recommence l'accueil d'un joueur rendu par le
+    #                    processus de jeu (appelée dans un nouveau thread).
+    # -------------------------------------------------------------------
+
+    def __init__(self, numero, options, accueillir):
+        self.numero = numero
+        self.accueillir = accueillir
+        self.canal, canal_fils = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self.processus = multiprocessing.get_context('fork').Process(
+            target=servir_parties, args=(canal_fils, options), name=f"yahtzee-jeu-{numero}", daemon=True)
+        self.processus.start()
+        canal_fils.close()
+        self.parties = {}  # Identifiant -> partie confiée, pas encore terminée
+        self.verrou = threading.Lock()
+
+    def charge(self):
+        return len(self.parties)
+
+    def confier(self, partie):
+        # -------------------------------------------------------------------
+        # Transmet les joueurs d'une partie complète au processus de jeu.
+        #
+        # Chaque connexion est détachée après l'envoi de ses derniers
+        # messages ; les octets déjà reçus sont transmis avec le socket.
+        # -------------------------------------------------------------------
+        with self.verrou:
+            self.parties[partie.identifiant] = partie  # Compte dans la charge dès maintenant
+        noms, sockets, tampons = [], [], []
+        for player in partie.players:
+            detachee = player['connexion'].detacher()  # None si le joueur est parti entre-temps
+            if detachee is not None:
+                noms.append(player['name'])
+                sockets.append(detachee[0])
+                tampons.append(detachee[1].hex())
+        if not sockets:
+            self._oublier(partie)
+            return
+        message = {'partie': partie.identifiant, 'requis': partie.required_players,
+                   'noms': noms, 'tampons': tampons}
+        try:
+            envoyer(self.canal, message, sockets)
+        except ValueError as erreur:
+            print(f"La partie {partie.identifiant} ne peut pas être confiée : {erreur}.")
+            self._oublier(partie)
+        except OSError:
+            print(f"Le processus de jeu {self.numero} ne répond plus : la partie {partie.identifiant} est perdue.")
+            self._oublier(partie)
+        finally:
+            for client_socket in sockets:
+                client_socket.close()  # Le processus de jeu en a sa propre copie
+
+    def reprendre(self, partie, nom, connexion):
+        # -------------------------------------------------------------------
+        # Transmet au processus de jeu la nouvelle connexion d'un joueur
+        # revenu (jeton déjà vérifié par le salon), avec les octets déjà
+        # reçus.
+        #
+        # :return: True si la connexion a été transmise.
+        # -------------------------------------------------------------------
+        with self.verrou:
+            if partie.identifiant not in self.parties:
+                return False  # Partie terminée, ou pas encore transmise
+        detachee = connexion.detacher()
+        if detachee is None:
+            return False
+        client_socket, tampon = detachee
+        try:
+            envoyer(self.canal, {'partie': partie.identifiant, 'reprise': nom, 'tampon': tampon.hex()},
+                    [client_socket])
+            return True
+        except (OSError, ValueError):
+            return False
+        finally:
+            client_socket.close()
+
+    def _oublier(self, partie):
+        with self.verrou:
+            self.parties.pop(partie.identifiant, None)
+        partie.terminee = True
+
+    def suivre(self):
+        # -------------------------------------------------------------------
+        # Tient à jour les parties confiées d'après les comptes rendus du
+        # processus de jeu (à exécuter dans un thread).
+        # -------------------------------------------------------------------
+        while True:
+            recu = recevoir(self.canal, 1)
+            if recu is None:
+                break
+            rapport, descripteurs = recu
+            if 'rendu' in rapport:
+                self._accueillir_rendu(descripteurs[0], bytes.fromhex(rapport['rendu']))
+                continue
+            with self.verrou:
+                partie = self.parties.get(rapport['partie'])
+                if rapport.get('fin'):
+                    self.parties.pop(rapport['partie'], None)
+            if partie is None:
+                continue
+            if 'tour' in rapport:
+                partie.current_turn = rapport['tour']
+                TOURS.ajouter()  # Les autres mesures des tours restent dans le processus de jeu
+            if rapport.get('fin'):
+                partie.terminee = True  # La partie sera retirée au prochain passage du récolteur
+
+        print(f"Le processus de jeu {self.numero} s'est arrêté.")
+        with self.verrou:
+            perdues, self.parties = list(self.parties.values()), {}
+        for partie in perdues:
+            partie.terminee = True
+
+    def _accueillir_rendu(self, descripteur, tampon):
+        # Le joueur a perdu sa place : l'accueil reprend à sa question du nom.
+        client_socket = socket.socket(fileno=descripteur)
+        try:
+            adresse = client_socket.getpeername()
+        except OSError:
+            client_socket.close()
+            return
+        threading.Thread(target=self.accueillir, args=(client_socket, adresse, tampon), daemon=True).start()
+
+
+class YahtzeeServerMulti(YahtzeeServer):
+    # -------------------------------------------------------------------
+    # Processus d'accueil du serveur réparti.
+    #
+    # :param processus: Nombre de processus de jeu (par défaut, un par cœur).
+    # :param options: Réglages de YahtzeeServer, transmis aussi aux
+    #                 processus de jeu.
+    # -------------------------------------------------------------------
+
+    def __init__(self, processus=None, chemin_politique=CHEMIN_PAR_DEFAUT, delai_reponse=DELAI_REPONSE,
+                 delai_tour=DELAI_TOUR, delai_reconnexion=DELAI_RECONNEXION, statistiques=None, rejeu=None,
+                 graine=None, **options):
+        super().__init__(chemin_politique=chemin_politique, delai_reponse=delai_reponse, delai_tour=delai_tour,
+                         delai_reconnexion=delai_reconnexion, **options)
+        self.nb_processus = processus or os.cpu_count() or 1
+        self.options = {'chemin_politique': chemin_politique, 'delai_reponse': delai_reponse,
+                        'delai_tour': delai_tour, 'delai_reconnexion': delai_reconnexion,
+                        'statistiques': statistiques, 'rejeu': rejeu, 'graine': graine}
+        self.processus_jeu = []
+
+    def creer_partie(self, player_name, connexion, required_players):
+        return PartieDeleguee(self.deleguer, player=player_name, connexion=connexion,
+                              required_players=required_players, conseiller=self.conseiller,
+                              delai_tour=self.delai_tour, delai_reconnexion=self.delai_reconnexion)
+
+    def demarrer(self):
+        # Les processus de jeu sont créés avant le moindre thread du processus d'accueil.
+        self.processus_jeu = [ProcessusJeu(numero, self.options, self.accueillir_rendu)
+                              for numero in range(self.nb_processus)]
+        for processus in self.processus_jeu:
+            threading.Thread(target=processus.suivre, daemon=True).start()
+        print(f"{self.nb_processus} processus de jeu démarrés.")
+        super().demarrer()
+
+    def deleguer(self, partie):
+        # -------------------------------------------------------------------
+        # Confie une partie complète au processus de jeu le moins chargé.
+        # -------------------------------------------------------------------
+        processus = min(self.processus_jeu, key=ProcessusJeu.charge)
+        print(f"La partie {partie.identifiant} est confiée au processus de jeu {processus.numero}.")
+        partie.processus = processus
+        processus.confier(partie)
+
+    def accueillir_rendu(self, client_socket, adresse, tampon):
+        # -------------------------------------------------------------------
+        # Recommence l'accueil d'un joueur revenu trop tard, que le processus
+        # de jeu a rendu (à exécuter dans un thread).
+        # -------------------------------------------------------------------
+        connexion = Connexion(client_socket, adresse, self.echeancier, self.delai_reponse)
+        connexion.lecteur.tampon += tampon
+        self.accueillir(connexion, adresse)
@@ -0,0 +1,40 @@
+from itertools import product
+
+import pytest
+
+import utils.CalculateurDeScore as module_calculateur
+from utils.CalculateurDeScore import CalculateurDeScore, FIGURES, _CALCULATEURS
+
+# Les 6^5 = 7776 lancers ordonnés de cinq dés.
+TOUS_LES_LANCERS = [list(lancer) for lancer in product(range(1, 7), repeat=5)]
+
+
+def scores_attendus(lancer):
+    # Scores des 13 figures calculés par les méthodes scalaires calculer_*.
+    return tuple(calculer(lancer) for calculer in _CALCULATEURS)
+
+
+def test_lot_numpy_identique_aux_methodes_scalaires():
+    np = pytest.importorskip("numpy")
+    scores = CalculateurDeScore.calculer_scores_lot(np.array(TOUS_LES_LANCERS))
+    assert scores.shape == (len(TOUS_LES_LANCERS), len(FIGURES))
+    for lancer, ligne in zip(TOUS_LES_LANCERS, scores.tolist()):
+        assert tuple(ligne) == scores_attendus(lancer), lancer
+
+
+def test_lot_sans_numpy_identique_aux_methodes_scalaires(monkeypatch):
+    monkeypatch.setattr(module_calculateur, "np", None)
+    scores = CalculateurDeScore.calculer_scores_lot(TOUS_LES_LANCERS)
+    assert len(scores) == len(TOUS_LES_LANCERS)
+    for lancer, ligne in zip(TOUS_LES_LANCERS, scores):
+        assert tuple(ligne) == scores_attendus(lancer), lancer
+
+
+@pytest.mark.parametrize("sans_numpy", [False, True])
+def test_lot_invalide_rejete(monkeypatch, sans_numpy):
+    if sans_numpy:
+        monkeypatch.setattr(module_calculateur, "np", None)
+    elif module_calculateur.np is None:
+        pytest.skip("NumPy non installé")
+    with pytest.raises(ValueError):
+        CalculateurDeScore.calculer_scores_lot([[1, 2, 3, 4, 7]])
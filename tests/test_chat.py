@@ -0,0 +1,72 @@
+import queue
+import socket
+
+from utils.Chat import PERTES_MAX, TAILLE_FILE, MembreChat, SalleChat, _Membre
+from utils.Trames import LecteurTrames, encoder_trame
+
+
+class MembreMuet(_Membre):
+    # Client qui ne lit jamais : sa file n'est pas vidée.
+
+    def __init__(self, nom):
+        super().__init__(nom)
+        self.file = queue.Queue(maxsize=TAILLE_FILE)
+
+    def fermer(self):
+        self.ferme = True
+
+    def recus(self):
+        trames = []
+        while not self.file.empty():
+            trames.append(self.file.get_nowait())
+        return trames
+
+
+def test_message_relaye_aux_autres_membres_de_la_salle():
+    salle, autre_salle = SalleChat(), SalleChat()
+    alice, bob, chloe = MembreMuet('Alice'), MembreMuet('Bob'), MembreMuet('Chloé')
+    salle.ajouter(alice)
+    salle.ajouter(bob)
+    salle.ajouter(bob)  # Sans doublon
+    autre_salle.ajouter(chloe)
+
+    salle.diffuser(alice, "Alice : bonjour")
+    assert bob.recus() == [encoder_trame("Alice : bonjour".encode())]
+    assert alice.recus() == [] and chloe.recus() == []
+
+    salle.retirer(bob)
+    salle.diffuser(alice, "Alice : au revoir")
+    assert bob.recus() == []
+
+
+def test_client_lent_perd_des_messages_puis_est_deconnecte():
+    membre = MembreMuet('Lent')
+    for _ in range(TAILLE_FILE + PERTES_MAX):
+        membre.deposer(b"x")
+    assert not membre.ferme and membre.pertes == PERTES_MAX  # File pleine : les messages en trop sont perdus
+    membre.deposer(b"x")
+    assert membre.ferme
+    assert len(membre.recus()) == TAILLE_FILE
+
+
+def test_pertes_remises_a_zero_quand_le_client_lit():
+    membre = MembreMuet('Lent')
+    for _ in range(TAILLE_FILE + PERTES_MAX):
+        membre.deposer(b"x")
+    membre.file.get_nowait()  # Le client lit un message
+    membre.deposer(b"y")
+    assert membre.pertes == 0 and not membre.ferme
+
+
+def test_membre_sur_socket_envoie_puis_se_ferme():
+    serveur, client = socket.socketpair()
+    membre = MembreChat(serveur, 'Alice')
+    try:
+        membre.deposer(encoder_trame(b"Bob : salut"))
+        client.settimeout(5)
+        assert LecteurTrames(client).lire() == b"Bob : salut"
+    finally:
+        membre.fermer()
+    assert client.recv(1) == b""  # Le socket du membre est fermé
+    membre.deposer(encoder_trame(b"perdu"))  # Sans effet une fois fermé
+    client.close()
@@ -0,0 +1,50 @@
+from collections import Counter
+
+import pytest
+
+from utils.Des import FACES, SourceAleatoire, SourceScriptee, SourceTampon, source_partie
+
+# Seuil du khi-deux à 5 degrés de liberté pour un risque de 0,1 %.
+KHI_DEUX_5_DDL = 20.52
+
+
+def test_source_scriptee_sert_les_des_dans_l_ordre():
+    source = SourceScriptee([1, 2, 3, 4, 5, 6, 6, 6])
+    assert source.lancer(5) == [1, 2, 3, 4, 5]
+    assert source.lancer(3) == [6, 6, 6]
+    with pytest.raises(ValueError):
+        source.lancer(1)
+
+
+def test_meme_graine_memes_des():
+    for fabrique in (SourceAleatoire, SourceTampon):
+        assert fabrique(42).lancer(500) == fabrique(42).lancer(500)
+    assert source_partie(42, 1).lancer(500) == source_partie(42, 1).lancer(500)
+    # Les parties d'un même serveur ne jouent pas les mêmes dés.
+    assert source_partie(42, 1).lancer(500) != source_partie(42, 2).lancer(500)
+
+
+def test_tampon_sans_graine_donne_des_faces():
+    assert set(SourceTampon().lancer(1000)) <= set(FACES)
+
+
+def test_tampon_chaque_octet_garde_une_seule_fois():
+    # Les 256 valeurs d'octet, tirées une fois : les 252 gardées donnent chaque face 42 fois.
+    source = SourceTampon(taille=256)
+    source.octets = lambda taille: bytes(range(taille))
+    assert Counter(source.lancer(252)) == {face: 42 for face in FACES}
+    assert len(source.tampon) == 252  # Les octets 252 à 255 ont été écartés
+
+
+def test_tampon_garde_le_reste_entre_deux_remplissages():
+    source = SourceTampon(taille=7)
+    source.octets = lambda taille: bytes(range(taille))
+    assert source.lancer(5) + source.lancer(5) == [1, 2, 3, 4, 5, 6, 1, 1, 2, 3]
+
+
+def test_tampon_faces_equiprobables():
+    nombre = 60000
+    effectifs = Counter(SourceTampon(1234).lancer(nombre))
+    attendu = nombre / len(FACES)
+    khi_deux = sum((effectifs[face] - attendu) ** 2 / attendu for face in FACES)
+    assert khi_deux < KHI_DEUX_5_DDL
@@ -0,0 +1,85 @@
+import os
+
+from server.server import YahtzeeServer
+from utils.CalculateurDeScore import FIGURES
+from utils.Journal import Journal
+
+JETON = bytes(range(16))
+AUTRE_JETON = bytes(16)
+
+
+def journal_d_une_partie(dossier):
+    # Partie 1 interrompue au deuxième tour, partie 2 terminée.
+    journal = Journal(dossier)
+    journal.debut(1, 13, [('Zoé', JETON), ('Bob', AUTRE_JETON)])
+    journal.des(1, 0, [6, 6, 6, 2, 1])
+    journal.score(1, 0, FIGURES.index('Brelan'), 21)
+    journal.passe(1)
+    journal.des(1, 1, [3, 3, 4, 5, 6])
+    journal.debut(2, 13, [('Ana', AUTRE_JETON)])
+    journal.fin(2)
+    assert journal.vider(5)
+    return journal
+
+
+def test_partie_inachevee_relue_apres_redemarrage(tmp_path):
+    journal_d_une_partie(str(tmp_path))
+
+    journal = Journal(str(tmp_path))
+    (etat,) = journal.inachevees
+    assert (etat.identifiant, etat.tours_max) == (1, 13)
+    assert etat.joueurs == [('Zoé', JETON), ('Bob', AUTRE_JETON)]
+    assert etat.scores == [(0, FIGURES.index('Brelan'), 21)]
+    assert etat.tour == 2
+    assert etat.des == (1, [3, 3, 4, 5, 6])
+    assert journal.dernier_identifiant == 2
+
+
+def test_compactage_garde_l_etat_d_un_redemarrage_a_l_autre(tmp_path):
+    journal_d_une_partie(str(tmp_path))
+    Journal(str(tmp_path))
+
+    (etat,) = Journal(str(tmp_path)).inachevees
+    assert (etat.tour, etat.scores, etat.des) == (2, [(0, FIGURES.index('Brelan'), 21)], (1, [3, 3, 4, 5, 6]))
+    assert len(os.listdir(tmp_path)) == 1  # Un seul segment : les parties terminées ont disparu
+
+
+def test_enregistrement_tronque_ignore(tmp_path):
+    journal = journal_d_une_partie(str(tmp_path))
+    journal.score(1, 1, FIGURES.index('Chance'), 21)
+    assert journal.vider(5)
+    (segment,) = os.listdir(tmp_path)
+    chemin = os.path.join(tmp_path, segment)
+    os.truncate(chemin, os.path.getsize(chemin) - 1)  # Arrêt au milieu de la dernière écriture
+
+    (etat,) = Journal(str(tmp_path)).inachevees
+    assert etat.tour == 2 and etat.des == (1, [3, 3, 4, 5, 6])
+
+
+def test_nom_accentue_trop_long_relu_apres_redemarrage(tmp_path):
+    journal = Journal(str(tmp_path))
+    journal.debut(1, 13, [('é' * 200, JETON), ('Zoé', bytes(16))])
+    assert journal.vider(5)
+
+    (etat,) = Journal(str(tmp_path)).inachevees
+    assert etat.joueurs == [('é' * 127, JETON), ('Zoé', bytes(16))]
+
+
+def test_serveur_restaure_les_parties_du_journal(tmp_path):
+    journal_d_une_partie(str(tmp_path / 'journal'))
+    serveur = YahtzeeServer(journal=str(tmp_path / 'journal'), chemin_politique=str(tmp_path / 'absente'))
+    try:
+        (partie,) = serveur.restaurer_parties()
+    finally:
+        serveur.server_socket.close()
+
+    assert partie.identifiant == 1 and partie.restauree
+    assert [player['name'] for player in partie.players] == ['Zoé', 'Bob']
+    assert partie.feuilles_scores['Zoé'].total == 21
+    assert partie.current_turn == 2
+    assert partie.des_restaures == (1, [3, 3, 4, 5, 6])
+    # Chaque joueur retrouve sa place avec le jeton de sa session d'origine.
+    assert serveur.salon.session(JETON).partie is partie
+    assert serveur.salon.session(AUTRE_JETON).nom == 'Bob'
+    # Les nouvelles parties sont numérotées après celles du journal.
+    assert next(serveur.salon.identifiants) == 3
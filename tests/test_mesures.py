@@ -0,0 +1,73 @@
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from utils.Mesures import TAILLE_LOT, Compteur, Histogramme, Jauge, JaugeCalculee, rendre_mesures, servir_mesures
+
+
+def test_histogramme_cumule_ses_classes():
+    histogramme = Histogramme('test_latence_secondes', "Latence de test", bornes=(0.1, 1.0), phase='tour')
+    for valeur in (0.05, 0.1, 0.5, 2.0):
+        histogramme.observer(valeur)
+    assert list(histogramme.lignes()) == [
+        'test_latence_secondes_bucket{phase="tour",le="0.1"} 2',  # Une borne inclut sa valeur
+        'test_latence_secondes_bucket{phase="tour",le="1.0"} 3',
+        'test_latence_secondes_bucket{phase="tour",le="+Inf"} 4',
+        'test_latence_secondes_sum{phase="tour"} 2.65',
+        'test_latence_secondes_count{phase="tour"} 4',
+    ]
+
+
+def test_famille_rendue_sous_un_seul_en_tete():
+    Compteur('test_messages_total', "Messages de test", sens='recus').ajouter(3)
+    envoyes = Compteur('test_messages_total', "Messages de test", sens='envoyes')
+    envoyes.ajouter()
+    envoyes.ajouter(2)
+    jauge = Jauge('test_connexions', "Connexions de test")
+    jauge.ajouter()
+    jauge.ajouter(-1)
+
+    texte = rendre_mesures()
+    assert texte.count('# TYPE test_messages_total counter') == 1
+    assert ('test_messages_total{sens="recus"} 3\n'
+            'test_messages_total{sens="envoyes"} 3\n') in texte
+    assert '# TYPE test_connexions gauge\ntest_connexions 0\n' in texte
+
+
+def test_jauge_calculee_lue_a_la_demande():
+    jauge = JaugeCalculee('test_parties', "Parties de test", 'etat')
+    assert list(jauge.lignes()) == []  # Sans source, la jauge n'est pas rendue
+    jauge.source = lambda: {'en_cours': 2, 'terminee': 1}
+    assert list(jauge.lignes()) == ['test_parties{etat="en_cours"} 2', 'test_parties{etat="terminee"} 1']
+
+
+def test_enregistrements_concurrents_tous_comptes():
+    compteur = Compteur('test_concurrence_total', "Concurrence de test")
+
+    def enregistrer():
+        for _ in range(10 * TAILLE_LOT):
+            compteur.ajouter()
+
+    threads = [threading.Thread(target=enregistrer) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert compteur.valeur() == 40 * TAILLE_LOT
+
+
+def test_mesures_servies_sur_metrics():
+    Compteur('test_http_total', "HTTP de test").ajouter()
+    serveur = servir_mesures(port=0)
+    adresse = f"http://127.0.0.1:{serveur.server_address[1]}"
+    try:
+        with urllib.request.urlopen(f"{adresse}/metrics", timeout=5) as reponse:
+            assert reponse.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+            assert 'test_http_total 1' in reponse.read().decode()
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"{adresse}/autre", timeout=5)
+    finally:
+        serveur.shutdown()
+        serveur.server_close()
@@ -0,0 +1,82 @@
+import pytest
+
+from utils.CalculateurDeScore import FIGURES
+from utils.Protocole import (AUCUN_JOUEUR, CODECS, ERREUR_DEJA_REMPLIE, ERREUR_TROP_PEU, FIGURE_CONSEIL,
+                             MASQUE_FIGURES, MODE_AUTO, MODE_SPECTATEUR, RELANCE_CONSEIL, Code, ErreurProtocole,
+                             decoder, decoder_reponse, encoder, tronquer_texte)
+
+JETON = bytes(range(16))
+DES = [1, 3, 3, 6, 2]
+VALEURS = bytes(range(len(FIGURES)))
+
+# (code, valeurs encodées, valeur décodée)
+ALLERS_RETOURS = [
+    (Code.DEMANDE_NOM, (), ()),
+    (Code.DEMANDE_NB_JOUEURS, (ERREUR_TROP_PEU,), ERREUR_TROP_PEU),
+    (Code.LISTE_PARTIES, ([(7, 2, 4, 3, 13, True, ['Zoé', 'Bob']), (70000, 0, 2, 0, 13, False, [])],),
+     [(7, 2, 4, 3, 13, True, ['Zoé', 'Bob']), (70000, 0, 2, 0, 13, False, [])]),
+    (Code.ATTENTE, (3,), 3),
+    (Code.VOTRE_TOUR, ('Zoé',), 'Zoé'),
+    (Code.DES, (2, DES), (2, DES)),
+    (Code.CONSEIL_GARDES, ([(0b10110, 24.5), (0, 12.25)],), [(0b10110, 24.5), (0, 12.25)]),
+    (Code.CONSEIL_FIGURE, (12,), 12),
+    (Code.FEUILLE, (MASQUE_FIGURES, VALEURS, 35), (MASQUE_FIGURES, VALEURS, 35)),
+    (Code.DEMANDE_FIGURE, (0b101, ERREUR_DEJA_REMPLIE), (0b101, ERREUR_DEJA_REMPLIE)),
+    (Code.POINTS, (11, 50, 312), (11, 50, 312)),
+    (Code.SCORE_MARQUE, (11, 50, 'Zoé'), (11, 50, 'Zoé')),
+    (Code.CLASSEMENT, ([('Zoé', 312), ('Bob', 0)],), [('Zoé', 312), ('Bob', 0)]),
+    (Code.FIN_PARTIE, ([],), []),
+    (Code.SESSION, (JETON,), JETON),
+    (Code.INSTANTANE, (4, 13, AUCUN_JOUEUR, 1, DES, [('Zoé', 0b11, VALEURS, 0)]),
+     (4, 13, AUCUN_JOUEUR, 1, DES, [('Zoé', 0b11, VALEURS, 0)])),
+    (Code.NOM, ('Zoé',), 'Zoé'),
+    (Code.MODE, (MODE_SPECTATEUR,), MODE_SPECTATEUR),
+    (Code.CHOIX_PARTIE, (70000,), 70000),
+    (Code.RELANCE, (RELANCE_CONSEIL,), RELANCE_CONSEIL),
+    (Code.INDICES, (0b11111,), 0b11111),
+    (Code.FIGURE, (FIGURE_CONSEIL,), FIGURE_CONSEIL),
+    (Code.REPRISE, (JETON,), JETON),
+]
+
+
+def test_nom_accentue_trop_long_tronque_sur_un_caractere():
+    nom = 'é' * 200  # 400 octets en UTF-8 : la coupure à 255 tomberait au milieu d'un caractère
+    code, valeur = decoder(encoder(Code.NOM, nom))
+    assert code == Code.NOM
+    assert valeur == 'é' * 127
+    assert nom.startswith(valeur)
+
+
+def test_tronquer_texte_garde_les_textes_courts():
+    assert tronquer_texte("Zoé") == "Zoé".encode()
+    assert len(tronquer_texte('€' * 100)) == 255
+
+
+
+@pytest.mark.parametrize("code, valeurs, attendu", ALLERS_RETOURS, ids=lambda v: getattr(v, 'name', ''))
+def test_aller_retour(code, valeurs, attendu):
+    assert decoder(encoder(code, *valeurs)) == (code, attendu)
+
+
+def test_chaque_code_a_son_codec():
+    assert set(CODECS) == set(Code)
+
+
+@pytest.mark.parametrize("message", [
+    b"",  # Pas de code
+    bytes((200,)),  # Code inconnu
+    encoder(Code.DES, 0, DES)[:-1],  # Charge utile tronquée
+    encoder(Code.NOM, 'Zoé')[:-1],  # Texte tronqué
+    encoder(Code.CLASSEMENT, [('Zoé', 1)])[:-2],
+])
+def test_message_mal_forme(message):
+    with pytest.raises(ErreurProtocole):
+        decoder(message)
+
+
+def test_reponse_attendue_a_la_question():
+    question = encoder(Code.DEMANDE_NOM)
+    assert decoder_reponse(question, encoder(Code.NOM, 'Zoé')) == 'Zoé'
+    assert decoder_reponse(question, encoder(Code.REPRISE, JETON)) == JETON
+    with pytest.raises(ErreurProtocole):
+        decoder_reponse(question, encoder(Code.MODE, MODE_AUTO))
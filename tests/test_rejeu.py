@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+import utils.Rejeu as module_rejeu
+from utils.CalculateurDeScore import FIGURES
+from utils.Rejeu import EcrivainRejeu, LecteurRejeu, deballer_des, emballer_des, resumer, tour_rejeu
+
+YAHTZEE = FIGURES.index('Yahtzee')
+CHANCE = FIGURES.index('Chance')
+
+# Une partie de deux tours : un Yahtzee en deux relances, puis un Yahtzee sacrifié au premier lancer.
+TOURS = [
+    tour_rejeu(7, 0, 0, [[6, 6, 1, 2, 6], [6, 6, 6, 3, 6], [6, 6, 6, 6, 6]], [0b10011, 0b10111], YAHTZEE, 50),
+    tour_rejeu(7, 0, 1, [[1, 2, 3, 4, 5]], [], YAHTZEE, 0),
+    tour_rejeu(7, 1, 0, [[2, 2, 3, 3, 4], [2, 2, 3, 5, 5]], [0b00011], CHANCE, 17),
+]
+
+
+def ecrire(chemin, *parties):
+    ecrivain = EcrivainRejeu(chemin)
+    for tours in parties:
+        ecrivain.ecrire(tours)
+    ecrivain.fermer()
+
+
+def test_des_emballes_sur_15_bits():
+    assert deballer_des(emballer_des([1, 2, 3, 4, 6])) == [1, 2, 3, 4, 6]
+    assert emballer_des(None) == 0
+    assert emballer_des([6] * 5) < 1 << 15
+
+
+def test_ecriture_puis_lecture(tmp_path):
+    chemin = str(tmp_path / 'rejeux')
+    ecrire(chemin, TOURS[:2])
+    ecrire(chemin, TOURS[2:])  # Réouverture : ajout à la suite
+
+    with LecteurRejeu(chemin) as lecteur:
+        tours = list(lecteur)
+        assert len(lecteur) == 3
+        assert tours[0][:3] == (7, 0, 0)
+        assert [deballer_des(des) for des in tours[0][3:6]] == [[6, 6, 1, 2, 6], [6, 6, 6, 3, 6], [6] * 5]
+        assert tours[1][4:8] == (0, 0, 0, 0)  # Ni relance ni garde
+        assert list(lecteur.filtrer(figure=YAHTZEE, points=0)) == [tours[1]]
+
+
+def test_tour_tronque_retire(tmp_path):
+    chemin = str(tmp_path / 'rejeux')
+    ecrire(chemin, TOURS)
+    with open(chemin, 'ab') as fichier:
+        fichier.write(TOURS[0][:5])  # Arrêt au milieu d'une écriture
+
+    with LecteurRejeu(chemin) as lecteur:
+        assert len(lecteur) == 3  # Le lecteur ignore le tour tronqué
+    ecrire(chemin, TOURS[:1])  # L'écrivain le retire avant d'ajouter
+    with LecteurRejeu(chemin) as lecteur:
+        assert list(lecteur)[-1] == list(lecteur)[0]
+
+
+def test_fichier_etranger_refuse(tmp_path):
+    chemin = tmp_path / 'autre'
+    chemin.write_bytes(b'pas un rejeu')
+    with pytest.raises(ValueError):
+        LecteurRejeu(str(chemin))
+
+
+@pytest.mark.parametrize("avec_numpy", [True, False])
+def test_resume_des_figures(tmp_path, monkeypatch, avec_numpy):
+    if avec_numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(module_rejeu, "np", None)
+    chemin = str(tmp_path / 'rejeux')
+    ecrire(chemin, TOURS)
+
+    with LecteurRejeu(chemin) as lecteur:
+        resume = resumer(lecteur)
+    assert resume['marquees'][YAHTZEE] == 2 and resume['sacrifices'][YAHTZEE] == 1
+    assert resume['marquees'][CHANCE] == 1 and resume['sacrifices'][CHANCE] == 0
+    assert resume['moyennes'] == {(YAHTZEE, 0): 0, (YAHTZEE, 2): 50, (CHANCE, 1): 17}
+    assert os.path.getsize(chemin) == module_rejeu.ENTETE.size + 3 * module_rejeu.TOUR.size
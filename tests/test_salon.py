@@ -0,0 +1,110 @@
+from utils.Partie import Partie
+from utils.Protocole import Code, decoder
+from utils.Salon import Salon
+from utils.Trames import ENTETE
+
+
+class FausseConnexion:
+    # Connexion de jeu qui garde les trames déposées.
+    adresse = None
+
+    def __init__(self):
+        self.trames = []
+        self.fermee = False
+
+    def deposer(self, trame):
+        if self.fermee:
+            raise ConnectionResetError
+        self.trames.append(trame)
+
+    def envoyer(self, *messages):
+        raise AssertionError("Le salon ne doit jamais attendre un joueur")
+
+    def est_fermee(self):
+        return self.fermee
+
+    def fermer(self):
+        self.fermee = True
+
+
+def nouveau_salon():
+    return Salon(lambda nom, connexion, requis: Partie(requis, nom, connexion))
+
+
+def asseoir(salon, nom, requis):
+    session = salon.ouvrir_session(nom, FausseConnexion())
+    return session, salon.placer(session, requis)
+
+
+def test_appariement_par_taille_de_table():
+    salon = nouveau_salon()
+    alice, complete = asseoir(salon, 'Alice', 2)
+    assert complete is None
+    _, autre_table = asseoir(salon, 'Chloé', 3)
+    assert autre_table is None
+    _, complete = asseoir(salon, 'Bob', 2)
+
+    assert complete is alice.partie and complete.identifiant == 1
+    assert [player['name'] for player in complete.players] == ['Alice', 'Bob']
+    assert list(salon.ouvertes) == [2] and list(salon.en_cours) == [1]
+    # Les parties qu'on peut rejoindre sont listées d'abord.
+    assert [resume[0] for resume in salon.resumes()] == [2, 1]
+
+
+def test_places_restantes_annoncees():
+    salon = nouveau_salon()
+    alice, _ = asseoir(salon, 'Alice', 3)
+    asseoir(salon, 'Bob', 3)
+    messages = [decoder(trame[ENTETE.size:]) for trame in alice.connexion.trames]
+    assert messages == [(Code.ATTENTE, 2), (Code.ATTENTE, 1)]
+
+
+def test_nom_unique_a_la_table():
+    salon = nouveau_salon()
+    alice, _ = asseoir(salon, 'Alice', 2)
+    homonyme, _ = asseoir(salon, 'Alice', 2)
+    assert homonyme.partie is not alice.partie  # Une autre table est ouverte à côté
+    assert salon.nom_pris(alice.partie.identifiant, 'Alice')
+
+    intrus = salon.ouvrir_session('Alice', FausseConnexion())
+    assert salon.rejoindre(alice.partie.identifiant, intrus) == (False, None)
+    bob = salon.ouvrir_session('Bob', FausseConnexion())
+    assert salon.rejoindre(alice.partie.identifiant, bob) == (True, alice.partie)
+
+
+def test_recolte_des_parties_terminees_et_abandonnees():
+    salon = nouveau_salon()
+    alice, _ = asseoir(salon, 'Alice', 2)
+    bob, partie = asseoir(salon, 'Bob', 2)
+    chloe, _ = asseoir(salon, 'Chloé', 2)
+    chloe.connexion.fermer()  # Partie ouverte quittée par son seul joueur
+    partie.terminee = True
+
+    assert {retiree.identifiant for retiree in salon.recolter()} == {1, 2}
+    assert salon.parties == {} and salon.ouvertes == {} and salon.en_cours == {}
+    assert alice.connexion.est_fermee() and bob.connexion.est_fermee()
+    assert salon.sessions == {}
+    # Une nouvelle partie garde un identifiant neuf.
+    asseoir(salon, 'Denis', 2)
+    assert list(salon.parties) == [3]
+
+
+def test_reprise_avec_un_jeton_inconnu():
+    salon = nouveau_salon()
+    assert salon.reprendre(bytes(16), FausseConnexion()) is None
+    alice, _ = asseoir(salon, 'Alice', 2)
+    alice.connexion.fermer()
+    salon.recolter()  # Alice a quitté la partie en attente : sa session est oubliée avec la table
+    assert salon.reprendre(alice.jeton, FausseConnexion()) is None
+
+
+def test_reprise_hors_du_verrou():
+    # La partie reprend la connexion sans le verrou du salon (transmission au processus de jeu).
+    salon = nouveau_salon()
+    alice, _ = asseoir(salon, 'Alice', 2)
+    verrou_tenu = []
+    alice.partie.reprendre = lambda nom, connexion: verrou_tenu.append(salon.verrou.locked()) or True
+    nouvelle = FausseConnexion()
+    assert salon.reprendre(alice.jeton, nouvelle) is alice
+    assert verrou_tenu == [False]
+    assert alice.connexion is nouvelle
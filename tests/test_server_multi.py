@@ -0,0 +1,40 @@
+import os
+import socket
+
+import pytest
+
+from server.server_multi import envoyer, recevoir
+
+# Transmission de sockets entre processus : Unix seulement.
+pytestmark = pytest.mark.skipif(not hasattr(socket, "send_fds"), reason="SCM_RIGHTS indisponible")
+
+
+@pytest.fixture
+def canal():
+    accueil, jeu = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+    yield accueil, jeu
+    accueil.close()
+    jeu.close()
+
+
+def test_message_illisible_ignore_et_descripteurs_fermes(canal):
+    accueil, jeu = canal
+    lecture, ecriture = os.pipe()
+    socket.send_fds(accueil, [b"{tronque"], [lecture])
+    os.close(lecture)
+    envoyer(accueil, {'partie': 1, 'fin': True}, [])
+
+    assert recevoir(jeu, 1) == ({'partie': 1, 'fin': True}, [])
+    # Le descripteur du message ignoré a été fermé : la lecture du tube n'a plus de lecteur.
+    with pytest.raises(BrokenPipeError):
+        os.write(ecriture, b"x")
+    os.close(ecriture)
+
+
+def test_message_trop_long_refuse_a_l_envoi(canal):
+    accueil, jeu = canal
+    with pytest.raises(ValueError):
+        envoyer(accueil, {'noms': ['é' * 255] * 255}, [])
+    accueil.close()
+    assert recevoir(jeu, 1) is None  # Rien n'a été envoyé avant la fermeture
+
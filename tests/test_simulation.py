@@ -0,0 +1,19 @@
+import pytest
+
+from utils.Simulation import evaluer_strategies
+
+
+@pytest.mark.parametrize("nb_parties, taille_lot, motif", [
+    (0, 500, "Nombre de parties invalide"),
+    (-1, 500, "Nombre de parties invalide"),
+    (10, 0, "Taille de lot invalide"),
+    (10, -5, "Taille de lot invalide"),
+])
+def test_parametres_invalides_refuses(nb_parties, taille_lot, motif):
+    with pytest.raises(ValueError, match=motif):
+        evaluer_strategies(['glouton'], nb_parties, taille_lot=taille_lot)
+
+
+def test_strategie_inconnue_refusee():
+    with pytest.raises(ValueError, match="Stratégie inconnue"):
+        evaluer_strategies(['inconnue'], 10)
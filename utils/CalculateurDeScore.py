@@ -1,3 +1,11 @@
+from itertools import combinations_with_replacement, product
+
+try:
+    import numpy as np
+except ImportError:  # NumPy est optionnel : repli en Python pur.
+    np = None
+
+
 class CalculateurDeScore:
     # -------------------------------------------------------------------
     # Classe contenant des méthodes statiques pour calculer les scores
@@ -159,3 +167,132 @@ class CalculateurDeScore:
         # :return: Somme des valeurs des dés.
         # -------------------------------------------------------------------
         return sum(des)
+
+    @staticmethod
+    def index_lancer(des: list[int]) -> int:
+        # -------------------------------------------------------------------
+        # Retourne l'indice canonique d'un lancer parmi les 252 lancers
+        # distincts de cinq dés (l'ordre des dés n'a pas d'importance).
+        #
+        # :param des: Liste des valeurs des dés.
+        # :return: Indice du lancer trié dans LANCERS.
+        # :raises ValueError: Si les dés ne forment pas un lancer valide.
+        # -------------------------------------------------------------------
+        try:
+            return _INDEX_PAR_LANCER[tuple(des)]
+        except KeyError:
+            raise ValueError(f"Lancer invalide : {des}") from None
+
+    @staticmethod
+    def scores_for(des: list[int]) -> tuple[int, ...]:
+        # -------------------------------------------------------------------
+        # Retourne les scores des 13 figures pour un lancer, dans l'ordre
+        # de FIGURES, par simple lecture de la table précalculée.
+        #
+        # :param des: Liste des valeurs des dés.
+        # :return: Tuple des 13 scores théoriques.
+        # -------------------------------------------------------------------
+        indice = _INDEX_PAR_LANCER.get(tuple(des))
+        if indice is None:
+            # Lancer hors table (nombre de dés inhabituel) : calcul direct.
+            return tuple(calculer(des) for calculer in _CALCULATEURS)
+        return TABLE_SCORES[indice]
+
+    @staticmethod
+    def score(figure: str, des: list[int]) -> int:
+        # -------------------------------------------------------------------
+        # Retourne le score d'une figure pour un lancer donné.
+        #
+        # :param figure: Nom de la figure (ex : '1', 'Brelan').
+        # :param des: Liste des valeurs des dés.
+        # :return: Score de la figure.
+        # :raises ValueError: Si la figure est inconnue.
+        # -------------------------------------------------------------------
+        try:
+            position = INDEX_FIGURE[figure]
+        except KeyError:
+            raise ValueError(f"Figure inconnue : {figure}") from None
+        return CalculateurDeScore.scores_for(des)[position]
+
+    @staticmethod
+    def calculer_scores_lot(lancers):
+        # -------------------------------------------------------------------
+        # Calcule les scores des 13 figures pour un lot de lancers.
+        #
+        # Avec NumPy, les comptes par face, les suites, le full et le
+        # Yahtzee sont calculés par opérations vectorisées sur tout le lot.
+        # Sans NumPy, chaque lancer est lu dans la table précalculée.
+        #
+        # :param lancers: Tableau (N, 5) d'entiers entre 1 et 6.
+        # :return: Matrice (N, 13) des scores dans l'ordre de FIGURES
+        #          (ndarray avec NumPy, liste de tuples sinon).
+        # :raises ValueError: Si le lot n'est pas un tableau (N, 5) de dés valides.
+        # -------------------------------------------------------------------
+        if np is None:
+            try:
+                return [TABLE_SCORES[_INDEX_PAR_LANCER[tuple(lancer)]] for lancer in lancers]
+            except KeyError:
+                raise ValueError("Le lot doit contenir des lancers de 5 dés entre 1 et 6") from None
+
+        des = np.asarray(lancers, dtype=np.int64)
+        if des.ndim != 2 or des.shape[1] != 5 or (des.size and (des.min() < 1 or des.max() > 6)):
+            raise ValueError("Le lot doit être un tableau (N, 5) de dés entre 1 et 6")
+
+        faces = np.arange(1, 7)
+        comptes = (des[:, :, None] == faces).sum(axis=1)  # (N, 6) : nombre de dés par face
+        presents = comptes > 0
+        somme = des.sum(axis=1)
+        maximum = comptes.max(axis=1)
+        distinctes = presents.sum(axis=1)
+
+        petite_suite = ((presents[:, 0] & presents[:, 1] & presents[:, 2] & presents[:, 3])
+                        | (presents[:, 1] & presents[:, 2] & presents[:, 3] & presents[:, 4])
+                        | (presents[:, 2] & presents[:, 3] & presents[:, 4] & presents[:, 5]))
+        # Cinq faces distinctes sur six : suite si la face manquante est le 1 ou le 6.
+        grande_suite = (distinctes == 5) & ~(presents[:, 0] & presents[:, 5])
+
+        scores = np.empty((des.shape[0], len(FIGURES)), dtype=np.int64)
+        scores[:, :6] = comptes * faces
+        scores[:, 6] = np.where(maximum >= 3, somme, 0)
+        scores[:, 7] = np.where(maximum >= 4, somme, 0)
+        scores[:, 8] = np.where((distinctes == 2) & (maximum == 3), 25, 0)
+        scores[:, 9] = np.where(petite_suite, 30, 0)
+        scores[:, 10] = np.where(grande_suite, 40, 0)
+        scores[:, 11] = np.where(maximum == 5, 50, 0)
+        scores[:, 12] = somme
+        return scores
+
+
+# -------------------------------------------------------------------
+# Table des scores précalculée au chargement du module.
+#
+# Cinq dés ne donnent que 252 lancers distincts une fois triés : on
+# calcule une seule fois les 13 scores de chacun d'eux. Chaque lancer
+# ordonné (6^5 = 7776 possibilités) est associé directement à l'indice
+# de son lancer trié, ce qui évite tout tri lors de la recherche.
+# -------------------------------------------------------------------
+
+# Figures dans l'ordre de FeuilleScore.scores, avec leur méthode de calcul.
+FIGURES = ('1', '2', '3', '4', '5', '6', 'Brelan', 'Carré', 'Full',
+           'Petite suite', 'Grande suite', 'Yahtzee', 'Chance')
+_CALCULATEURS = (
+    CalculateurDeScore.calculer_un,
+    CalculateurDeScore.calculer_deux,
+    CalculateurDeScore.calculer_trois,
+    CalculateurDeScore.calculer_quatre,
+    CalculateurDeScore.calculer_cinq,
+    CalculateurDeScore.calculer_six,
+    CalculateurDeScore.calculer_brelan,
+    CalculateurDeScore.calculer_carre,
+    CalculateurDeScore.calculer_full,
+    CalculateurDeScore.calculer_petite_suite,
+    CalculateurDeScore.calculer_grande_suite,
+    CalculateurDeScore.calculer_yahtzee,
+    CalculateurDeScore.calculer_chance,
+)
+INDEX_FIGURE = {figure: position for position, figure in enumerate(FIGURES)}
+
+LANCERS = list(combinations_with_replacement(range(1, 7), 5))  # Les 252 lancers triés
+TABLE_SCORES = [tuple(calculer(list(lancer)) for calculer in _CALCULATEURS) for lancer in LANCERS]
+_INDEX_TRIE = {lancer: indice for indice, lancer in enumerate(LANCERS)}
+_INDEX_PAR_LANCER = {lancer: _INDEX_TRIE[tuple(sorted(lancer))] for lancer in product(range(1, 7), repeat=5)}
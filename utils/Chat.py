@@ -0,0 +1,166 @@
+import asyncio
+import queue
+import socket
+import threading
+
+from utils.Trames import encoder_trame
+
+TAILLE_FILE = 64  # Messages en attente d'envoi par client
+PERTES_MAX = 32  # Messages perdus d'affilée avant de déconnecter un client trop lent
+
+
+# -------------------------------------------------------------------
+# Chat des parties.
+#
+# Chaque partie a sa salle (SalleChat) : un message n'est relayé qu'aux
+# autres joueurs de la même partie. Le message est encodé une seule fois
+# puis déposé dans la file sortante bornée de chaque destinataire ; un
+# rédacteur propre à chaque client vide sa file vers le réseau. Un client
+# lent ne bloque donc ni l'expéditeur ni les autres membres : quand sa
+# file est pleine, les nouveaux messages lui sont retirés, et il est
+# déconnecté après PERTES_MAX pertes consécutives.
+#
+# - MembreChat : client sur socket bloquant, rédacteur dans un thread.
+# - MembreChatAsync : client sur flux asyncio, rédacteur dans une tâche.
+# -------------------------------------------------------------------
+
+class SalleChat:
+    # -------------------------------------------------------------------
+    # Membres connectés au chat d'une partie.
+    #
+    # Les membres sont gardés dans un tuple remplacé à chaque changement :
+    # une diffusion parcourt l'état courant sans prendre de verrou.
+    # -------------------------------------------------------------------
+
+    def __init__(self):
+        self.membres = ()
+        self.verrou = threading.Lock()
+
+    def ajouter(self, membre):
+        with self.verrou:
+            if membre not in self.membres:
+                self.membres = self.membres + (membre,)
+
+    def retirer(self, membre):
+        with self.verrou:
+            self.membres = tuple(autre for autre in self.membres if autre is not membre)
+
+    def diffuser(self, expediteur, message: str) -> None:
+        # -------------------------------------------------------------------
+        # Relaye un message aux membres de la salle, sauf à l'expéditeur.
+        #
+        # :param expediteur: Membre qui a envoyé le message.
+        # :param message: Texte à relayer, déjà préfixé du nom de l'expéditeur.
+        # -------------------------------------------------------------------
+        trame = encoder_trame(message.encode())
+        for membre in self.membres:
+            if membre is not expediteur:
+                membre.deposer(trame)
+
+
+class _Membre:
+    # -------------------------------------------------------------------
+    # Politique commune de la file sortante d'un client.
+    # -------------------------------------------------------------------
+
+    def __init__(self, nom: str):
+        self.nom = nom
+        self.pertes = 0  # Messages perdus d'affilée
+        self.ferme = False
+
+    def deposer(self, trame: bytes) -> None:
+        # -------------------------------------------------------------------
+        # Dépose une trame dans la file sans jamais attendre.
+        # -------------------------------------------------------------------
+        if self.ferme:
+            return
+        try:
+            self.file.put_nowait(trame)
+        except (queue.Full, asyncio.QueueFull):
+            self.pertes += 1
+            if self.pertes > PERTES_MAX:
+                print(f"Chat : {self.nom} ne lit plus ses messages, déconnexion.")
+                self.fermer()
+            return
+        self.pertes = 0
+
+
+class MembreChat(_Membre):
+    # -------------------------------------------------------------------
+    # Client de chat sur un socket bloquant.
+    #
+    # :param socket: Socket du client.
+    # :param nom: Nom du joueur.
+    # -------------------------------------------------------------------
+
+    def __init__(self, socket, nom: str):
+        super().__init__(nom)
+        self.socket = socket
+        self.file = queue.Queue(maxsize=TAILLE_FILE)
+        threading.Thread(target=self._rediger, daemon=True).start()
+
+    def _rediger(self):
+        # Envoie d'une traite tout ce qui s'est accumulé dans la file.
+        while not self.ferme:
+            trames = [self.file.get()]
+            while not self.file.empty():
+                trames.append(self.file.get_nowait())
+            if None in trames:
+                return
+            try:
+                self.socket.sendall(b"".join(trames))
+            except OSError:
+                self.fermer()
+
+    def fermer(self):
+        if self.ferme:
+            return
+        self.ferme = True
+        try:
+            self.file.put_nowait(None)  # Réveille le rédacteur pour qu'il s'arrête
+        except queue.Full:
+            pass
+        try:
+            # Débloque un sendall en cours dans le rédacteur, que close() seul ne réveille pas toujours.
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            self.socket.close()
+        except OSError:
+            pass
+
+
+class MembreChatAsync(_Membre):
+    # -------------------------------------------------------------------
+    # Client de chat sur des flux asyncio.
+    #
+    # :param writer: Flux d'écriture du client.
+    # :param nom: Nom du joueur.
+    # -------------------------------------------------------------------
+
+    def __init__(self, writer: asyncio.StreamWriter, nom: str):
+        super().__init__(nom)
+        self.writer = writer
+        self.file = asyncio.Queue(maxsize=TAILLE_FILE)
+        self.redacteur = asyncio.get_running_loop().create_task(self._rediger())
+
+    async def _rediger(self):
+        try:
+            while True:
+                trames = [await self.file.get()]
+                while not self.file.empty():
+                    trames.append(self.file.get_nowait())
+                self.writer.write(b"".join(trames))
+                await self.writer.drain()  # Attend que le client lise, sans bloquer les autres
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.fermer()
+
+    def fermer(self):
+        if self.ferme:
+            return
+        self.ferme = True
+        self.redacteur.cancel()
+        self.writer.close()
@@ -0,0 +1,536 @@
+import asyncio
+import queue
+import selectors
+import socket
+import threading
+import time
+
+from utils.Mesures import Compteur, Jauge
+from utils.Protocole import Code, decoder_reponse, encoder
+from utils.Trames import ENTETE, LecteurTrames, encoder_trames, lire_trame_async
+
+DELAI_ENVOI = 10.0  # Secondes accordées à un joueur pour lire ses messages avant d'être déconnecté
+TRAMES_PAR_ECRITURE = 64  # Trames envoyées au plus par écriture groupée
+DELAI_REPONSE = 60.0  # Secondes accordées par défaut pour répondre à une question
+_SENDMSG = hasattr(socket.socket, 'sendmsg')  # Absent sous Windows
+
+# Sondes TCP (keepalive) : un pair disparu sans fermer sa connexion est
+# détecté par le noyau après SONDE_INACTIVITE + SONDE_ESSAIS * SONDE_INTERVALLE secondes.
+SONDE_INACTIVITE = 30
+SONDE_INTERVALLE = 10
+SONDE_ESSAIS = 3
+
+CONNEXIONS = Jauge('yahtzee_connexions', "Connexions de jeu ouvertes")
+OCTETS_ENVOYES = Compteur('yahtzee_octets_total', "Octets échangés sur les connexions de jeu", sens='envoyes')
+OCTETS_RECUS = Compteur('yahtzee_octets_total', "Octets échangés sur les connexions de jeu", sens='recus')
+
+
+# -------------------------------------------------------------------
+# Connexions des joueurs, indépendantes du mode du serveur.
+#
+# Les échanges avec un joueur (accueil, tour de jeu) sont écrits une
+# seule fois sous forme de générateurs : chaque `yield` produit la
+# question à laquelle le joueur doit répondre, éventuellement précédée
+# de messages d'information (tuple, envoyé avec la question en une seule
+# écriture). La réponse, décodée, est renvoyée au générateur.
+#
+# Les messages sont ceux de utils.Protocole et circulent en trames
+# (voir utils.Trames).
+#
+# L'envoi ne bloque jamais le thread ou la coroutine de la partie : les
+# trames sont confiées à l'écriture propre à chaque joueur, qui les
+# envoie groupées dès que le réseau le permet. Un joueur qui ne lit plus
+# rien pendant DELAI_ENVOI est déconnecté, sans ralentir les autres
+# joueurs de la table.
+#
+# Chaque question a un délai de réponse, et un tour de jeu peut avoir
+# une échéance globale. Pendant un tour, une question restée sans
+# réponse reçoit une réponse par défaut (None, interprétée par le
+# générateur) et le joueur est prévenu par DELAI_DEPASSE ; sa réponse
+# tardive, si elle arrive, est écartée ; une connexion perdue pendant
+# un tour le termine de la même façon. Ailleurs (accueil), le joueur
+# est déconnecté. Les pairs disparus sont détectés par les sondes TCP
+# du noyau, sans trafic ni thread supplémentaire.
+#
+# - Connexion exécute ces générateurs dans le thread du joueur (serveur
+#   à un thread par joueur).
+# - ConnexionAsync les exécute sur des flux asyncio (serveur à boucle
+#   d'événements unique).
+# -------------------------------------------------------------------
+
+
+class Calcul:
+    # -------------------------------------------------------------------
+    # Calcul coûteux produit par un échange à la place d'une question (un
+    # conseil pas encore en cache, par exemple). Il n'est rien envoyé au
+    # joueur : ConnexionAsync l'exécute hors de la boucle d'événements
+    # (run_in_executor) et renvoie son résultat au générateur.
+    # -------------------------------------------------------------------
+
+    def __init__(self, fonction, *arguments):
+        self.fonction = fonction
+        self.arguments = arguments
+
+
+class DelaiDepasse(ConnectionResetError):
+    # -------------------------------------------------------------------
+    # Le joueur n'a pas répondu à temps. Hors d'un tour de jeu, il est
+    # traité comme déconnecté.
+    # -------------------------------------------------------------------
+    pass
+
+
+def _activer_sondes(sock) -> None:
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    if hasattr(socket, 'TCP_KEEPIDLE'):  # Réglages propres à Linux
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, SONDE_INACTIVITE)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, SONDE_INTERVALLE)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, SONDE_ESSAIS)
+
+
+def _paire_reveil():
+    # :return: (lecture, écriture) : sockets reliés et non bloquants.
+    paire = socket.socketpair()
+    for extremite in paire:
+        extremite.setblocking(False)
+    return paire
+
+
+def _limite(delai_reponse, echeance):
+    # -------------------------------------------------------------------
+    # :return: Instant (time.monotonic) où la question posée maintenant
+    #          expire, ou None sans délai.
+    # -------------------------------------------------------------------
+    limite = None if delai_reponse is None else time.monotonic() + delai_reponse
+    if echeance is not None and (limite is None or echeance < limite):
+        return echeance
+    return limite
+
+
+def _consommer(lecture):
+    # Une lecture terminée par la fermeture de la connexion n'a parfois plus personne pour l'attendre.
+    if not lecture.cancelled():
+        lecture.exception()
+
+
+class Connexion:
+    # -------------------------------------------------------------------
+    # Connexion d'un joueur servie par un thread, autour d'un socket.
+    #
+    # Le socket est non bloquant : la lecture attend les données par un
+    # sélecteur (selectors, portable), et l'envoi passe par une file vidée
+    # par un thread rédacteur, qui écrit toutes les trames accumulées en un
+    # seul appel vectorisé (sendmsg, ou send là où il n'existe pas).
+    #
+    # Les délais de réponse sont confiés à l'échéancier partagé du
+    # serveur : à l'échéance, il réveille la lecture en cours en écrivant
+    # un octet dans une paire de sockets propre à la connexion (socketpair,
+    # disponible sur toutes les plateformes, contrairement à eventfd).
+    #
+    # :param socket: Socket du joueur.
+    # :param adresse: Adresse du joueur (pour les messages du serveur).
+    # :param echeancier: Échéancier partagé (utils.Echeancier) ; sans
+    #                    échéancier, les lectures n'ont pas de délai.
+    # :param delai_reponse: Secondes accordées pour répondre à une question.
+    # -------------------------------------------------------------------
+
+    def __init__(self, socket, adresse=None, echeancier=None, delai_reponse=DELAI_REPONSE):
+        self.socket = socket
+        self.adresse = adresse
+        self.lecteur = LecteurTrames(socket)
+        self.echeancier = echeancier
+        self.delai_reponse = delai_reponse if echeancier is not None else None
+        self.reveil = self.signal = None  # Paire de réveil : lue par la partie, écrite par l'échéancier
+        if echeancier is not None:
+            self.reveil, self.signal = _paire_reveil()
+        self.en_retard = 0  # Réponses tardives à écarter
+        self.file = queue.SimpleQueue()  # Trames à envoyer ; None ferme la connexion, un Event la détache
+        self.fermee = False
+        socket.setblocking(False)
+        _activer_sondes(socket)
+        CONNEXIONS.ajouter(1)  # Jusqu'à l'arrêt du rédacteur
+        threading.Thread(target=self._rediger, daemon=True).start()
+
+    def envoyer(self, *messages: bytes) -> None:
+        # -------------------------------------------------------------------
+        # Envoie un ou plusieurs messages, en une seule écriture.
+        # -------------------------------------------------------------------
+        self.deposer(encoder_trames(*messages))
+
+    def deposer(self, trame: bytes) -> None:
+        # -------------------------------------------------------------------
+        # Confie au rédacteur une trame déjà encodée, sans attendre. Une
+        # même trame peut être déposée sur plusieurs connexions.
+        #
+        # :raises ConnectionResetError: Si la connexion est fermée.
+        # -------------------------------------------------------------------
+        if self.fermee:
+            raise ConnectionResetError(f"Connexion fermée avec {self.adresse}")
+        self.file.put(trame)
+
+    def _rediger(self):
+        # Envoie d'une traite tout ce qui s'est accumulé dans la file.
+        while True:
+            trames = [self.file.get()]
+            try:
+                while len(trames) < TRAMES_PAR_ECRITURE and isinstance(trames[-1], bytes):
+                    trames.append(self.file.get_nowait())
+            except queue.Empty:
+                pass
+            arret = False if isinstance(trames[-1], bytes) else trames.pop()
+            if trames and not self._ecrire(trames):
+                print(f"Le joueur à l'adresse {self.adresse} ne lit plus ses messages, déconnexion.")
+                self._couper()
+                arret = arret or None
+            elif arret is None:
+                self._couper()
+            if isinstance(arret, threading.Event):
+                arret.set()
+            if arret is not False:
+                CONNEXIONS.ajouter(-1)
+                return
+
+    def _ecrire(self, trames) -> bool:
+        # -------------------------------------------------------------------
+        # Écrit des trames avant l'échéance DELAI_ENVOI.
+        #
+        # :return: False si le joueur n'a pas tout lu à temps, ou si la
+        #          connexion est rompue.
+        # -------------------------------------------------------------------
+        echeance = time.monotonic() + DELAI_ENVOI
+        tampons = [memoryview(trame) for trame in trames]
+        while tampons:
+            try:
+                envoyes = self.socket.sendmsg(tampons) if _SENDMSG else self.socket.send(tampons[0])
+            except BlockingIOError:
+                envoyes = 0
+            except OSError:
+                return False
+            OCTETS_ENVOYES.ajouter(envoyes)
+            while envoyes:  # Retire ce qui est parti, y compris le début d'une trame coupée
+                if envoyes >= len(tampons[0]):
+                    envoyes -= len(tampons.pop(0))
+                else:
+                    tampons[0] = tampons[0][envoyes:]
+                    envoyes = 0
+            if tampons:
+                restant = echeance - time.monotonic()
+                if restant <= 0:
+                    return False
+                try:
+                    with selectors.DefaultSelector() as selecteur:
+                        selecteur.register(self.socket, selectors.EVENT_WRITE)
+                        selecteur.select(restant)  # Attend de la place dans le tampon d'envoi
+                except (OSError, ValueError):
+                    return False
+        return True
+
+    def _couper(self):
+        # Arrête aussi une lecture en cours dans le thread de la partie.
+        self.fermee = True
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.socket.close()
+        self._fermer_reveil()
+
+    def _fermer_reveil(self):
+        reveil, signal = self.reveil, self.signal
+        self.reveil = self.signal = None
+        if reveil is not None:
+            reveil.close()
+            signal.close()
+
+    def recevoir(self, limite=None) -> bytes:
+        # -------------------------------------------------------------------
+        # Reçoit le prochain message du joueur, en écartant les réponses
+        # tardives aux questions expirées.
+        #
+        # :param limite: Instant (time.monotonic) au-delà duquel l'attente
+        #                est abandonnée, ou None.
+        # :raises DelaiDepasse: Si rien n'est arrivé avant la limite.
+        # :raises ConnectionResetError: Si le joueur s'est déconnecté.
+        # -------------------------------------------------------------------
+        while True:
+            trame = self._lire_avant(limite)
+            OCTETS_RECUS.ajouter(ENTETE.size + len(trame))
+            if not self.en_retard:
+                return trame
+            self.en_retard -= 1
+
+    def _lire_avant(self, limite):
+        # Attend la prochaine trame ; avec une limite, l'échéancier réveille
+        # l'attente par le descripteur de réveil de la connexion.
+        reveil = self.reveil
+        if limite is not None and reveil is None:
+            raise ConnectionResetError(f"Connexion fermée avec {self.adresse}")
+        selecteur = selectors.DefaultSelector()  # Pas select.select : limité aux descripteurs < 1024
+        minuteur = None
+        try:
+            try:
+                selecteur.register(self.socket, selectors.EVENT_READ)
+                if limite is not None:
+                    try:
+                        while reveil.recv(64):  # Efface un réveil échu pendant la lecture précédente
+                            pass
+                    except BlockingIOError:
+                        pass
+                    selecteur.register(reveil, selectors.EVENT_READ)
+            except (OSError, ValueError):
+                raise ConnectionResetError(f"Connexion fermée avec {self.adresse}") from None
+            if limite is not None:
+                minuteur = self.echeancier.planifier(limite, self._reveiller)
+            while True:
+                trame = self.lecteur.extraire()
+                if trame is not None:
+                    return trame
+                prets = [cle.fileobj for cle, _ in selecteur.select()]
+                if limite is not None and reveil in prets:
+                    self.en_retard += 1  # La réponse attendue arrivera trop tard
+                    raise DelaiDepasse(f"Délai de réponse dépassé pour {self.adresse}")
+                try:
+                    self.lecteur.remplir()
+                except BlockingIOError:  # Réveil sans données (socket non bloquant)
+                    pass
+        finally:
+            if minuteur is not None:
+                minuteur.annuler()
+            selecteur.close()
+
+    def _reveiller(self):
+        # Appelée par l'échéancier à l'expiration du délai.
+        signal = self.signal
+        if signal is not None:
+            try:
+                signal.send(b"\0")
+            except OSError:  # Tampon plein (un réveil est déjà en attente) ou connexion fermée
+                pass
+
+    def executer(self, deroulement, echeance=None):
+        # -------------------------------------------------------------------
+        # Déroule un échange jusqu'à son terme.
+        #
+        # :param deroulement: Générateur produisant les questions.
+        # :param echeance: Instant (time.monotonic) de fin de l'échange, pour
+        #                  un tour de jeu. Une question expirée y reçoit None
+        #                  (réponse par défaut) ; une fois l'échéance passée,
+        #                  les questions restantes ne sont plus posées. Si la
+        #                  connexion est perdue, le tour se termine de même.
+        #                  Sans échéance, une question expirée lève
+        #                  DelaiDepasse.
+        # :return: La valeur renvoyée par le générateur.
+        # -------------------------------------------------------------------
+        reponse = None
+        perdue = False  # Connexion perdue pendant le tour : il se termine par défaut
+        while True:
+            try:
+                question = deroulement.send(reponse)
+            except StopIteration as fin:
+                return fin.value
+            if isinstance(question, bytes):
+                question = (question,)
+            reponse = None
+            if perdue:
+                continue
+            try:
+                if echeance is not None and time.monotonic() >= echeance:
+                    if len(question) > 1:
+                        self.envoyer(*question[:-1])
+                    continue
+                self.envoyer(*question)
+                try:
+                    reponse = decoder_reponse(question[-1], self.recevoir(_limite(self.delai_reponse, echeance)))
+                except DelaiDepasse:
+                    if echeance is None:
+                        raise
+                    self.envoyer(encoder(Code.DELAI_DEPASSE))
+            except ConnectionResetError:
+                if echeance is None:
+                    raise
+                perdue = True
+
+    def est_fermee(self) -> bool:
+        # -------------------------------------------------------------------
+        # Vérifie, sans bloquer ni consommer de données, si le joueur a
+        # fermé sa connexion (utile pendant l'attente, où rien n'est lu).
+        # -------------------------------------------------------------------
+        if self.fermee:
+            return True
+        try:
+            return self.socket.recv(1, socket.MSG_PEEK) == b""  # Socket non bloquant
+        except BlockingIOError:
+            return False
+        except OSError:
+            return True
+
+    def fermer(self) -> None:
+        # -------------------------------------------------------------------
+        # Ferme la connexion une fois les messages en file envoyés.
+        # -------------------------------------------------------------------
+        if not self.fermee:
+            self.fermee = True
+            self.file.put(None)
+
+    def detacher(self):
+        # -------------------------------------------------------------------
+        # Arrête la connexion sans fermer le socket, une fois les messages
+        # en file envoyés, pour le confier à un autre processus.
+        #
+        # :return: (socket, octets déjà reçus mais pas encore lus), ou None
+        #          si la connexion est déjà fermée.
+        # -------------------------------------------------------------------
+        if self.fermee:
+            return None
+        detachee = threading.Event()
+        self.fermee = True
+        self.file.put(detachee)
+        if not detachee.wait(DELAI_ENVOI + 1) or self.socket.fileno() < 0:
+            return None  # Le rédacteur a coupé la connexion entre-temps
+        self._fermer_reveil()
+        return self.socket, bytes(self.lecteur.tampon)
+
+
+class ConnexionRompue:
+    # -------------------------------------------------------------------
+    # Place d'un joueur d'une partie recréée depuis le journal, tant qu'il
+    # n'est pas revenu (voir Partie.reprendre) : une connexion fermée.
+    # -------------------------------------------------------------------
+    adresse = None
+
+    def envoyer(self, *messages: bytes) -> None:
+        raise ConnectionResetError("Joueur pas encore revenu")
+
+    def deposer(self, trame: bytes) -> None:
+        raise ConnectionResetError("Joueur pas encore revenu")
+
+    def est_fermee(self) -> bool:
+        return True
+
+    def fermer(self) -> None:
+        pass
+
+
+class ConnexionAsync:
+    # -------------------------------------------------------------------
+    # Connexion non bloquante d'un joueur, autour des flux asyncio.
+    #
+    # L'envoi dépose les données dans le tampon du transport sans attendre
+    # (le transport les regroupe tant que le réseau ne suit pas) ; seule la
+    # réception suspend la coroutine du joueur. Une tâche de surveillance
+    # coupe la connexion si le tampon n'est pas vidé en DELAI_ENVOI.
+    #
+    # Les délais de réponse sont des minuteurs de la boucle d'événements.
+    # La lecture d'une trame n'est jamais annulée en cours de route : à
+    # l'expiration, elle reste en attente et sert à l'appel suivant.
+    #
+    # :param reader: Flux de lecture asyncio.
+    # :param writer: Flux d'écriture asyncio.
+    # :param delai_reponse: Secondes accordées pour répondre à une question.
+    # -------------------------------------------------------------------
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, delai_reponse=DELAI_REPONSE):
+        self.reader = reader
+        self.writer = writer
+        self.adresse = writer.get_extra_info('peername')
+        self.delai_reponse = delai_reponse
+        self.lecture = None  # Lecture de la prochaine trame, en cours
+        self.en_retard = 0
+        self.surveillance = None
+        _activer_sondes(writer.get_extra_info('socket'))
+        # drain() n'attend alors que le tampon soit entièrement vidé : il
+        # n'est appelé que par la surveillance, jamais par la partie.
+        writer.transport.set_write_buffer_limits(high=0)
+        CONNEXIONS.ajouter(1)
+        self.suivi = asyncio.get_running_loop().create_task(self._suivre_fermeture())
+
+    async def _suivre_fermeture(self):
+        # La connexion compte parmi les ouvertes jusqu'à la fermeture du transport.
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+        finally:
+            CONNEXIONS.ajouter(-1)
+
+    def envoyer(self, *messages: bytes) -> None:
+        self.deposer(encoder_trames(*messages))
+
+    def deposer(self, trame: bytes) -> None:
+        if self.writer.is_closing():
+            raise ConnectionResetError(f"Connexion fermée avec {self.adresse}")
+        self.writer.write(trame)
+        OCTETS_ENVOYES.ajouter(len(trame))
+        if self.surveillance is None and self.writer.transport.get_write_buffer_size():
+            self.surveillance = asyncio.get_running_loop().create_task(self._surveiller())
+
+    async def _surveiller(self):
+        # Le joueur a DELAI_ENVOI pour lire ce qui reste dans le tampon.
+        try:
+            await asyncio.wait_for(self.writer.drain(), DELAI_ENVOI)
+        except asyncio.TimeoutError:
+            print(f"Le joueur à l'adresse {self.adresse} ne lit plus ses messages, déconnexion.")
+            self.writer.transport.abort()
+        except ConnectionError:
+            pass
+        finally:
+            self.surveillance = None
+
+    async def recevoir(self, limite=None) -> bytes:
+        while True:
+            if self.lecture is None:
+                self.lecture = asyncio.ensure_future(lire_trame_async(self.reader))
+                self.lecture.add_done_callback(_consommer)
+            if limite is not None:
+                await asyncio.wait((self.lecture,), timeout=max(0.0, limite - time.monotonic()))
+                if not self.lecture.done():
+                    self.en_retard += 1
+                    raise DelaiDepasse(f"Délai de réponse dépassé pour {self.adresse}")
+            lecture, self.lecture = self.lecture, None
+            trame = await lecture
+            OCTETS_RECUS.ajouter(ENTETE.size + len(trame))
+            if not self.en_retard:
+                return trame
+            self.en_retard -= 1
+
+    async def executer(self, deroulement, echeance=None):
+        reponse = None
+        perdue = False  # Connexion perdue pendant le tour : il se termine par défaut
+        while True:
+            try:
+                question = deroulement.send(reponse)
+            except StopIteration as fin:
+                return fin.value
+            if isinstance(question, Calcul):  # Même après l'échéance : la réponse par défaut en dépend
+                reponse = await asyncio.get_running_loop().run_in_executor(None, question.fonction,
+                                                                           *question.arguments)
+                continue
+            if isinstance(question, bytes):
+                question = (question,)
+            reponse = None
+            if perdue:
+                continue
+            try:
+                if echeance is not None and time.monotonic() >= echeance:
+                    if len(question) > 1:
+                        self.envoyer(*question[:-1])
+                    continue
+                self.envoyer(*question)
+                try:
+                    reponse = decoder_reponse(question[-1], await self.recevoir(_limite(self.delai_reponse, echeance)))
+                except DelaiDepasse:
+                    if echeance is None:
+                        raise
+                    self.envoyer(encoder(Code.DELAI_DEPASSE))
+            except ConnectionResetError:
+                if echeance is None:
+                    raise
+                perdue = True
+
+    def est_fermee(self) -> bool:
+        return self.reader.at_eof() or self.writer.is_closing()
+
+    def fermer(self) -> None:
+        # La lecture en cours n'est pas annulée : la fermeture du transport
+        # la termine (ConnectionResetError) dans la coroutine qui l'attend.
+        self.writer.close()
@@ -0,0 +1,124 @@
+from functools import lru_cache
+from itertools import permutations
+
+from utils.CalculateurDeScore import CalculateurDeScore, FIGURES, LANCERS
+from utils.Solveur import INDEX_GARDE, etat_feuille, evaluer_tour
+
+# -------------------------------------------------------------------
+# Transitions précalculées : pour chacun des 252 lancers triés et
+# chacun des 32 sous-ensembles de positions gardées (bit i = dé i
+# gardé), indice de la garde correspondante dans GARDES.
+# -------------------------------------------------------------------
+TRANSITIONS = [
+    [INDEX_GARDE[tuple(lancer[i] for i in range(5) if masque >> i & 1)] for masque in range(32)]
+    for lancer in LANCERS
+]
+
+
+# Pour chaque ordre de tri des 5 positions, conversion d'un masque de
+# positions du lancer réel en masque de positions du lancer trié.
+_MASQUES_TRIES = {
+    ordre: [sum(1 << rang for rang, position in enumerate(ordre) if masque >> position & 1) for masque in range(32)]
+    for ordre in permutations(range(5))
+}
+
+
+def gardes_lancer(des: list[int]) -> list[int]:
+    # -------------------------------------------------------------------
+    # Indices dans GARDES des 32 façons de garder les dés d'un lancer.
+    #
+    # :param des: Valeurs actuelles des dés.
+    # :return: Liste indexée par masque de positions gardées (bit i = dé i).
+    # -------------------------------------------------------------------
+    transitions = TRANSITIONS[CalculateurDeScore.index_lancer(des)]
+    masques_tries = _MASQUES_TRIES[tuple(sorted(range(5), key=des.__getitem__))]
+    return [transitions[masque_trie] for masque_trie in masques_tries]
+
+
+def decrire_garde(masque: int) -> str:
+    relancer = [str(i + 1) for i in range(5) if not masque >> i & 1]
+    if not relancer:
+        return "gardez tous les dés"
+    return f"relancez les dés {','.join(relancer)}"
+
+
+def texte_conseil_gardes(classement) -> str:
+    # -------------------------------------------------------------------
+    # Formule un conseil de relance et ses alternatives.
+    #
+    # :param classement: Liste de (masque des positions gardées, espérance),
+    #                    la meilleure garde en tête.
+    # :return: Texte du conseil.
+    # -------------------------------------------------------------------
+    masque, valeur = classement[0]
+    lignes = [f"Conseil : {decrire_garde(masque)} (espérance {valeur:.1f})."]
+    for masque, valeur in classement[1:]:
+        lignes.append(f"  Alternative : {decrire_garde(masque)} (espérance {valeur:.1f}).")
+    return "\n".join(lignes)
+
+
+def texte_conseil_figure(figure: str) -> str:
+    return f"Conseil : remplissez la figure {figure}."
+
+
+class Conseiller:
+    # -------------------------------------------------------------------
+    # Conseille les dés à garder et la figure à remplir pendant un tour.
+    #
+    # Avec une table de stratégie (TablePolitique), les conseils suivent
+    # la stratégie optimale. Sans table, l'espérance des tours suivants
+    # est ignorée : le conseil maximise le score espéré du tour en cours.
+    #
+    # Les évaluations d'un état de feuille sont mémorisées : une fois
+    # l'état évalué, chaque question ne coûte que quelques lectures.
+    # -------------------------------------------------------------------
+
+    def __init__(self, politique=None, taille_cache: int = 4096):
+        self.politique = politique
+        self._evaluer = lru_cache(maxsize=taille_cache)(self._evaluer_etat)
+
+    def valeur_etat(self, masque: int, total_sup: int) -> float:
+        return self.politique.valeur(masque, total_sup) if self.politique is not None else 0.0
+
+    def _evaluer_etat(self, masque: int, total_sup: int):
+        return evaluer_tour(masque, total_sup, self.valeur_etat)
+
+    def classer_gardes(self, des: list[int], relances_restantes: int, feuille) -> list[tuple[int, float]]:
+        # -------------------------------------------------------------------
+        # Classe les façons de garder les dés avant une relance.
+        #
+        # :param des: Valeurs actuelles des dés.
+        # :param relances_restantes: Relances encore possibles (1 ou 2).
+        # :param feuille: FeuilleScore du joueur.
+        # :return: Liste de (masque des positions gardées, espérance), de la
+        #          meilleure à la moins bonne, sans doublon de valeurs gardées.
+        # -------------------------------------------------------------------
+        if relances_restantes not in (1, 2):
+            raise ValueError(f"Nombre de relances invalide : {relances_restantes}")
+        valeurs_gardes = self._evaluer(*etat_feuille(feuille))[2][relances_restantes - 1]
+
+        gardes = gardes_lancer(des)
+        classement = {}
+        # Des masques qui gardent les mêmes valeurs, le plus grand représente la garde (choix stable).
+        for masque in range(31, -1, -1):
+            classement.setdefault(gardes[masque], masque)
+        return sorted(((masque, valeurs_gardes[garde]) for garde, masque in classement.items()),
+                      key=lambda choix: choix[1], reverse=True)
+
+    def conseiller(self, des: list[int], relances_restantes: int, feuille) -> tuple[int, float]:
+        # -------------------------------------------------------------------
+        # Meilleure garde avant une relance.
+        #
+        # :return: (masque des positions gardées, espérance).
+        # -------------------------------------------------------------------
+        return self.classer_gardes(des, relances_restantes, feuille)[0]
+
+    def conseil_figure(self, des: list[int], feuille) -> str:
+        # -------------------------------------------------------------------
+        # Figure à remplir avec le lancer final.
+        #
+        # :return: Nom de la figure conseillée.
+        # -------------------------------------------------------------------
+        choix_figures = self._evaluer(*etat_feuille(feuille))[3]
+        return FIGURES[choix_figures[CalculateurDeScore.index_lancer(des)]]
+
@@ -0,0 +1,93 @@
+import itertools
+import os
+import random
+
+# -------------------------------------------------------------------
+# Sources des dés d'une partie.
+#
+# Chaque partie tire ses dés dans sa propre source : les parties ne se
+# disputent plus le générateur global du module random, et une graine
+# donnée rejoue exactement les mêmes dés, quel que soit le mode du
+# serveur (threadé, asyncio ou multiprocessus). Une source fournit
+# lancer(nombre), qui rend la liste des faces de `nombre` dés.
+# -------------------------------------------------------------------
+
+FACES = range(1, 7)
+TAILLE_TAMPON = 4096  # Octets tirés à la fois par SourceTampon
+
+# Octet -> face : 252 = 6 x 42 octets donnent chaque face 42 fois ; les 4
+# derniers, qui avantageraient les faces 1 à 4, sont écartés.
+_FACE_OCTET = bytes(octet % 6 + 1 for octet in range(256))
+_OCTETS_ECARTES = bytes(range(252, 256))
+
+
+class SourceAleatoire:
+    # -------------------------------------------------------------------
+    # Dés tirés un lancer à la fois dans un générateur propre à la partie.
+    #
+    # :param graine: Graine du générateur (None : tirée du système).
+    # -------------------------------------------------------------------
+
+    def __init__(self, graine=None):
+        self.generateur = random.Random(graine)
+
+    def lancer(self, nombre) -> list[int]:
+        return self.generateur.choices(FACES, k=nombre)
+
+
+class SourceTampon:
+    # -------------------------------------------------------------------
+    # Dés tirés par blocs : un bloc d'octets aléatoires est converti en
+    # faces d'un seul appel (bytes.translate), puis les dés sont servis
+    # par tranches du tampon.
+    #
+    # Les octets viennent d'os.urandom, ou d'un générateur amorcé par la
+    # graine (random.Random.randbytes) pour rejouer les mêmes dés.
+    #
+    # :param graine: Graine (None : dés non reproductibles).
+    # :param taille: Octets tirés à chaque remplissage du tampon.
+    # -------------------------------------------------------------------
+
+    def __init__(self, graine=None, taille=TAILLE_TAMPON):
+        self.octets = random.Random(graine).randbytes if graine is not None else os.urandom
+        self.taille = taille
+        self.tampon = b""
+        self.position = 0
+
+    def lancer(self, nombre) -> list[int]:
+        while self.position + nombre > len(self.tampon):
+            self.tampon = self.tampon[self.position:] + self.octets(self.taille).translate(_FACE_OCTET,
+                                                                                              _OCTETS_ECARTES)
+            self.position = 0
+        des = list(self.tampon[self.position:self.position + nombre])
+        self.position += nombre
+        return des
+
+
+class SourceScriptee:
+    # -------------------------------------------------------------------
+    # Dés imposés à l'avance, servis dans l'ordre (scénarios de test).
+    #
+    # :param des: Suite des faces, tous lancers confondus.
+    # :raises ValueError: Au lancer qui dépasse la fin de la suite.
+    # -------------------------------------------------------------------
+
+    def __init__(self, des):
+        self.des = iter(des)
+
+    def lancer(self, nombre) -> list[int]:
+        des = list(itertools.islice(self.des, nombre))
+        if len(des) < nombre:
+            raise ValueError("Plus assez de dés scriptés pour ce lancer")
+        return des
+
+
+def source_partie(graine, identifiant):
+    # -------------------------------------------------------------------
+    # Source des dés d'une partie du serveur.
+    #
+    # :param graine: Graine du serveur, ou None.
+    # :param identifiant: Identifiant de la partie, qui distingue les
+    #                     dés des parties d'un même serveur.
+    # -------------------------------------------------------------------
+    return SourceTampon(f"{graine}:{identifiant}" if graine is not None else None)
@@ -0,0 +1,67 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class Minuteur:
+    # -------------------------------------------------------------------
+    # Échéance planifiée, qu'on peut annuler tant qu'elle n'est pas échue.
+    # -------------------------------------------------------------------
+
+    __slots__ = ('action', 'annule')
+
+    def __init__(self, action):
+        self.action = action
+        self.annule = False
+
+    def annuler(self):
+        self.annule = True
+
+
+class Echeancier:
+    # -------------------------------------------------------------------
+    # Échéances du serveur threadé (délais de réponse des joueurs), dans
+    # un tas unique servi par un seul thread.
+    #
+    # Planifier une échéance coûte O(log n) quel que soit le nombre de
+    # connexions ; une échéance annulée est simplement ignorée quand son
+    # heure arrive. Les actions s'exécutent dans le thread de l'échéancier
+    # et doivent donc être brèves (réveiller le thread d'un joueur, par
+    # exemple). En mode asyncio, la boucle d'événements tient déjà un tel
+    # tas : les délais y sont confiés directement.
+    # -------------------------------------------------------------------
+
+    def __init__(self):
+        self.tas = []  # (échéance, ordre de planification, minuteur)
+        self.ordre = itertools.count()
+        self.condition = threading.Condition()
+        threading.Thread(target=self._servir, daemon=True).start()
+
+    def planifier(self, echeance: float, action) -> Minuteur:
+        # -------------------------------------------------------------------
+        # :param echeance: Instant (time.monotonic) où exécuter l'action.
+        # :param action: Fonction sans argument.
+        # :return: Le minuteur, pour annuler l'échéance.
+        # -------------------------------------------------------------------
+        minuteur = Minuteur(action)
+        with self.condition:
+            heapq.heappush(self.tas, (echeance, next(self.ordre), minuteur))
+            if self.tas[0][2] is minuteur:
+                self.condition.notify()  # Nouvelle première échéance : le thread recalcule son attente
+        return minuteur
+
+    def _servir(self):
+        while True:
+            with self.condition:
+                while True:
+                    if not self.tas:
+                        self.condition.wait()
+                        continue
+                    restant = self.tas[0][0] - time.monotonic()
+                    if restant <= 0:
+                        minuteur = heapq.heappop(self.tas)[2]
+                        break
+                    self.condition.wait(restant)
+            if not minuteur.annule:
+                minuteur.action()
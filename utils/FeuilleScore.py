@@ -1,39 +1,130 @@
-from utils.CalculateurDeScore import CalculateurDeScore
-from utils.Tableau import Tableau
+from array import array
+from collections.abc import Mapping
+from functools import lru_cache
+
+from utils.CalculateurDeScore import CalculateurDeScore, FIGURES, INDEX_FIGURE, LANCERS
+from utils.Tableau import MiseEnPage
+
+BONUS = 'Bonus Section Supérieure'
+SEUIL_BONUS = 63
+VALEUR_BONUS = 35
+NB_SUPERIEURES = 6  # Les figures '1' à '6' occupent les positions 0 à 5
+NON_REALISEE = "Non réalisée"
+
+# Mise en page commune à toutes les feuilles : les largeurs ne dépendent
+# que des libellés, un score tenant toujours dans la colonne.
+MISE_EN_PAGE_FEUILLE = MiseEnPage(
+    headers=["Figure", "Score réalisé", "Score théorique"],
+    largeurs=[max(len(figure) for figure in (*FIGURES, BONUS)), len(NON_REALISEE), len("N/A")],
+)
+
+
+def _lignes_feuille(masque: int, valeurs, bonus: int, scores_theoriques) -> list[tuple]:
+    lignes = [
+        (figure, valeurs[position] if masque >> position & 1 else NON_REALISEE, scores_theoriques[position])
+        for position, figure in enumerate(FIGURES)
+    ]
+    lignes.append((BONUS, bonus, "N/A"))
+    return lignes
+
+
+@lru_cache(maxsize=4096)
+def _rendre_feuille(masque: int, valeurs: bytes, bonus: int, indice_lancer: int) -> str:
+    # -------------------------------------------------------------------
+    # Rendu mémorisé d'une feuille pour un lancer : deux joueurs (ou deux
+    # tours) dans le même état avec les mêmes dés partagent le même texte.
+    # -------------------------------------------------------------------
+    scores_theoriques = CalculateurDeScore.scores_for(LANCERS[indice_lancer])
+    return MISE_EN_PAGE_FEUILLE.afficher(_lignes_feuille(masque, valeurs, bonus, scores_theoriques))
+
+
+class VueScores(Mapping):
+    # -------------------------------------------------------------------
+    # Vue en lecture seule d'une feuille, sous la forme du dictionnaire
+    # historique : figure -> score (None si non remplie), plus le bonus.
+    # Utilisée par le code d'affichage ; rien n'est copié.
+    # -------------------------------------------------------------------
+    __slots__ = ('_feuille',)
+
+    def __init__(self, feuille):
+        self._feuille = feuille
+
+    def __getitem__(self, figure):
+        if figure == BONUS:
+            return self._feuille.bonus
+        position = INDEX_FIGURE[figure]
+        if self._feuille.masque >> position & 1:
+            return self._feuille.valeurs[position]
+        return None
+
+    def __iter__(self):
+        yield from FIGURES
+        yield BONUS
+
+    def __len__(self):
+        return len(FIGURES) + 1
+
+    def __contains__(self, figure):
+        return figure == BONUS or figure in INDEX_FIGURE
 
 
 class FeuilleScore:
     # -------------------------------------------------------------------
     # Classe gérant les scores d'un joueur dans une partie de Yahtzee.
     #
+    # La feuille est compacte pour tenir de nombreuses parties en mémoire :
+    # un masque de 13 bits des figures remplies, un tableau d'octets pour
+    # les valeurs et des totaux tenus à jour en O(1) à chaque score noté.
+    #
     # Attributs :
-    # - scores : Dictionnaire contenant les scores pour chaque figure.
-    # - remplissage : Indique quelles figures ont déjà été remplies.
+    # - masque : Bit i à 1 si la figure FIGURES[i] est remplie.
+    # - valeurs : Score de chaque figure, dans l'ordre de FIGURES.
+    # - bonus : Bonus de la section supérieure (0 ou 35).
+    # - total : Score total, bonus compris.
+    # - total_superieur : Somme des figures '1' à '6'.
+    # - verbeux : Affiche les scores notés sur la console.
+    # - scores : Vue dictionnaire (figure -> score ou None), bonus compris.
     # -------------------------------------------------------------------
+    __slots__ = ('masque', 'valeurs', 'bonus', 'total', 'total_superieur', 'verbeux')
+
+    def __init__(self, verbeux: bool = True):
+        # -------------------------------------------------------------------
+        # Initialise une feuille vide : aucune figure remplie, bonus à 0.
+        #
+        # :param verbeux: False pour les parties simulées, sans affichage.
+        # -------------------------------------------------------------------
+        self.masque = 0
+        self.valeurs = array('B', bytes(len(FIGURES)))  # Un score ne dépasse jamais 50
+        self.bonus = 0
+        self.total = 0
+        self.total_superieur = 0
+        self.verbeux = verbeux
 
-    def __init__(self):
+    @classmethod
+    def depuis_etat(cls, masque: int, valeurs: bytes, bonus: int, verbeux: bool = False) -> 'FeuilleScore':
         # -------------------------------------------------------------------
-        # Initialise les scores pour chaque figure et l'état de remplissage.
-        # - Les scores sont initialisés à None, sauf pour le bonus qui est à 0.
-        # - Le remplissage indique si une figure a déjà été utilisée.
+        # Reconstruit une feuille à partir de son état compact (tel qu'il
+        # circule dans le protocole), totaux compris.
         # -------------------------------------------------------------------
-        self.scores = {
-            '1': None,
-            '2': None,
-            '3': None,
-            '4': None,
-            '5': None,
-            '6': None,
-            'Brelan': None,
-            'Carré': None,
-            'Full': None,
-            'Petite suite': None,
-            'Grande suite': None,
-            'Yahtzee': None,
-            'Chance': None,
-            'Bonus Section Supérieure': 0  # Bonus initialisé à 0
-        }
-        self.remplissage = {key: False for key in self.scores}  # Pour savoir si la figure est remplie ou non
+        feuille = cls(verbeux)
+        feuille.masque = masque
+        feuille.valeurs = array('B', valeurs)
+        feuille.bonus = bonus
+        remplies = [feuille.valeurs[position] for position in range(len(FIGURES)) if masque >> position & 1]
+        feuille.total = sum(remplies) + bonus
+        feuille.total_superieur = sum(feuille.valeurs[position] for position in range(NB_SUPERIEURES)
+                                      if masque >> position & 1)
+        return feuille
+
+    @property
+    def scores(self) -> VueScores:
+        return VueScores(self)
+
+    def est_remplie(self, figure: str) -> bool:
+        return bool(self.masque >> INDEX_FIGURE[figure] & 1)
+
+    def figures_disponibles(self) -> list[str]:
+        return [figure for position, figure in enumerate(FIGURES) if not self.masque >> position & 1]
 
     def noter_score(self, figure: str, valeur: int) -> None:
         # -------------------------------------------------------------------
@@ -42,16 +133,23 @@ class FeuilleScore:
         # :param figure: Nom de la figure à remplir (ex : '1', 'Brelan').
         # :param valeur: Score à attribuer à la figure.
         # -------------------------------------------------------------------
-        if figure in self.scores and self.scores[figure] is None:
-            self.scores[figure] = valeur
+        position = INDEX_FIGURE.get(figure)
+        if position is None or self.masque >> position & 1:
+            if self.verbeux:
+                print(f"Figure {figure} déjà remplie ou inexistante")
+            return
+
+        self.masque |= 1 << position
+        self.valeurs[position] = valeur
+        self.total += valeur
+        if self.verbeux:
             print(f"Score de {valeur} noté pour la figure {figure}")
 
-            # Vérifie si la figure appartient à la section supérieure
-            if figure in ['1', '2', '3', '4', '5', '6']:
-                if self.verifier_bonus_section_superieure():
-                    print("Félicitations ! Vous avez atteint le bonus de la section supérieure (+35 points)")
-        else:
-            print(f"Figure {figure} déjà remplie ou inexistante")
+        # Vérifie si la figure appartient à la section supérieure
+        if position < NB_SUPERIEURES:
+            self.total_superieur += valeur
+            if self.verifier_bonus_section_superieure() and self.verbeux:
+                print("Félicitations ! Vous avez atteint le bonus de la section supérieure (+35 points)")
 
     def afficher_score(self, des: list[int]) -> str:
         # -------------------------------------------------------------------
@@ -59,29 +157,13 @@ class FeuilleScore:
         #
         # :param des: Liste des valeurs des dés actuels pour calculer les scores théoriques.
         # -------------------------------------------------------------------
-        scores_theoriques = {
-            figure: self.calculer_score(figure, des)
-            for figure in self.scores.keys()
-            if figure != "Bonus Section Supérieure"
-        }
-
-        # Calcul du score global réalisé
-        total_score = sum(
-            score for score in self.scores.values() if score is not None
-        )
-
-        # Prépare les données pour le tableau
-        figures_tableau = [
-            (
-                figure,
-                self.scores[figure] if self.scores[figure] is not None else "Non réalisée",
-                scores_theoriques.get(figure, "N/A") if figure != "Bonus Section Supérieure" else "N/A",
-            )
-            for figure in self.scores.keys()
-        ]
-
-        tableau = Tableau(headers=["Figure", "Score réalisé", "Score théorique"], data=figures_tableau)
-        return tableau.afficher()
+        try:
+            indice_lancer = CalculateurDeScore.index_lancer(des)
+        except ValueError:
+            # Lancer hors table : rendu direct, sans mémorisation.
+            lignes = _lignes_feuille(self.masque, self.valeurs, self.bonus, CalculateurDeScore.scores_for(des))
+            return MISE_EN_PAGE_FEUILLE.afficher(lignes)
+        return _rendre_feuille(self.masque, self.valeurs.tobytes(), self.bonus, indice_lancer)
 
     def verifier_bonus_section_superieure(self) -> bool:
         # -------------------------------------------------------------------
@@ -89,14 +171,10 @@ class FeuilleScore:
         #
         # :return: True si le bonus est ajouté, sinon False.
         # -------------------------------------------------------------------
-        # Calcul du score total de la section supérieure
-        section_sup_score = sum(
-            self.scores[str(i)] for i in range(1, 7) if self.scores[str(i)] is not None
-        )
-
         # Ajout du bonus si le score total atteint ou dépasse 63
-        if section_sup_score >= 63 and self.scores['Bonus Section Supérieure'] == 0:
-            self.scores['Bonus Section Supérieure'] = 35
+        if self.total_superieur >= SEUIL_BONUS and self.bonus == 0:
+            self.bonus = VALEUR_BONUS
+            self.total += VALEUR_BONUS
             return True  # Bonus ajouté
         return False
 
@@ -108,32 +186,4 @@ class FeuilleScore:
         # :param des: Liste des valeurs des dés.
         # :return: Score calculé pour la figure.
         # -------------------------------------------------------------------
-        calculateur = CalculateurDeScore()
-        if figure == '1':
-            return calculateur.calculer_un(des)
-        elif figure == '2':
-            return calculateur.calculer_deux(des)
-        elif figure == '3':
-            return calculateur.calculer_trois(des)
-        elif figure == '4':
-            return calculateur.calculer_quatre(des)
-        elif figure == '5':
-            return calculateur.calculer_cinq(des)
-        elif figure == '6':
-            return calculateur.calculer_six(des)
-        elif figure == 'Brelan':
-            return calculateur.calculer_brelan(des)
-        elif figure == 'Carré':
-            return calculateur.calculer_carre(des)
-        elif figure == 'Full':
-            return calculateur.calculer_full(des)
-        elif figure == 'Petite suite':
-            return calculateur.calculer_petite_suite(des)
-        elif figure == 'Grande suite':
-            return calculateur.calculer_grande_suite(des)
-        elif figure == 'Yahtzee':
-            return calculateur.calculer_yahtzee(des)
-        elif figure == 'Chance':
-            return calculateur.calculer_chance(des)
-        else:
-            raise ValueError(f"Figure inconnue : {figure}")
+        return CalculateurDeScore.score(figure, des)
@@ -0,0 +1,293 @@
+import os
+import queue
+import struct
+import threading
+import zlib
+
+from utils.Protocole import tronquer_texte
+
+# -------------------------------------------------------------------
+# Journal des parties (write-ahead log), pour les reprendre après un
+# arrêt du serveur.
+#
+# Chaque événement d'une partie (début, lancer, figure marquée, tour
+# passé, fin) est ajouté à la fin du segment courant sous forme d'un
+# enregistrement binaire compact :
+#
+#   longueur (2 octets), CRC32 (4 octets), puis le corps :
+#   type (1 octet), identifiant de la partie (4 octets), charge utile.
+#
+# Les enregistrements de toutes les parties partagent les mêmes segments
+# (un journal par serveur). L'ajout ne bloque jamais la partie : un seul
+# thread écrit, et tout ce qui s'est accumulé pendant une synchronisation
+# (fsync) part avec la suivante, en une écriture et une synchronisation
+# (validation groupée). Un arrêt brutal ne perd donc que les événements
+# des dernières millisecondes.
+#
+# Au démarrage, les segments sont relus dans l'ordre, trame par trame ;
+# un enregistrement tronqué ou corrompu (écriture interrompue par
+# l'arrêt) termine la lecture de son segment. Les parties inachevées sont
+# ensuite réécrites seules dans un nouveau segment, qui remplace les
+# anciens : le journal ne grossit pas d'un démarrage à l'autre.
+# -------------------------------------------------------------------
+
+MAGIE = b'YZWL'
+VERSION = 1
+ENTETE = struct.Struct('!4sH')  # Magie, version : en tête de chaque segment
+ENREGISTREMENT = struct.Struct('!HI')  # Longueur du corps, CRC32 du corps
+CORPS = struct.Struct('!BI')  # Type, identifiant de la partie
+TAILLE_SEGMENT = 64 * 1024 * 1024  # Au-delà, un nouveau segment est commencé
+TAILLE_LECTURE = 1024 * 1024  # Octets lus à la fois pendant la relecture
+PREFIXE = 'journal-'
+SUFFIXE = '.wal'
+_BINAIRE = getattr(os, 'O_BINARY', 0)  # Windows : pas de conversion des fins de ligne
+_synchroniser_donnees = getattr(os, 'fdatasync', os.fsync)  # fdatasync n'existe ni sous macOS ni sous Windows
+
+DEBUT = 1  # tours max, [(nom, jeton)]
+DES = 2  # relance, 5 dés
+SCORE = 3  # position du joueur, figure, points
+PASSE = 4  # tour d'un joueur absent, passé
+FIN = 5
+
+_DEBUT = struct.Struct('!BB')  # Tours max, nombre de joueurs
+_JOUEUR = struct.Struct('!16sB')  # Jeton de session, longueur du nom
+_DES = struct.Struct('!B5B')
+_SCORE = struct.Struct('!BBB')
+
+
+class EtatPartie:
+    # -------------------------------------------------------------------
+    # État d'une partie reconstruit par la relecture du journal.
+    #
+    # - joueurs : [(nom, jeton de session)], dans l'ordre des tours.
+    # - scores : [(position du joueur, figure, points)], dans l'ordre.
+    # - tour : Tours joués ou passés.
+    # - des : (relance, dés) du tour en cours, ou None entre deux tours.
+    # -------------------------------------------------------------------
+    __slots__ = ('identifiant', 'tours_max', 'joueurs', 'scores', 'tour', 'des', 'terminee')
+
+    def __init__(self, identifiant, tours_max, joueurs):
+        self.identifiant = identifiant
+        self.tours_max = tours_max
+        self.joueurs = joueurs
+        self.scores = []
+        self.tour = 0
+        self.des = None
+        self.terminee = False
+
+    def appliquer(self, type_, charge):
+        if type_ == DES:
+            relance, *des = _DES.unpack(charge)
+            self.des = (relance, des)
+        elif type_ == SCORE:
+            self.scores.append(_SCORE.unpack(charge))
+            self.tour, self.des = self.tour + 1, None
+        elif type_ == PASSE:
+            self.tour, self.des = self.tour + 1, None
+        elif type_ == FIN:
+            self.terminee = True
+
+
+def _encoder_debut(tours_max, joueurs) -> bytes:
+    morceaux = [_DEBUT.pack(tours_max, len(joueurs))]
+    for nom, jeton in joueurs:
+        nom = tronquer_texte(nom)
+        morceaux.append(_JOUEUR.pack(jeton, len(nom)) + nom)
+    return b"".join(morceaux)
+
+
+def _decoder_debut(charge):
+    tours_max, nb_joueurs = _DEBUT.unpack_from(charge)
+    joueurs, position = [], _DEBUT.size
+    for _ in range(nb_joueurs):
+        jeton, longueur = _JOUEUR.unpack_from(charge, position)
+        position += _JOUEUR.size
+        joueurs.append((bytes(charge[position:position + longueur]).decode(), jeton))
+        position += longueur
+    return tours_max, joueurs
+
+
+def _enregistrement(type_, identifiant, charge=b"") -> bytes:
+    corps = CORPS.pack(type_, identifiant) + charge
+    return ENREGISTREMENT.pack(len(corps), zlib.crc32(corps)) + corps
+
+
+def lire_segment(chemin):
+    # -------------------------------------------------------------------
+    # Relit un segment en flux, par blocs de TAILLE_LECTURE octets.
+    #
+    # :return: Générateur de (type, identifiant, charge utile), jusqu'au
+    #          premier enregistrement tronqué ou corrompu.
+    # -------------------------------------------------------------------
+    with open(chemin, 'rb') as fichier:
+        if fichier.read(ENTETE.size) != ENTETE.pack(MAGIE, VERSION):
+            return
+        tampon = b""
+        while True:
+            bloc = fichier.read(TAILLE_LECTURE)
+            if not bloc:
+                return  # Ce qui reste dans le tampon est un enregistrement tronqué
+            tampon = tampon + bloc if tampon else bloc
+            vue, position = memoryview(tampon), 0
+            while len(tampon) - position >= ENREGISTREMENT.size:
+                longueur, crc = ENREGISTREMENT.unpack_from(tampon, position)
+                fin = position + ENREGISTREMENT.size + longueur
+                if fin > len(tampon):
+                    break
+                corps = vue[position + ENREGISTREMENT.size:fin]
+                if longueur < CORPS.size or zlib.crc32(corps) != crc:
+                    return
+                type_, identifiant = CORPS.unpack_from(corps)
+                yield type_, identifiant, corps[CORPS.size:]
+                position = fin
+            tampon = tampon[position:]
+
+
+class Journal:
+    # -------------------------------------------------------------------
+    # Journal des parties d'un serveur, dans un dossier de segments.
+    #
+    # L'ouverture relit les segments existants : les parties inachevées
+    # sont dans `inachevees` (EtatPartie), à recréer par le serveur.
+    #
+    # :param dossier: Dossier des segments (créé au besoin).
+    # -------------------------------------------------------------------
+
+    def __init__(self, dossier):
+        self.dossier = dossier
+        os.makedirs(dossier, exist_ok=True)
+        anciens = self._segments()
+        etats = self.relire(anciens)
+        self.inachevees = [etat for etat in etats.values() if not etat.terminee]
+        self.dernier_identifiant = max(etats, default=0)
+        self.numero = int(anciens[-1][len(PREFIXE):-len(SUFFIXE)]) if anciens else 0
+        self._compacter(anciens)
+        self.file = queue.SimpleQueue()  # Enregistrements à écrire ; un Event demande d'attendre la synchronisation
+        threading.Thread(target=self._ecrire, daemon=True).start()
+
+    def _segments(self):
+        return sorted(nom for nom in os.listdir(self.dossier) if nom.startswith(PREFIXE) and nom.endswith(SUFFIXE))
+
+    def _chemin(self, numero):
+        return os.path.join(self.dossier, f'{PREFIXE}{numero:06d}{SUFFIXE}')
+
+    def relire(self, segments):
+        # -------------------------------------------------------------------
+        # Rejoue les segments dans l'ordre.
+        #
+        # Un DEBUT remet à zéro l'état de sa partie : un segment compacté
+        # rejoué après les anciens (arrêt pendant le compactage) donne le
+        # même état.
+        #
+        # :return: Identifiant -> EtatPartie, pour toutes les parties.
+        # -------------------------------------------------------------------
+        etats = {}
+        for nom in segments:
+            for type_, identifiant, charge in lire_segment(os.path.join(self.dossier, nom)):
+                if type_ == DEBUT:
+                    etats[identifiant] = EtatPartie(identifiant, *_decoder_debut(charge))
+                elif identifiant in etats:
+                    etats[identifiant].appliquer(type_, charge)
+        return etats
+
+    def _compacter(self, anciens):
+        # -------------------------------------------------------------------
+        # Réécrit les parties inachevées dans un nouveau segment, puis
+        # supprime les anciens. Le segment est écrit sous un nom temporaire
+        # et renommé une fois synchronisé : il est complet ou absent.
+        # -------------------------------------------------------------------
+        self.numero += 1
+        chemin = self._chemin(self.numero)
+        with open(chemin + '.tmp', 'wb') as fichier:
+            fichier.write(ENTETE.pack(MAGIE, VERSION))
+            for etat in self.inachevees:
+                fichier.write(self._reecrire(etat))
+            fichier.flush()
+            os.fsync(fichier.fileno())
+        os.replace(chemin + '.tmp', chemin)
+        for nom in anciens:
+            os.remove(os.path.join(self.dossier, nom))
+        self._synchroniser_dossier()
+        self.segment = os.open(chemin, os.O_WRONLY | os.O_APPEND | _BINAIRE)
+        self.taille = os.fstat(self.segment).st_size
+
+    @staticmethod
+    def _reecrire(etat) -> bytes:
+        morceaux = [_enregistrement(DEBUT, etat.identifiant, _encoder_debut(etat.tours_max, etat.joueurs))]
+        passes = etat.tour - len(etat.scores)
+        morceaux.extend(_enregistrement(PASSE, etat.identifiant) for _ in range(passes))
+        morceaux.extend(_enregistrement(SCORE, etat.identifiant, _SCORE.pack(*score)) for score in etat.scores)
+        if etat.des is not None:
+            morceaux.append(_enregistrement(DES, etat.identifiant, _DES.pack(etat.des[0], *etat.des[1])))
+        return b"".join(morceaux)
+
+    def _synchroniser_dossier(self):
+        if not hasattr(os, 'O_DIRECTORY'):
+            return  # Windows : un dossier ne s'ouvre pas comme un fichier, il n'y a rien à synchroniser
+        descripteur = os.open(self.dossier, os.O_RDONLY)
+        try:
+            os.fsync(descripteur)
+        finally:
+            os.close(descripteur)
+
+    # --- Ajout des événements (sans attendre) -----------------------
+
+    def debut(self, identifiant, tours_max, joueurs):
+        self.file.put(_enregistrement(DEBUT, identifiant, _encoder_debut(tours_max, joueurs)))
+
+    def des(self, identifiant, relance, des):
+        self.file.put(_enregistrement(DES, identifiant, _DES.pack(relance, *des)))
+
+    def score(self, identifiant, joueur, position, points):
+        self.file.put(_enregistrement(SCORE, identifiant, _SCORE.pack(joueur, position, points)))
+
+    def passe(self, identifiant):
+        self.file.put(_enregistrement(PASSE, identifiant))
+
+    def fin(self, identifiant):
+        self.file.put(_enregistrement(FIN, identifiant))
+
+    def vider(self, delai=None) -> bool:
+        # -------------------------------------------------------------------
+        # Attend que tous les événements déjà ajoutés soient synchronisés.
+        #
+        # :return: False si le délai a expiré avant.
+        # -------------------------------------------------------------------
+        synchronise = threading.Event()
+        self.file.put(synchronise)
+        return synchronise.wait(delai)
+
+    def _ecrire(self):
+        # Écrit et synchronise d'une traite tout ce qui s'est accumulé dans la file.
+        while True:
+            elements = [self.file.get()]
+            try:
+                while True:
+                    elements.append(self.file.get_nowait())
+            except queue.Empty:
+                pass
+            donnees = b"".join(element for element in elements if isinstance(element, bytes))
+            if donnees:
+                try:
+                    if self.taille + len(donnees) > TAILLE_SEGMENT and self.taille > ENTETE.size:
+                        self._changer_segment()
+                    os.write(self.segment, donnees)
+                    _synchroniser_donnees(self.segment)
+                    self.taille += len(donnees)
+                except OSError as erreur:
+                    # Disque plein, par exemple : le lot est perdu, mais le journal continue. Le segment
+                    # a pu recevoir un enregistrement tronqué, qui termine sa lecture : on en change.
+                    print(f"Journal non écrit ({len(donnees)} octets) : {erreur}")
+                    self.taille = TAILLE_SEGMENT
+            for element in elements:
+                if isinstance(element, threading.Event):
+                    element.set()
+
+    def _changer_segment(self):
+        os.close(self.segment)
+        self.numero += 1
+        self.segment = os.open(self._chemin(self.numero), os.O_WRONLY | os.O_CREAT | os.O_EXCL | _BINAIRE, 0o644)
+        os.write(self.segment, ENTETE.pack(MAGIE, VERSION))
+        os.fsync(self.segment)
+        self._synchroniser_dossier()
+        self.taille = ENTETE.size
@@ -0,0 +1,215 @@
+import bisect
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TAILLE_LOT = 1024  # Valeurs en attente au-delà desquelles l'enregistreur tente de les cumuler
+BORNES_DUREES = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 180.0)
+TYPE_CONTENU = 'text/plain; version=0.0.4; charset=utf-8'
+
+# -------------------------------------------------------------------
+# Mesures du serveur (compteurs, jauges, histogrammes), exposées au
+# format texte de Prometheus sur /metrics (voir servir_mesures).
+#
+# Les mesures sont déclarées au niveau des modules qui les alimentent
+# et restent actives en permanence, jusque dans la boucle des tours :
+# enregistrer une valeur ne fait qu'un ajout à une deque (atomique,
+# sans verrou). Les valeurs en attente sont cumulées à la lecture des
+# mesures, ou par l'enregistreur lui-même quand elles s'accumulent, à
+# condition que le verrou de cumul soit libre : un enregistreur
+# n'attend jamais.
+#
+# Mesures de même nom et d'étiquettes différentes forment une famille,
+# rendue sous un seul en-tête HELP/TYPE.
+# -------------------------------------------------------------------
+
+_FAMILLES = {}  # Nom -> (type, aide, mesures)
+_verrou_familles = threading.Lock()
+
+
+def _etiquettes(etiquettes, **autres) -> str:
+    etiquettes = {**etiquettes, **autres}
+    if not etiquettes:
+        return ""
+    return "{" + ",".join(f'{cle}="{valeur}"' for cle, valeur in etiquettes.items()) + "}"
+
+
+def _nombre(valeur) -> str:
+    if valeur == float('inf'):
+        return "+Inf"
+    return repr(valeur) if isinstance(valeur, float) else str(valeur)
+
+
+class Mesure:
+    # -------------------------------------------------------------------
+    # Mesure alimentée sans verrou par plusieurs threads.
+    #
+    # :param nom: Nom Prometheus de la mesure.
+    # :param aide: Description (ligne HELP).
+    # :param etiquettes: Étiquettes propres à cette mesure de la famille.
+    # -------------------------------------------------------------------
+    type = 'untyped'
+
+    def __init__(self, nom, aide, **etiquettes):
+        self.nom = nom
+        self.etiquettes = etiquettes
+        self.en_attente = deque()  # Valeurs enregistrées, pas encore cumulées
+        self.verrou = threading.Lock()  # Un seul thread cumule à la fois
+        with _verrou_familles:
+            _FAMILLES.setdefault(nom, (self.type, aide, []))[2].append(self)
+
+    def _enregistrer(self, valeur):
+        self.en_attente.append(valeur)
+        if len(self.en_attente) > TAILLE_LOT:
+            self._cumuler(attendre=False)
+
+    def _cumuler(self, attendre=True):
+        if not self.verrou.acquire(attendre):
+            return  # Un autre thread cumule déjà
+        try:
+            self._vider()
+        finally:
+            self.verrou.release()
+
+    def _vider(self):
+        # Sous le verrou : seules les valeurs présentes au départ sont cumulées.
+        en_attente = self.en_attente
+        for _ in range(len(en_attente)):
+            self._integrer(en_attente.popleft())
+
+    def _integrer(self, valeur):
+        raise NotImplementedError
+
+    def lignes(self):
+        raise NotImplementedError
+
+
+class Compteur(Mesure):
+    # -------------------------------------------------------------------
+    # Total qui ne fait que croître (tours joués, octets envoyés...).
+    # -------------------------------------------------------------------
+    type = 'counter'
+
+    def __init__(self, nom, aide, **etiquettes):
+        self.total = 0
+        super().__init__(nom, aide, **etiquettes)
+
+    def ajouter(self, valeur=1):
+        self._enregistrer(valeur)
+
+    def _integrer(self, valeur):
+        self.total += valeur
+
+    def valeur(self):
+        self._cumuler()
+        return self.total
+
+    def lignes(self):
+        yield f"{self.nom}{_etiquettes(self.etiquettes)} {_nombre(self.valeur())}"
+
+
+class Jauge(Compteur):
+    # -------------------------------------------------------------------
+    # Valeur qui monte et descend (connexions ouvertes...) : ajouter(-1).
+    # -------------------------------------------------------------------
+    type = 'gauge'
+
+
+class JaugeCalculee(Mesure):
+    # -------------------------------------------------------------------
+    # Jauge calculée à la lecture par sa source, une fonction qui renvoie
+    # {valeur de l'étiquette: nombre} (parties par état, par exemple).
+    # Sans source, la jauge n'est pas rendue.
+    #
+    # :param etiquette: Nom de l'étiquette qui distingue les valeurs.
+    # -------------------------------------------------------------------
+    type = 'gauge'
+
+    def __init__(self, nom, aide, etiquette):
+        self.etiquette = etiquette
+        self.source = None
+        super().__init__(nom, aide)
+
+    def lignes(self):
+        if self.source is None:
+            return
+        for cle, valeur in self.source().items():
+            yield f"{self.nom}{_etiquettes(self.etiquettes, **{self.etiquette: cle})} {_nombre(valeur)}"
+
+
+class Histogramme(Mesure):
+    # -------------------------------------------------------------------
+    # Répartition de durées (ou de tailles) entre des bornes croissantes.
+    #
+    # :param bornes: Bornes supérieures des classes, en secondes.
+    # -------------------------------------------------------------------
+    type = 'histogram'
+
+    def __init__(self, nom, aide, bornes=BORNES_DUREES, **etiquettes):
+        self.bornes = tuple(bornes)
+        self.comptes = [0] * (len(self.bornes) + 1)  # Dernière classe : au-delà de la dernière borne
+        self.somme = 0.0
+        super().__init__(nom, aide, **etiquettes)
+
+    def observer(self, valeur):
+        self._enregistrer(valeur)
+
+    def _integrer(self, valeur):
+        self.comptes[bisect.bisect_left(self.bornes, valeur)] += 1
+        self.somme += valeur
+
+    def lignes(self):
+        with self.verrou:
+            self._vider()
+            comptes, somme = list(self.comptes), self.somme
+        cumul = 0
+        for borne, compte in zip(self.bornes + (float('inf'),), comptes):
+            cumul += compte
+            yield f"{self.nom}_bucket{_etiquettes(self.etiquettes, le=_nombre(borne))} {cumul}"
+        yield f"{self.nom}_sum{_etiquettes(self.etiquettes)} {_nombre(somme)}"
+        yield f"{self.nom}_count{_etiquettes(self.etiquettes)} {cumul}"
+
+
+def rendre_mesures() -> str:
+    # -------------------------------------------------------------------
+    # :return: Toutes les mesures au format texte de Prometheus.
+    # -------------------------------------------------------------------
+    with _verrou_familles:
+        familles = [(nom, type_, aide, list(mesures)) for nom, (type_, aide, mesures) in _FAMILLES.items()]
+    lignes = []
+    for nom, type_, aide, mesures in familles:
+        lignes += [f"# HELP {nom} {aide}", f"# TYPE {nom} {type_}"]
+        for mesure in mesures:
+            lignes.extend(mesure.lignes())
+    return "\n".join(lignes) + "\n"
+
+
+class _GestionnaireMesures(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        corps = rendre_mesures().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', TYPE_CONTENU)
+        self.send_header('Content-Length', str(len(corps)))
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def log_message(self, format, *args):
+        pass  # Une lecture toutes les quelques secondes : pas de trace
+
+
+def servir_mesures(host='127.0.0.1', port=9100):
+    # -------------------------------------------------------------------
+    # Sert les mesures sur http://host:port/metrics, dans un thread de
+    # fond (quel que soit le mode du serveur).
+    #
+    # :return: Le serveur HTTP, déjà à l'écoute.
+    # -------------------------------------------------------------------
+    serveur = ThreadingHTTPServer((host, port), _GestionnaireMesures)
+    serveur.daemon_threads = True
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+    print(f"Les mesures du serveur sont servies sur http://{host}:{port}/metrics")
+    return serveur
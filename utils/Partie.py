@@ -1,84 +1,362 @@
-import random
 import threading
 import time
 
+from utils.CalculateurDeScore import CalculateurDeScore, FIGURES, INDEX_FIGURE
+from utils.Chat import SalleChat
+from utils.Conseiller import Conseiller
+from utils.Des import source_partie
 from utils.FeuilleScore import FeuilleScore
+from utils.Mesures import Compteur, Histogramme
+from utils.Protocole import (AUCUN_JOUEUR, AUCUNE_ERREUR, Code, ERREUR_DEJA_REMPLIE, ERREUR_INVALIDE,
+                             FIGURE_CONSEIL, MASQUE_FIGURES, RELANCE_CONSEIL, RELANCE_OUI, encoder)
+from utils.Rejeu import tour_rejeu
+from utils.Statistiques import resultats_partie
+from utils.Tableau import rendre_classement, rendre_fin_partie
+from utils.Trames import encoder_trame
+
+ALTERNATIVES_CONSEIL = 2  # Gardes proposées après la meilleure
+DELAI_TOUR = 180.0  # Secondes accordées à un joueur pour jouer tout son tour
+DELAI_RECONNEXION = 120.0  # Secondes pendant lesquelles un joueur déconnecté garde sa place
+
+TOURS = Compteur('yahtzee_tours_total', "Tours commencés")
+# Temps passé par tour dans chaque phase : lancers (dés, journal, spectateurs), attente des
+# réponses aux relances, attente du choix de la figure, score et diffusion des résultats.
+PHASES_TOUR = {phase: Histogramme('yahtzee_phase_tour_secondes', "Durée de chaque phase d'un tour", phase=phase)
+               for phase in ('lancer', 'relance', 'figure', 'diffusion')}
+DIFFUSION = Histogramme('yahtzee_diffusion_secondes', "Durée d'une diffusion à toute la table",
+                        bornes=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1))
 
 
 class Partie:
-    def __init__(self, required_players, player, socket):
-        self.players = [{'name': player, 'socket': socket}]
-        self.scores = {player: 0}
+    def __init__(self, required_players, player, connexion, conseiller=None, delai_tour=DELAI_TOUR,
+                 delai_reconnexion=DELAI_RECONNEXION, journal=None, statistiques=None, rejeu=None,
+                 graine=None, source_des=None):
+        self.identifiant = None  # Attribué par le registre des parties (utils.Salon)
+        self.players = [{'name': player, 'connexion': connexion}]
         self.feuilles_scores = {player: FeuilleScore()}
         self.required_players = required_players
         self.game_started = False
+        self.terminee = False
         self.turn_lock = threading.Lock()
         self.current_turn = 0
         self.max_turns = 13
+        self.conseiller = conseiller if conseiller is not None else Conseiller()  # Conseils sur demande ('C')
+        self.chat = SalleChat()  # Chat réservé aux joueurs de la partie
+        self.delai_tour = delai_tour  # Au-delà, le serveur termine le tour à la place du joueur
+        self.spectateurs = ()  # Connexions des spectateurs, tuple remplacé à chaque arrivée ou départ
+        self.etat = threading.RLock()  # Ordonne l'instantané d'un nouveau spectateur et les changements
+        self.instantane = None  # Trame de l'instantané de l'état courant, partagée par les spectateurs
+        self.courant = AUCUN_JOUEUR  # Position du joueur en cours
+        self.des = (0, [0] * 5)  # (relance, dés) du tour en cours
+        self.delai_reconnexion = delai_reconnexion  # Au-delà, les tours du joueur absent sont passés
+        self.retour = threading.Condition(self.etat)  # Signale le retour d'un joueur absent
+        self.journal = journal  # Journal des événements (utils.Journal), ou None
+        self.statistiques = statistiques  # Statistiques des joueurs (utils.Statistiques), ou None
+        self.rejeu = rejeu  # Fichier des rejeux (utils.Rejeu.EcrivainRejeu), ou None
+        self.tours_rejeu = []  # Enregistrements des tours joués, écrits à la fin de la partie
+        self.graine = graine  # Graine du serveur : mêmes dés pour la même partie (voir utils.Des)
+        self.source_des = source_des  # Source des dés (utils.Des), créée au premier lancer si None
+        self.jetons = {}  # Nom -> jeton de session, inscrit au journal avec la partie (voir utils.Salon)
+        self.restauree = False  # Partie recréée depuis le journal, déjà commencée
+        self.des_restaures = None  # (relance, dés) du tour interrompu par l'arrêt du serveur
+
+    @property
+    def scores(self):
+        # -------------------------------------------------------------------
+        # Score total de chaque joueur, lu sur sa feuille (tenu à jour en O(1)).
+        # -------------------------------------------------------------------
+        return {name: feuille.total for name, feuille in self.feuilles_scores.items()}
 
     def peut_rejoindre(self):
         return len(self.players) < self.required_players and not self.game_started
 
-    def information_partie(self):
-        return f"Nombre de joueurs: {len(self.players)} / {self.required_players} - Tour actuel: {self.current_turn} / {self.max_turns} - Joueurs: {', '.join([player['name'] for player in self.players])} - Partie commencée: {self.game_started}"
+    def a_joueur(self, nom):
+        # Les places, les feuilles et les jetons sont repérés par le nom : il est unique à une table.
+        return any(player['name'] == nom for player in self.players)
 
-    def broadcast(self, message):
+    def resume(self):
+        # -------------------------------------------------------------------
+        # Informations de la partie pour la liste envoyée aux joueurs
+        # (message LISTE_PARTIES, mis en forme par le client).
+        # -------------------------------------------------------------------
+        return (self.identifiant, len(self.players), self.required_players, self.current_turn, self.max_turns,
+                self.game_started, [player['name'] for player in self.players])
+
+    def broadcast(self, message, spectateurs=True):
         # -------------------------------------------------------------------
         # Envoie un message à tous les joueurs connectés.
         #
-        # :param message: Message à envoyer.
+        # La trame est encodée une seule fois et déposée telle quelle dans
+        # la file d'envoi de chaque joueur : un joueur lent ne retarde pas
+        # les autres (voir utils.Connexion).
+        #
+        # Un joueur déconnecté quitte une partie en attente ; dans une
+        # partie commencée, il garde sa place, sa feuille et son rang (voir
+        # reprendre).
+        #
+        # :param message: Message à envoyer (voir utils.Protocole).
+        # :param spectateurs: False si le message ne concerne pas les spectateurs.
         # -------------------------------------------------------------------
+        debut = time.perf_counter()
+        trame = encoder_trame(message)
+        if spectateurs:
+            self.montrer(trame)
         disconnected_players = []
         for player in self.players:
             try:
-                player["socket"].send(message.encode())
+                player["connexion"].deposer(trame)
             except (BrokenPipeError, ConnectionResetError):
-                print(f"Le joueur {player['name']} a été déconnecté.")
-                disconnected_players.append(player)
+                if self.game_started:
+                    self._marquer_absent(player)
+                else:
+                    print(f"Le joueur {player['name']} a été déconnecté.")
+                    disconnected_players.append(player)
 
         for player in disconnected_players:
             self.players.remove(player)
-            del self.scores[player["name"]]
             del self.feuilles_scores[player["name"]]
+            player["connexion"].fermer()
+        if disconnected_players:
+            self.montrer_table()
+        DIFFUSION.observer(time.perf_counter() - debut)
+
+    def _marquer_absent(self, player):
+        if 'depart' not in player:
+            print(f"Le joueur {player['name']} a été déconnecté, sa place lui est gardée.")
+            player['depart'] = time.monotonic()
+            player['connexion'].fermer()
 
-    def attendre_joueurs(self):
+    def _absent(self, player):
+        if player['connexion'].est_fermee():
+            self._marquer_absent(player)
+            return True
+        return False
+
+    def _perdu(self, player):
+        # Absent depuis plus longtemps que le délai de reconnexion.
+        return self._absent(player) and time.monotonic() >= player['depart'] + self.delai_reconnexion
+
+    def reprendre(self, nom, connexion):
+        # -------------------------------------------------------------------
+        # Rend sa place à un joueur revenu sur une nouvelle connexion (voir
+        # utils.Salon), avant la fin du délai de reconnexion.
+        #
+        # L'ancienne connexion est fermée, même si sa coupure n'a pas encore
+        # été remarquée : un tour en cours sur elle se termine par défaut.
+        # Le joueur reçoit l'instantané de la partie (dés, feuilles, joueur
+        # en cours), puis les mêmes messages que les autres joueurs.
+        #
+        # :return: True si le joueur a retrouvé sa place.
         # -------------------------------------------------------------------
-        # Attend que le nombre requis de joueurs se connecte avant de commencer la partie.
+        with self.retour:
+            player = next((player for player in self.players if player['name'] == nom), None)
+            if player is None or self.terminee or self._perdu(player):
+                return False
+            ancienne, player['connexion'] = player['connexion'], connexion
+            player.pop('depart', None)
+            ancienne.fermer()
+            connexion.deposer(self._instantane())
+            self.signaler_retour()
+        print(f"Le joueur {nom} a retrouvé sa place.")
+        return True
+
+    def signaler_retour(self):
+        self.retour.notify_all()
+
+    def attendre_retour(self, player):
         # -------------------------------------------------------------------
-        while len(self.players) < self.required_players:
-            self.broadcast(
-                f"Serveur : En attente de {self.required_players - len(self.players)} joueur(s) pour démarrer la partie...\n")
-            time.sleep(2)
+        # Attend, au plus jusqu'à la fin de son délai de reconnexion, le
+        # retour d'un joueur absent dont c'est le tour.
+        #
+        # :return: True si le joueur est là pour jouer son tour.
+        # -------------------------------------------------------------------
+        with self.retour:
+            while self._absent(player):
+                restant = player['depart'] + self.delai_reconnexion - time.monotonic()
+                if restant <= 0:
+                    return False
+                self.retour.wait(restant)
+        return True
+
+    @staticmethod
+    def prevenir(connexion, message):
+        # Un joueur absent n'est pas prévenu : il recevra l'instantané à son retour.
+        try:
+            connexion.envoyer(message)
+        except ConnectionResetError:
+            pass
 
+    def peut_observer(self):
+        return not self.terminee
+
+    def observer(self, connexion):
+        # -------------------------------------------------------------------
+        # Ajoute un spectateur : il reçoit l'instantané de l'état courant,
+        # puis chaque changement (voir montrer).
+        #
+        # L'instantané n'est encodé qu'une fois par état de la partie et
+        # partagé par tous les spectateurs arrivés entre deux changements.
+        # -------------------------------------------------------------------
+        with self.etat:
+            connexion.deposer(self._instantane())
+            self.spectateurs = self.spectateurs + (connexion,)
+
+    def _instantane(self):
+        if self.instantane is None:
+            self.instantane = encoder_trame(encoder(
+                Code.INSTANTANE, self.current_turn, self.max_turns, self.courant, *self.des,
+                [(player['name'], *self._etat_feuille(player['name'])) for player in self.players]))
+        return self.instantane
+
+    def _etat_feuille(self, nom):
+        feuille = self.feuilles_scores[nom]
+        return feuille.masque, feuille.valeurs, feuille.bonus
+
+    def montrer_table(self):
+        # -------------------------------------------------------------------
+        # La composition de la table a changé (arrivée ou départ d'un
+        # joueur, rare) : les spectateurs reçoivent un nouvel instantané.
+        # -------------------------------------------------------------------
+        with self.etat:
+            self.instantane = None
+            if self.spectateurs:
+                trame = self._instantane()
+                self.montrer(trame)
+                self.instantane = trame
+
+    def montrer(self, trame):
+        # -------------------------------------------------------------------
+        # Dépose une trame déjà encodée chez tous les spectateurs, sans
+        # jamais attendre : un spectateur lent ou parti est retiré, sans
+        # effet sur les joueurs.
+        # -------------------------------------------------------------------
+        with self.etat:
+            self.instantane = None  # L'état a changé
+            partis = []
+            for connexion in self.spectateurs:
+                try:
+                    connexion.deposer(trame)
+                except (BrokenPipeError, ConnectionResetError):
+                    partis.append(connexion)
+            if partis:
+                self.spectateurs = tuple(connexion for connexion in self.spectateurs if connexion not in partis)
+
+    def annoncer_places(self):
+        # -------------------------------------------------------------------
+        # Prévient les joueurs assis du nombre de places restant à pourvoir.
+        # Appelée par le salon (utils.Salon) à chaque changement.
+        # -------------------------------------------------------------------
+        self.broadcast(encoder(Code.ATTENTE, self.required_players - len(self.players)))
+
+    def demarrer(self):
+        # -------------------------------------------------------------------
+        # Démarre la partie, dès que le nombre requis de joueurs est atteint.
+        # -------------------------------------------------------------------
         self.game_started = True
+        self.noter_debut()
+
+        try:
+            self.broadcast(encoder(Code.DEBUT_PARTIE))
+            self.tour()
+            self.noter_fin()  # Une partie interrompue par l'arrêt du serveur reste à reprendre
+        finally:
+            self.terminee = True  # Même interrompue, la partie peut être retirée du registre
+
+    def noter_debut(self):
+        if self.journal is not None and not self.restauree:
+            self.journal.debut(self.identifiant, self.max_turns,
+                               [(player['name'], self.jetons.get(player['name'], bytes(16))) for player in self.players])
 
-        self.broadcast("Tous les joueurs sont connectés. La partie commence!\n")
-        self.tour()
+    def noter_fin(self):
+        if self.journal is not None:
+            self.journal.fin(self.identifiant)
+
+    def passer_tour(self):
+        # Tour d'un joueur absent au-delà du délai de reconnexion.
+        if self.journal is not None:
+            self.journal.passe(self.identifiant)
+
+    def restaurer(self, etat):
+        # -------------------------------------------------------------------
+        # Reprend l'état d'une partie relu dans le journal (utils.Journal) :
+        # feuilles, tour, dés du tour interrompu. Ses joueurs la retrouvent
+        # avec le jeton de leur session (voir reprendre). Le journal ne garde
+        # pas les lancers : seuls les tours joués après la reprise vont aux
+        # rejeux (utils.Rejeu).
+        #
+        # :param etat: EtatPartie de la partie.
+        # -------------------------------------------------------------------
+        self.identifiant = etat.identifiant
+        self.max_turns = etat.tours_max
+        self.jetons = dict(etat.joueurs)
+        for joueur, position, points in etat.scores:
+            self.feuilles_scores[self.players[joueur]['name']].noter_score(FIGURES[position], points)
+        self.current_turn = etat.tour
+        self.des_restaures = etat.des
+        self.game_started = self.restauree = True
 
     def est_terminee(self):
         # -------------------------------------------------------------------
-        # Vérifie si la partie est terminée.
+        # Vérifie si la partie est terminée : vainqueur annoncé, ou partie
+        # interrompue par la déconnexion du joueur en cours.
         #
         # :return: True si la partie est terminée, False sinon.
         # -------------------------------------------------------------------
-        return self.current_turn >= self.max_turns * len(self.players)
+        return self.terminee
+
+    def est_abandonnee(self):
+        # -------------------------------------------------------------------
+        # Vérifie si tous les joueurs ont quitté la partie : plus personne
+        # dans une partie en attente, ou plus aucun joueur revenu à temps
+        # dans une partie commencée.
+        # -------------------------------------------------------------------
+        return not self.players or (self.game_started and all(self._perdu(player) for player in self.players))
+
+    def retirer_deconnectes(self):
+        # -------------------------------------------------------------------
+        # Retire de la partie en attente les joueurs qui ont fermé leur
+        # connexion, et prévient les autres si des places se libèrent.
+        # -------------------------------------------------------------------
+        deconnectes = [player for player in self.players if player['connexion'].est_fermee()]
+        for player in deconnectes:
+            print(f"Le joueur {player['name']} a quitté la partie en attente.")
+            self.players.remove(player)
+            del self.feuilles_scores[player['name']]
+            player['connexion'].fermer()
+        if deconnectes:
+            self.montrer_table()
+        if deconnectes and self.players:
+            self.annoncer_places()
+
+    def fermer(self):
+        # -------------------------------------------------------------------
+        # Ferme les connexions des joueurs restants et des spectateurs, une
+        # fois la partie retirée du registre.
+        # -------------------------------------------------------------------
+        for connexion in self.connexions() + list(self.spectateurs):
+            try:
+                connexion.fermer()
+            except OSError:
+                pass
 
-    def client_sockets(self):
-        return [player['socket'] for player in self.players]
+    def connexions(self):
+        return [player['connexion'] for player in self.players]
 
-    def rejoindre_partie(self, player, socket):
+    def rejoindre_partie(self, player, connexion):
         # -------------------------------------------------------------------
         # Ajoute un joueur à la partie.
         #
         # :param player: Nom du joueur à ajouter.
-        # :param socket: Socket du joueur à ajouter.
+        # :param connexion: Connexion du joueur à ajouter.
+        # :return: True si le joueur a été ajouté, False si la partie est pleine.
         # -------------------------------------------------------------------
         if len(self.players) >= self.required_players:
-            socket.send("Serveur : La partie est déjà pleine.\n".encode())
+            connexion.envoyer(encoder(Code.PARTIE_PLEINE))
             return False
-        self.players.append({'name': player, 'socket': socket})
-        self.scores[player] = 0
+        self.players.append({'name': player, 'connexion': connexion})
         self.feuilles_scores[player] = FeuilleScore()
+        self.montrer_table()
+        return True
 
     def tour(self):
         # -------------------------------------------------------------------
@@ -90,23 +368,50 @@ class Partie:
         # de tours après chaque action. Quand le nombre maximum de tours est
         # atteint, elle appelle la méthode pour annoncer le vainqueur.
         #
-        # :param client_socket: Socket du client correspondant au joueur en cours.
-        # :param player_name: Nom du joueur en cours.
+        # Le tour d'un joueur absent attend son retour ; passé le délai de
+        # reconnexion, ses tours sont passés. La partie s'arrête si plus
+        # aucun joueur n'est revenu à temps.
         # -------------------------------------------------------------------
-        while self.current_turn < self.max_turns * len(self.players):
+        while self.current_turn < self.max_turns * len(self.players) and not self.est_abandonnee():
             with self.turn_lock:
-                player_index = self.current_turn % len(self.players)
-                player_name = self.players[player_index]['name']
-                client_socket = self.players[player_index]['socket']
-                print(f"{player_name} est en train de jouer.")
-                client_socket.send(f"Serveur : C'est votre tour, {player_name}.\n".encode())
-                self.jouer_tour(client_socket, player_name)
+                if self.attendre_retour(self.players[self.current_turn % len(self.players)]):
+                    connexion, player_name = self.joueur_courant()
+                    self.jouer_tour(connexion, player_name)
+                else:
+                    self.passer_tour()
                 self.current_turn += 1
 
         if self.current_turn >= self.max_turns * len(self.players):
             self.annoncer_vainqueur()
 
-    def jouer_tour(self, client_socket, player_name):
+    def joueur_courant(self):
+        # -------------------------------------------------------------------
+        # Désigne le joueur dont c'est le tour et le prévient.
+        #
+        # :return: (connexion, nom) du joueur en cours.
+        # -------------------------------------------------------------------
+        player = self.players[self.current_turn % len(self.players)]
+        print(f"{player['name']} est en train de jouer.")
+        TOURS.ajouter()
+        message = encoder(Code.VOTRE_TOUR, player['name'])
+        with self.etat:
+            self.courant = self.current_turn % len(self.players)
+            self.des = (0, [0] * 5)
+            self.montrer(encoder_trame(message))  # Les spectateurs voient qui joue
+        self.prevenir(player['connexion'], message)
+        return player['connexion'], player['name']
+
+    def jouer_tour(self, connexion, player_name):
+        # -------------------------------------------------------------------
+        # Joue le tour d'un joueur sur une connexion bloquante, avant
+        # l'échéance du tour.
+        #
+        # :param connexion: Connexion du joueur en cours.
+        # :param player_name: Nom du joueur en cours.
+        # -------------------------------------------------------------------
+        connexion.executer(self.deroulement_tour(connexion, player_name), time.monotonic() + self.delai_tour)
+
+    def deroulement_tour(self, connexion, player_name):
         # -------------------------------------------------------------------
         # Gère le tour d'un joueur, incluant le lancer des dés, les relances,
         # le choix de la figure à remplir et le calcul du score.
@@ -119,94 +424,155 @@ class Partie:
         # - Calcule et enregistre le score pour la figure choisie.
         # - Diffuse les points marqués à tous les joueurs et affiche le tableau des scores.
         #
-        # :param client_socket: Socket du client correspondant au joueur en cours.
+        # C'est un générateur (voir utils.Connexion) : chaque question est
+        # produite par `yield` et la réponse du joueur y est renvoyée, ce qui
+        # permet de jouer le même tour en mode threadé comme en mode asyncio.
+        #
+        # Une question laissée sans réponse dans les délais reçoit None : le
+        # joueur garde ses dés, puis marque la figure conseillée.
+        #
+        # :param connexion: Connexion du joueur en cours.
         # :param player_name: Nom du joueur en cours.
         # -------------------------------------------------------------------
-        dice = [random.randint(1, 6) for _ in range(5)]
-        client_socket.send(f"Serveur : Résultat initial des dés: {dice}\n".encode())
-
-        for _ in range(2):
-            client_socket.send("Serveur : Voulez-vous relancer des dés ? (O/N):".encode())
-            response = client_socket.recv(1024).decode().strip().upper()
-            if response == "O":
-                client_socket.send("Serveur : Indiquez les indices des dés à relancer (ex: 1,3,5):".encode())
-                indices = client_socket.recv(1024).decode().strip()
-                if indices:
-                    indices = list(map(int, indices.split(',')))
-                    for i in indices:
-                        dice[i - 1] = random.randint(1, 6)
-                client_socket.send(f"Serveur : Résultat après relance: {dice}\n".encode())
+        feuille = self.feuilles_scores[player_name]
+        debut = time.perf_counter()  # Durées des phases du tour (PHASES_TOUR)
+        if self.des_restaures is not None:  # Tour interrompu par l'arrêt du serveur : mêmes dés, mêmes relances
+            (relance, dice), self.des_restaures = self.des_restaures, None
+        else:
+            relance, dice = 0, self.lancer_des(5)
+        messages = [self.montrer_des(relance, dice)]  # Partent avec la question suivante
+        lancers, gardes = [None] * relance + [list(dice)], [0] * relance  # Pour le rejeu
+        duree_lancers, attente_relances, attente_figure = time.perf_counter() - debut, 0.0, 0.0
+
+        relances_restantes = 2 - relance
+        while relances_restantes > 0:
+            debut = time.perf_counter()
+            response = yield (*messages, encoder(Code.DEMANDE_RELANCE, relances_restantes))
+            attente_relances += time.perf_counter() - debut
+            messages = []
+            if response == RELANCE_CONSEIL:
+                # Le conseil ne consomme pas de relance : la question est reposée avec lui.
+                classement = yield from self.calculer(self.conseiller.classer_gardes, dice, relances_restantes,
+                                                      feuille)
+                messages.append(encoder(Code.CONSEIL_GARDES, classement[:1 + ALTERNATIVES_CONSEIL]))
+            elif response == RELANCE_OUI:
+                debut = time.perf_counter()
+                a_relancer = yield encoder(Code.DEMANDE_INDICES)
+                attente_relances += time.perf_counter() - debut
+                if a_relancer is None:
+                    break
+                debut = time.perf_counter()
+                nouveaux = iter(self.lancer_des(bin(a_relancer & 0b11111).count('1')))
+                for i in range(5):
+                    if a_relancer >> i & 1:
+                        dice[i] = next(nouveaux)
+                relances_restantes -= 1
+                gardes.append(~a_relancer & 0b11111)
+                lancers.append(list(dice))
+                messages.append(self.montrer_des(2 - relances_restantes, dice))
+                duree_lancers += time.perf_counter() - debut
             else:
                 break
 
-        # Correction de la construction de la chaîne à envoyer
-        figures_disponibles = [
-            figure for figure, score in self.feuilles_scores[player_name].scores.items() if score is None
-        ]
-        tableau_meilleur_score = self.feuilles_scores[player_name].afficher_score(dice)
-        client_socket.send(str(tableau_meilleur_score).encode())
-        time.sleep(0.5)
-        client_socket.send(
-            ("Serveur :  Choisissez une figure à remplir:" + ",".join(figures_disponibles) + ":\n").encode())
-
+        # La feuille est rendue par le client, avec les scores théoriques des dés.
+        messages.append(encoder(Code.FEUILLE, feuille.masque, feuille.valeurs, feuille.bonus))
+        disponibles = ~feuille.masque & MASQUE_FIGURES
+        erreur = AUCUNE_ERREUR
         while True:
-            figure = client_socket.recv(1024).decode().strip()
-            if figure not in self.feuilles_scores[player_name].scores:
-                client_socket.send("Serveur : Figure invalide, tour ignoré.\n".encode())
-            if self.feuilles_scores[player_name].scores[figure] is not None:
-                client_socket.send("Serveur : Figure déjà remplie.\n".encode())
-                client_socket.send(
-                    ("Serveur :  Choisissez une figure à remplir:" + ",".join(figures_disponibles) + ":\n").encode())
-
+            debut = time.perf_counter()
+            position = yield (*messages, encoder(Code.DEMANDE_FIGURE, disponibles, erreur))
+            attente_figure += time.perf_counter() - debut
+            messages, erreur = [], AUCUNE_ERREUR
+            if position is None:
+                position = INDEX_FIGURE[(yield from self.calculer(self.conseiller.conseil_figure, dice, feuille))]
+                break
+            elif position == FIGURE_CONSEIL:
+                figure_conseillee = yield from self.calculer(self.conseiller.conseil_figure, dice, feuille)
+                messages.append(encoder(Code.CONSEIL_FIGURE, INDEX_FIGURE[figure_conseillee]))
+            elif position >= len(FIGURES):
+                erreur = ERREUR_INVALIDE
+            elif feuille.masque >> position & 1:
+                erreur = ERREUR_DEJA_REMPLIE
             else:
                 break
 
-        score = self.feuilles_scores[player_name].calculer_score(figure, dice)
-        self.feuilles_scores[player_name].noter_score(figure, score)
-        self.scores[player_name] = sum(
-            v for v in self.feuilles_scores[player_name].scores.values() if v is not None
-        )
-        client_socket.send(f"Serveur : Points ajoutés: {score}. Score total: {self.scores[player_name]}\n".encode())
-        self.broadcast(f"{player_name} a marqué {score} points pour la figure {figure}.\n")
+        debut = time.perf_counter()
+        figure = FIGURES[position]
+        score = CalculateurDeScore.score(figure, dice)
+        with self.etat:  # Un spectateur qui arrive voit le score dans l'instantané ou dans ce message, pas les deux
+            feuille.noter_score(figure, score)
+            if self.journal is not None:
+                self.journal.score(self.identifiant, self.courant, position, score)
+            self.prevenir(connexion, encoder(Code.POINTS, position, score, feuille.total))
+            self.broadcast(encoder(Code.SCORE_MARQUE, position, score, player_name))
+        if self.rejeu is not None:
+            self.tours_rejeu.append(tour_rejeu(self.identifiant, self.current_turn // len(self.players), self.courant,
+                                               lancers, gardes, position, score))
         self.afficher_tableauScore()
+        for phase, duree in (('lancer', duree_lancers), ('relance', attente_relances), ('figure', attente_figure),
+                             ('diffusion', time.perf_counter() - debut)):
+            PHASES_TOUR[phase].observer(duree)
+
+    def calculer(self, fonction, *arguments):
+        # -------------------------------------------------------------------
+        # Calcul coûteux d'un tour (conseils), appelé par `yield from` dans
+        # deroulement_tour : exécuté sur place dans le thread de la partie.
+        # PartieAsync le confie à un exécuteur, hors de la boucle d'événements.
+        # -------------------------------------------------------------------
+        return fonction(*arguments)
+        yield  # Fait de cette méthode un générateur, comme celle de PartieAsync
+
+    def lancer_des(self, nombre):
+        if self.source_des is None:  # L'identifiant de la partie est connu dès son premier lancer
+            self.source_des = source_partie(self.graine, self.identifiant)
+        return self.source_des.lancer(nombre)
+
+    def montrer_des(self, relance, dice):
+        # -------------------------------------------------------------------
+        # Montre un lancer aux spectateurs.
+        #
+        # :return: Le message DES, à envoyer aussi au joueur en cours.
+        # -------------------------------------------------------------------
+        message = encoder(Code.DES, relance, dice)
+        if self.journal is not None:
+            self.journal.des(self.identifiant, relance, dice)
+        with self.etat:
+            self.des = (relance, list(dice))
+            self.montrer(encoder_trame(message))
+        return message
 
     def afficher_tableauScore(self):
         # -------------------------------------------------------------------
         # Affiche et diffuse le tableau des scores actuels des joueurs.
         #
         # Cette méthode :
-        # - Génère un tableau formaté avec les noms des joueurs et leurs scores respectifs.
-        # - Diffuse le tableau des scores à tous les joueurs connectés.
+        # - Diffuse les scores des joueurs à tous les joueurs connectés, qui
+        #   les mettent en forme.
         # - Affiche le tableau des scores sur le serveur.
         #
         # :return: Aucun retour. Le tableau est affiché et diffusé.
         # ------------------------------------------------------------------
-        header = f"{'Nom du joueur':<20}{'Score':<10}"
-        separator = "-" * len(header)
-        rows = [f"{name:<20}{score:<10}" for name, score in self.scores.items()]
-        score_table = f"\n{header}\n{separator}\n" + "\n".join(rows) + "\n"
-        self.broadcast(score_table)
-        print(f"Tableau des scores actuel:\n{score_table}")
+        scores = self.scores
+        self.broadcast(encoder(Code.CLASSEMENT, scores.items()), spectateurs=False)  # Déduit des scores marqués
+        print(f"Tableau des scores actuel:\n{rendre_classement(scores)}")
 
     def annoncer_vainqueur(self):
         # -------------------------------------------------------------------
         # Annonce le gagnant de la partie en affichant le tableau final des scores.
         #
         # Cette méthode :
-        # - Détermine le joueur avec le score le plus élevé.
-        # - Génère un tableau formaté des scores de tous les joueurs.
-        # - Diffuse le message final à tous les joueurs connectés avec le nom du gagnant.
+        # - Diffuse les scores finaux à tous les joueurs connectés ; le client
+        #   en déduit le gagnant et affiche le message final.
         # - Affiche le message final sur le serveur.
+        # - Confie les résultats aux statistiques des joueurs, sans attendre.
+        # - Ajoute les tours de la partie au fichier des rejeux.
         #
         # :return: Aucun retour. Le tableau des scores et le message du gagnant sont diffusés et affichés.
         # -------------------------------------------------------------------
-        winner = max(self.scores, key=self.scores.get)
-        max_score = self.scores[winner]
-        header = f"{'Nom du joueur':<20}{'Score':<10}"
-        separator = "-" * len(header)
-        rows = [f"{name:<20}{score:<10}" for name, score in self.scores.items()]
-        score_table = f"\n{header}\n{separator}\n" + "\n".join(rows) + "\n"
-        final_message = "La partie est terminée!\n\n" + score_table
-        final_message += f"\nLe gagnant est {winner} avec un score de {max_score} points! Félicitations!\n"
-        self.broadcast(final_message)
-        print(final_message)
+        scores = self.scores
+        self.broadcast(encoder(Code.FIN_PARTIE, scores.items()))
+        print(rendre_fin_partie(scores))
+        if self.statistiques is not None:
+            self.statistiques.enregistrer(resultats_partie(self.feuilles_scores))
+        if self.rejeu is not None:
+            self.rejeu.ecrire(self.tours_rejeu)
@@ -0,0 +1,338 @@
+import struct
+from enum import IntEnum
+
+from utils.CalculateurDeScore import FIGURES
+
+# -------------------------------------------------------------------
+# Protocole de jeu entre le serveur et le client.
+#
+# Chaque message tient dans une trame (voir utils.Trames) : un octet de
+# code suivi d'une charge utile binaire compacte. Les dés sont 5 octets,
+# une figure est son indice dans FIGURES, les scores sont des entiers.
+# Le texte affiché au joueur est produit par le client à partir de ces
+# valeurs ; seuls les noms des joueurs circulent en texte (UTF-8,
+# précédés de leur longueur sur un octet).
+#
+# Les spectateurs d'une partie reçoivent un instantané (INSTANTANE), puis
+# les mêmes messages que les joueurs pour chaque changement : joueur en
+# cours (VOTRE_TOUR), dés (DES), figure marquée (SCORE_MARQUE), fin
+# (FIN_PARTIE). Ils tiennent eux-mêmes les feuilles et les totaux à jour.
+#
+# Chaque question du serveur attend un code de réponse précis
+# (REPONSES) ; encodage et décodage passent par la table CODECS.
+#
+# Un joueur dont la connexion a été coupée en cours de partie répond à
+# DEMANDE_NOM par REPRISE et le jeton de sa session : il retrouve sa
+# place et reçoit l'instantané de la partie (INSTANTANE), puis les mêmes
+# messages qu'avant la coupure.
+# -------------------------------------------------------------------
+
+
+class Code(IntEnum):
+    # Serveur -> client
+    DEMANDE_NOM = 1
+    DEMANDE_MODE = 2
+    DEMANDE_NB_JOUEURS = 3  # erreur
+    LISTE_PARTIES = 4  # [(identifiant, joueurs, requis, tour, tours max, commencée, noms)]
+    DEMANDE_PARTIE = 5  # erreur
+    PARTIE_PLEINE = 6
+    ATTENTE = 7  # joueurs manquants
+    DEBUT_PARTIE = 8
+    VOTRE_TOUR = 9  # nom
+    DES = 10  # relance (0 : lancer initial), 5 dés
+    DEMANDE_RELANCE = 11  # relances restantes
+    DEMANDE_INDICES = 12
+    CONSEIL_GARDES = 13  # [(masque des dés gardés, espérance)], meilleur en tête
+    CONSEIL_FIGURE = 14  # figure
+    FEUILLE = 15  # masque des figures remplies, valeurs, bonus
+    DEMANDE_FIGURE = 16  # masque des figures disponibles, erreur
+    POINTS = 17  # figure, points, total
+    SCORE_MARQUE = 18  # figure, points, nom
+    CLASSEMENT = 19  # [(nom, total)]
+    FIN_PARTIE = 20  # [(nom, total)]
+    SESSION = 21  # jeton, à présenter en ouvrant la connexion de chat ou pour reprendre sa place
+    DELAI_DEPASSE = 22  # le serveur a répondu à la place du joueur
+    INSTANTANE = 23  # tour, tours max, joueur en cours, relance, dés, [(nom, masque, valeurs, bonus)]
+
+    # Client -> serveur
+    NOM = 64  # nom
+    MODE = 65  # MODE_CREER, MODE_REJOINDRE, MODE_AUTO ou MODE_SPECTATEUR
+    NB_JOUEURS = 66  # nombre
+    CHOIX_PARTIE = 67  # identifiant de la partie
+    RELANCE = 68  # RELANCE_NON, RELANCE_OUI ou RELANCE_CONSEIL
+    INDICES = 69  # masque des dés à relancer (bit i = dé i + 1)
+    FIGURE = 70  # figure, ou FIGURE_CONSEIL
+    REPRISE = 71  # jeton d'une session en cours, à la place du nom, pour retrouver sa place
+
+
+# Code de réponse attendu pour chaque question du serveur (ou codes, s'il
+# y a plusieurs réponses possibles).
+REPONSES = {
+    Code.DEMANDE_NOM: (Code.NOM, Code.REPRISE),
+    Code.DEMANDE_MODE: Code.MODE,
+    Code.DEMANDE_NB_JOUEURS: Code.NB_JOUEURS,
+    Code.DEMANDE_PARTIE: Code.CHOIX_PARTIE,
+    Code.DEMANDE_RELANCE: Code.RELANCE,
+    Code.DEMANDE_INDICES: Code.INDICES,
+    Code.DEMANDE_FIGURE: Code.FIGURE,
+}
+
+MODE_CREER = 0
+MODE_REJOINDRE = 1
+MODE_AUTO = 2  # Appariement automatique par taille de table
+MODE_SPECTATEUR = 3  # Regarder une partie sans y jouer
+
+AUCUN_JOUEUR = 255  # Joueur en cours d'un instantané, hors des tours de jeu
+
+RELANCE_NON = 0
+RELANCE_OUI = 1
+RELANCE_CONSEIL = 2
+
+FIGURE_CONSEIL = 255
+
+# Motif du refus de la réponse précédente, renvoyé avec la question.
+AUCUNE_ERREUR = 0
+ERREUR_INVALIDE = 1
+ERREUR_TROP_PEU = 2
+ERREUR_DEJA_REMPLIE = 3
+ERREUR_NOM_PRIS = 4  # Un joueur de ce nom est déjà assis à cette table
+
+MASQUE_FIGURES = (1 << len(FIGURES)) - 1
+
+
+class ErreurProtocole(ConnectionResetError):
+    # -------------------------------------------------------------------
+    # Message mal formé ou inattendu : le pair est traité comme déconnecté.
+    # -------------------------------------------------------------------
+    pass
+
+
+# --- Briques d'encodage ---------------------------------------------
+
+def tronquer_texte(texte: str, taille: int = 255) -> bytes:
+    # -------------------------------------------------------------------
+    # Encode un texte en UTF-8 sur au plus `taille` octets, sans couper un
+    # caractère en deux (le texte tronqué reste décodable).
+    # -------------------------------------------------------------------
+    return texte.encode()[:taille].decode('utf-8', 'ignore').encode()
+
+
+def _encoder_texte(texte: str) -> bytes:
+    donnees = tronquer_texte(texte)
+    return bytes((len(donnees),)) + donnees
+
+
+def _decoder_texte(donnees, position: int = 0) -> tuple[str, int]:
+    # -------------------------------------------------------------------
+    # :return: (texte, position de la suite de la charge utile).
+    # -------------------------------------------------------------------
+    fin = position + 1 + donnees[position]
+    if fin > len(donnees):
+        raise ErreurProtocole("Texte tronqué")
+    return bytes(donnees[position + 1:fin]).decode(), fin
+
+
+def _fixe(format: str, scalaire: bool = False):
+    # -------------------------------------------------------------------
+    # Codec d'une charge utile de taille fixe décrite par un format struct.
+    #
+    # :param scalaire: True si le message ne porte qu'une valeur, décodée seule.
+    # -------------------------------------------------------------------
+    structure = struct.Struct('!' + format)
+    if scalaire:
+        return structure.pack, lambda donnees: structure.unpack(donnees)[0]
+    return structure.pack, structure.unpack
+
+
+def _texte_seul():
+    return _encoder_texte, lambda donnees: _decoder_texte(donnees)[0]
+
+
+def _fixe_puis_texte(format: str):
+    # -------------------------------------------------------------------
+    # Codec d'un en-tête de taille fixe suivi d'un nom.
+    # -------------------------------------------------------------------
+    structure = struct.Struct('!' + format)
+
+    def encoder(*valeurs):
+        return structure.pack(*valeurs[:-1]) + _encoder_texte(valeurs[-1])
+
+    def decoder(donnees):
+        return (*structure.unpack_from(donnees), _decoder_texte(donnees, structure.size)[0])
+
+    return encoder, decoder
+
+
+_DES = struct.Struct('!B5B')
+
+
+def _encoder_des(relance: int, des) -> bytes:
+    return _DES.pack(relance, *des)
+
+
+def _decoder_des(donnees):
+    relance, *des = _DES.unpack(donnees)
+    return relance, des
+
+
+_FEUILLE = struct.Struct(f'!H{len(FIGURES)}sB')
+
+
+def _encoder_feuille(masque: int, valeurs, bonus: int) -> bytes:
+    return _FEUILLE.pack(masque, bytes(valeurs), bonus)
+
+
+_GARDE = struct.Struct('!Bf')
+
+
+def _encoder_gardes(classement) -> bytes:
+    return bytes((len(classement),)) + b"".join(_GARDE.pack(masque, valeur) for masque, valeur in classement)
+
+
+def _decoder_gardes(donnees):
+    return [_GARDE.unpack_from(donnees, 1 + i * _GARDE.size) for i in range(donnees[0])]
+
+
+_SCORE = struct.Struct('!H')
+
+
+def _encoder_classement(scores) -> bytes:
+    scores = list(scores)
+    return bytes((len(scores),)) + b"".join(_SCORE.pack(total) + _encoder_texte(nom) for nom, total in scores)
+
+
+def _decoder_classement(donnees):
+    classement, position = [], 1
+    for _ in range(donnees[0]):
+        (total,) = _SCORE.unpack_from(donnees, position)
+        nom, position = _decoder_texte(donnees, position + _SCORE.size)
+        classement.append((nom, total))
+    return classement
+
+
+_INSTANTANE = struct.Struct('!HBBB5BB')
+
+
+def _encoder_instantane(tour: int, tours_max: int, courant: int, relance: int, des, feuilles) -> bytes:
+    feuilles = list(feuilles)
+    morceaux = [_INSTANTANE.pack(tour, tours_max, courant, relance, *des, len(feuilles))]
+    for nom, masque, valeurs, bonus in feuilles:
+        morceaux.append(_encoder_feuille(masque, valeurs, bonus) + _encoder_texte(nom))
+    return b"".join(morceaux)
+
+
+def _decoder_instantane(donnees):
+    tour, tours_max, courant, relance, *des, nb_feuilles = _INSTANTANE.unpack_from(donnees)
+    feuilles, position = [], _INSTANTANE.size
+    for _ in range(nb_feuilles):
+        masque, valeurs, bonus = _FEUILLE.unpack_from(donnees, position)
+        nom, position = _decoder_texte(donnees, position + _FEUILLE.size)
+        feuilles.append((nom, masque, valeurs, bonus))
+    return tour, tours_max, courant, relance, des, feuilles
+
+
+_RESUME = struct.Struct('!IBBHB?B')
+_NOMBRE = struct.Struct('!H')
+
+
+def _encoder_parties(resumes) -> bytes:
+    resumes = list(resumes)
+    morceaux = [_NOMBRE.pack(len(resumes))]
+    for *valeurs, noms in resumes:
+        morceaux.append(_RESUME.pack(*valeurs, len(noms)))
+        morceaux.extend(_encoder_texte(nom) for nom in noms)
+    return b"".join(morceaux)
+
+
+def _decoder_parties(donnees):
+    resumes, position = [], _NOMBRE.size
+    for _ in range(_NOMBRE.unpack_from(donnees)[0]):
+        *valeurs, nb_noms = _RESUME.unpack_from(donnees, position)
+        position += _RESUME.size
+        noms = []
+        for _ in range(nb_noms):
+            nom, position = _decoder_texte(donnees, position)
+            noms.append(nom)
+        resumes.append((*valeurs, noms))
+    return resumes
+
+
+_VIDE = _fixe('')
+
+# Code -> (encodeur, décodeur de la charge utile).
+CODECS = {
+    Code.DEMANDE_NOM: _VIDE,
+    Code.DEMANDE_MODE: _VIDE,
+    Code.DEMANDE_NB_JOUEURS: _fixe('B', scalaire=True),
+    Code.LISTE_PARTIES: (_encoder_parties, _decoder_parties),
+    Code.DEMANDE_PARTIE: _fixe('B', scalaire=True),
+    Code.PARTIE_PLEINE: _VIDE,
+    Code.ATTENTE: _fixe('B', scalaire=True),
+    Code.DEBUT_PARTIE: _VIDE,
+    Code.VOTRE_TOUR: _texte_seul(),
+    Code.DES: (_encoder_des, _decoder_des),
+    Code.DEMANDE_RELANCE: _fixe('B', scalaire=True),
+    Code.DEMANDE_INDICES: _VIDE,
+    Code.CONSEIL_GARDES: (_encoder_gardes, _decoder_gardes),
+    Code.CONSEIL_FIGURE: _fixe('B', scalaire=True),
+    Code.FEUILLE: (_encoder_feuille, _FEUILLE.unpack),
+    Code.DEMANDE_FIGURE: _fixe('HB'),
+    Code.POINTS: _fixe('BBH'),
+    Code.SCORE_MARQUE: _fixe_puis_texte('BB'),
+    Code.CLASSEMENT: (_encoder_classement, _decoder_classement),
+    Code.FIN_PARTIE: (_encoder_classement, _decoder_classement),
+    Code.SESSION: _fixe('16s', scalaire=True),
+    Code.DELAI_DEPASSE: _VIDE,
+    Code.INSTANTANE: (_encoder_instantane, _decoder_instantane),
+
+    Code.NOM: _texte_seul(),
+    Code.MODE: _fixe('B', scalaire=True),
+    Code.NB_JOUEURS: _fixe('B', scalaire=True),
+    Code.CHOIX_PARTIE: _fixe('I', scalaire=True),
+    Code.RELANCE: _fixe('B', scalaire=True),
+    Code.INDICES: _fixe('B', scalaire=True),
+    Code.FIGURE: _fixe('B', scalaire=True),
+    Code.REPRISE: _fixe('16s', scalaire=True),
+}
+
+
+def encoder(code: Code, *valeurs) -> bytes:
+    # -------------------------------------------------------------------
+    # Encode un message : son code puis sa charge utile.
+    #
+    # :param code: Code du message.
+    # :param valeurs: Valeurs de la charge utile, dans l'ordre de Code.
+    # :return: Le message, à envoyer dans une trame.
+    # -------------------------------------------------------------------
+    return bytes((code,)) + CODECS[code][0](*valeurs)
+
+
+def decoder(message: bytes):
+    # -------------------------------------------------------------------
+    # Décode un message reçu.
+    #
+    # :return: (code, valeur) ; la valeur est un scalaire pour les messages
+    #          à une seule valeur, un tuple ou une liste sinon.
+    # :raises ErreurProtocole: Si le message est mal formé.
+    # -------------------------------------------------------------------
+    try:
+        code = Code(message[0])
+        return code, CODECS[code][1](memoryview(message)[1:])
+    except (IndexError, ValueError, struct.error) as erreur:
+        raise ErreurProtocole(f"Message invalide : {erreur}") from None
+
+
+def decoder_reponse(question: bytes, message: bytes):
+    # -------------------------------------------------------------------
+    # Décode la réponse du joueur à une question du serveur.
+    #
+    # :param question: Message de la question posée.
+    # :param message: Message reçu en retour.
+    # :return: La valeur de la réponse.
+    # :raises ErreurProtocole: Si la réponse ne correspond pas à la question.
+    # -------------------------------------------------------------------
+    code, valeur = decoder(message)
+    attendus = REPONSES[question[0]]
+    if code not in (attendus if isinstance(attendus, tuple) else (attendus,)):
+        raise ErreurProtocole(f"Réponse {code.name} inattendue à {Code(question[0]).name}")
+    return valeur
@@ -0,0 +1,197 @@
+import mmap
+import os
+import struct
+import sys
+from collections import Counter
+
+from utils.CalculateurDeScore import FIGURES
+
+try:
+    import numpy as np
+except ImportError:  # NumPy est optionnel : lecture tour par tour en Python pur.
+    np = None
+
+# -------------------------------------------------------------------
+# Rejeux des parties terminées, pour les analyser hors ligne (figures
+# sacrifiées, effet des relances sur les scores, etc.).
+#
+# Un fichier de rejeux est un en-tête suivi d'enregistrements de taille
+# fixe, un par tour joué (16 octets, petit-boutiste) :
+#
+#   partie (4 octets), manche (1), joueur (1),
+#   dés des trois lancers (3 x 2 octets : 3 bits par dé, 0 si le lancer
+#   n'a pas eu lieu), gardes avant chaque relance (2 x 1 octet : bit i à
+#   1 si le dé i + 1 est gardé), figure (1), points (1).
+#
+# Les parties terminées y sont ajoutées d'un seul bloc (O_APPEND) : les
+# processus de jeu peuvent partager le même fichier. Le lecteur projette
+# le fichier en mémoire (mmap) et parcourt les tours sans rien décoder
+# d'autre que leurs champs ; avec NumPy, le fichier entier se lit comme
+# un tableau structuré, sans copie.
+# -------------------------------------------------------------------
+
+MAGIE = b'YZRJ'
+VERSION = 1
+ENTETE = struct.Struct('<4sHH')  # Magie, version, taille d'un tour
+TOUR = struct.Struct('<IBB3HBBBB')
+CHAMPS = ('partie', 'manche', 'joueur', 'des1', 'des2', 'des3', 'garde1', 'garde2', 'figure', 'points')
+TYPE_TOUR = [('partie', '<u4'), ('manche', 'u1'), ('joueur', 'u1'), ('des1', '<u2'), ('des2', '<u2'),
+             ('des3', '<u2'), ('garde1', 'u1'), ('garde2', 'u1'), ('figure', 'u1'), ('points', 'u1')]
+
+
+def emballer_des(des) -> int:
+    # -------------------------------------------------------------------
+    # :param des: Les 5 dés d'un lancer, ou None s'il n'a pas eu lieu.
+    # :return: Les dés sur 15 bits (dé i sur les bits 3i à 3i + 2).
+    # -------------------------------------------------------------------
+    if des is None:
+        return 0
+    return sum(de << 3 * i for i, de in enumerate(des))
+
+
+def deballer_des(valeur: int) -> list[int]:
+    return [valeur >> 3 * i & 7 for i in range(5)]
+
+
+def tour_rejeu(partie, manche, joueur, lancers, gardes, figure, points) -> bytes:
+    # -------------------------------------------------------------------
+    # Enregistrement d'un tour.
+    #
+    # :param lancers: Dés de chaque lancer du tour (1 à 3 ; None pour un
+    #                 lancer inconnu).
+    # :param gardes: Masque des dés gardés avant chaque relance.
+    # :param figure: Position de la figure marquée dans FIGURES.
+    # -------------------------------------------------------------------
+    des = [emballer_des(lancer) for lancer in lancers] + [0] * (3 - len(lancers))
+    gardes = list(gardes) + [0] * (2 - len(gardes))
+    return TOUR.pack(partie, manche, joueur, *des, *gardes, figure, points)
+
+
+class EcrivainRejeu:
+    # -------------------------------------------------------------------
+    # Ajout des parties terminées à un fichier de rejeux.
+    #
+    # Chaque partie part en une seule écriture en mode ajout (sans
+    # synchronisation : les rejeux servent à l'analyse, pas à la reprise).
+    # Un tour tronqué en fin de fichier (arrêt pendant une écriture) est
+    # retiré à l'ouverture.
+    #
+    # :param chemin: Fichier de rejeux (créé au besoin).
+    # -------------------------------------------------------------------
+
+    def __init__(self, chemin):
+        try:
+            self.descripteur = os.open(chemin, os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_EXCL, 0o644)
+            os.write(self.descripteur, ENTETE.pack(MAGIE, VERSION, TOUR.size))
+        except FileExistsError:
+            self.descripteur = os.open(chemin, os.O_WRONLY | os.O_APPEND)
+            taille = os.fstat(self.descripteur).st_size
+            if taille >= ENTETE.size and (taille - ENTETE.size) % TOUR.size:
+                os.ftruncate(self.descripteur, taille - (taille - ENTETE.size) % TOUR.size)
+
+    def ecrire(self, tours) -> None:
+        # -------------------------------------------------------------------
+        # :param tours: Enregistrements des tours d'une partie (tour_rejeu).
+        # -------------------------------------------------------------------
+        os.write(self.descripteur, b"".join(tours))
+
+    def fermer(self) -> None:
+        os.close(self.descripteur)
+
+
+class LecteurRejeu:
+    # -------------------------------------------------------------------
+    # Lecture d'un fichier de rejeux projeté en mémoire.
+    #
+    # Les tours se parcourent en tuples dans l'ordre de CHAMPS ; seules
+    # les pages lues sont chargées, quelle que soit la taille du fichier.
+    #
+    # :param chemin: Fichier de rejeux.
+    # :raises ValueError: Si le fichier n'est pas un fichier de rejeux.
+    # -------------------------------------------------------------------
+
+    def __init__(self, chemin):
+        with open(chemin, 'rb') as fichier:
+            self.carte = mmap.mmap(fichier.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.carte) < ENTETE.size or ENTETE.unpack_from(self.carte) != (MAGIE, VERSION, TOUR.size):
+            self.carte.close()
+            raise ValueError(f"{chemin} n'est pas un fichier de rejeux (version {VERSION})")
+        self.nb_tours = (len(self.carte) - ENTETE.size) // TOUR.size  # Un tour tronqué est ignoré
+
+    def __len__(self):
+        return self.nb_tours
+
+    def __iter__(self):
+        yield from TOUR.iter_unpack(memoryview(self.carte)[ENTETE.size:ENTETE.size + self.nb_tours * TOUR.size])
+
+    def filtrer(self, **criteres):
+        # -------------------------------------------------------------------
+        # Parcourt les tours dont les champs ont les valeurs demandées
+        # (ex : filtrer(figure=11, points=0) pour les Yahtzee sacrifiés).
+        # -------------------------------------------------------------------
+        indices = [(CHAMPS.index(champ), valeur) for champ, valeur in criteres.items()]
+        for tour in self:
+            if all(tour[indice] == valeur for indice, valeur in indices):
+                yield tour
+
+    def tableau(self):
+        # -------------------------------------------------------------------
+        # :return: Tous les tours, en tableau structuré NumPy (champs de
+        #          CHAMPS) qui partage la mémoire du fichier : à libérer
+        #          avant de fermer le lecteur.
+        # :raises RuntimeError: Sans NumPy.
+        # -------------------------------------------------------------------
+        if np is None:
+            raise RuntimeError("NumPy est nécessaire pour lire les rejeux en tableau")
+        return np.frombuffer(self.carte, dtype=np.dtype(TYPE_TOUR), count=self.nb_tours, offset=ENTETE.size)
+
+    def fermer(self):
+        self.carte.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *erreur):
+        self.fermer()
+
+
+def resumer(lecteur) -> dict:
+    # -------------------------------------------------------------------
+    # Pour chaque figure : nombre de fois marquée, nombre de sacrifices (0
+    # point) et moyenne des points selon le nombre de relances.
+    # -------------------------------------------------------------------
+    if np is not None:
+        tours = lecteur.tableau()
+        relances = (tours['des2'] != 0).astype(np.int64) + (tours['des3'] != 0)
+        marquees = np.bincount(tours['figure'], minlength=len(FIGURES))
+        sacrifices = np.bincount(tours['figure'][tours['points'] == 0], minlength=len(FIGURES))
+        cles = tours['figure'].astype(np.int64) * 3 + relances
+        nombres = np.bincount(cles, minlength=len(FIGURES) * 3)
+        sommes = np.bincount(cles, weights=tours['points'], minlength=len(FIGURES) * 3)
+        moyennes = {(figure, relance): sommes[figure * 3 + relance] / nombres[figure * 3 + relance]
+                    for figure in range(len(FIGURES)) for relance in range(3) if nombres[figure * 3 + relance]}
+        return {'marquees': marquees.tolist(), 'sacrifices': sacrifices.tolist(), 'moyennes': moyennes}
+
+    marquees, sacrifices, nombres, sommes = Counter(), Counter(), Counter(), Counter()
+    for _, _, _, _, des2, des3, _, _, figure, points in lecteur:
+        marquees[figure] += 1
+        if points == 0:
+            sacrifices[figure] += 1
+        cle = (figure, (des2 != 0) + (des3 != 0))
+        nombres[cle] += 1
+        sommes[cle] += points
+    return {'marquees': [marquees[figure] for figure in range(len(FIGURES))],
+            'sacrifices': [sacrifices[figure] for figure in range(len(FIGURES))],
+            'moyennes': {cle: sommes[cle] / nombres[cle] for cle in sorted(nombres)}}
+
+
+if __name__ == "__main__":
+    with LecteurRejeu(sys.argv[1]) as lecteur:
+        resume = resumer(lecteur)
+        print(f"{len(lecteur)} tours")
+        for position, figure in enumerate(FIGURES):
+            marquee, sacrifiee = resume['marquees'][position], resume['sacrifices'][position]
+            moyennes = ", ".join(f"{relance} relance(s) : {resume['moyennes'][(position, relance)]:.1f}"
+                                 for relance in range(3) if (position, relance) in resume['moyennes'])
+            print(f"{figure:<13} marquée {marquee:>9}, sacrifiée {sacrifiee / marquee if marquee else 0:6.1%}"
+                  f"  ({moyennes})")
@@ -0,0 +1,287 @@
+import itertools
+import secrets
+import threading
+
+TAILLE_JETON = 16
+TAILLE_LISTE = 4096  # Parties listées au plus (LISTE_PARTIES), pour borner la trame
+
+
+class Session:
+    # -------------------------------------------------------------------
+    # Joueur connecté au serveur de jeu.
+    #
+    # Le jeton, envoyé au client à l'accueil, lui permet d'identifier sa
+    # connexion de chat : le serveur de chat retrouve ainsi le joueur et
+    # la salle de sa partie en O(1). Il permet aussi au joueur de
+    # retrouver sa place après une coupure de sa connexion de jeu.
+    #
+    # :param nom: Nom du joueur.
+    # :param connexion: Connexion de jeu du joueur.
+    # :param jeton: Jeton d'une session relue dans le journal (sinon tiré au hasard).
+    # -------------------------------------------------------------------
+
+    def __init__(self, nom, connexion, jeton=None):
+        self.jeton = jeton if jeton is not None else secrets.token_bytes(TAILLE_JETON)
+        self.nom = nom
+        self.connexion = connexion
+        self.partie = None  # Partie où le joueur est assis
+        self.chat = None  # Membre de chat (utils.Chat), une fois la connexion de chat ouverte
+
+
+class Salon:
+    # -------------------------------------------------------------------
+    # Registre des parties du serveur, salon d'attente et appariement.
+    #
+    # Chaque partie reçoit un identifiant stable à sa création : c'est ce
+    # numéro que les joueurs voient dans la liste et choisissent pour
+    # rejoindre une partie, il ne change pas quand d'autres parties sont
+    # retirées. Deux index secondaires donnent en O(1) les parties
+    # ouvertes (qu'on peut encore rejoindre) et les parties en cours.
+    #
+    # Une partie démarre dès que sa dernière place est prise : l'arrivée
+    # d'un joueur est l'événement qui la complète, sans thread ni boucle
+    # d'attente par partie. Les joueurs déjà assis ne sont prévenus
+    # (message ATTENTE) que lorsque le nombre de places libres change.
+    #
+    # L'appariement automatique regroupe les joueurs par taille de table :
+    # pour chaque taille, une seule partie est en formation à la fois, et
+    # un joueur y est placé en O(1).
+    #
+    # Les parties terminées ou abandonnées sont retirées par recolter(),
+    # appelée périodiquement par le serveur, avec les sessions de leurs
+    # joueurs.
+    #
+    # Les opérations sont protégées par un verrou : le salon est partagé
+    # par les threads des joueurs en mode threadé (le verrou n'est jamais
+    # disputé en mode asyncio).
+    #
+    # :param fabrique_partie: Fonction (nom, connexion, nombre de joueurs)
+    #                         -> nouvelle Partie, qui porte sa salle de chat.
+    # -------------------------------------------------------------------
+
+    def __init__(self, fabrique_partie):
+        self.fabrique_partie = fabrique_partie
+        self.parties = {}  # Identifiant -> partie, dans l'ordre de création
+        self.ouvertes = {}  # Identifiant -> partie qu'on peut encore rejoindre
+        self.en_cours = {}  # Identifiant -> partie démarrée
+        self.en_formation = {}  # Nombre de joueurs -> partie d'appariement en formation
+        self.sessions = {}  # Jeton -> session
+        self.identifiants = itertools.count(1)
+        self.verrou = threading.Lock()
+
+    def ouvrir_session(self, nom, connexion):
+        session = Session(nom, connexion)
+        with self.verrou:
+            self.sessions[session.jeton] = session
+        return session
+
+    def session(self, jeton):
+        with self.verrou:
+            return self.sessions.get(jeton)
+
+    def reprendre(self, jeton, connexion):
+        # -------------------------------------------------------------------
+        # Rend sa place au joueur d'une session, revenu sur une nouvelle
+        # connexion de jeu. Le nom d'un joueur étant unique à sa table (voir
+        # rejoindre et placer), la session désigne une seule place.
+        #
+        # La partie reprend la connexion hors du verrou : en mode
+        # multi-processus, elle la détache et la transmet au processus de
+        # jeu, ce qui peut attendre plusieurs secondes.
+        #
+        # :return: La session, ou None si le jeton est inconnu ou si le
+        #          joueur a perdu sa place.
+        # -------------------------------------------------------------------
+        with self.verrou:
+            session = self.sessions.get(jeton)
+            partie = session.partie if session is not None else None
+        if partie is None or not partie.reprendre(session.nom, connexion):
+            return None
+        with self.verrou:
+            session.connexion = connexion
+        return session
+
+    def rattacher_chat(self, session, membre):
+        # -------------------------------------------------------------------
+        # Associe la connexion de chat d'un joueur à sa session, et à la
+        # salle de sa partie s'il est déjà assis.
+        # -------------------------------------------------------------------
+        with self.verrou:
+            session.chat = membre
+            if session.partie is not None:
+                session.partie.chat.ajouter(membre)
+
+    def detacher_chat(self, session, membre):
+        with self.verrou:
+            if session.chat is membre:
+                session.chat = None
+            if session.partie is not None:
+                session.partie.chat.retirer(membre)
+
+    def _enregistrer(self, partie, session):
+        partie.identifiant = next(self.identifiants)
+        self.parties[partie.identifiant] = partie
+        self.ouvertes[partie.identifiant] = partie
+        self._installer(session, partie)
+
+    def _installer(self, session, partie):
+        session.partie = partie
+        partie.jetons[session.nom] = session.jeton
+        if session.chat is not None:
+            partie.chat.ajouter(session.chat)
+
+    def creer_partie(self, session, required_players):
+        # -------------------------------------------------------------------
+        # Crée une partie et y assoit son créateur.
+        #
+        # :return: La partie créée.
+        # -------------------------------------------------------------------
+        partie = self.fabrique_partie(session.nom, session.connexion, required_players)
+        with self.verrou:
+            self._enregistrer(partie, session)
+        partie.annoncer_places()
+        return partie
+
+    def rejoindre(self, identifiant, session):
+        # -------------------------------------------------------------------
+        # Assoit un joueur dans une partie ouverte.
+        #
+        # :param identifiant: Identifiant de la partie.
+        # :return: (True si le joueur est assis, la partie si elle est
+        #          désormais complète et doit être démarrée par l'appelant).
+        #          Un joueur du même nom déjà assis à la table fait refuser
+        #          la place (voir nom_pris).
+        # -------------------------------------------------------------------
+        with self.verrou:
+            partie = self.ouvertes.get(identifiant)
+            if partie is None or not partie.peut_rejoindre() or partie.a_joueur(session.nom):
+                return False, None
+            return True, self._asseoir(partie, session)
+
+    def nom_pris(self, identifiant, nom):
+        # :return: True si un joueur de ce nom est assis dans la partie ouverte.
+        with self.verrou:
+            partie = self.ouvertes.get(identifiant)
+            return partie is not None and partie.a_joueur(nom)
+
+    def placer(self, session, required_players):
+        # -------------------------------------------------------------------
+        # Place un joueur dans la partie en formation pour cette taille de
+        # table, ou en ouvre une nouvelle. Si un joueur du même nom y est
+        # déjà assis, la nouvelle partie est ouverte à côté : celle en
+        # formation le reste pour les joueurs suivants.
+        #
+        # :return: La partie si elle est désormais complète (à démarrer par
+        #          l'appelant), sinon None.
+        # -------------------------------------------------------------------
+        with self.verrou:
+            partie = self.en_formation.get(required_players)
+            en_formation = partie is not None and partie.peut_rejoindre()
+            if en_formation and not partie.a_joueur(session.nom):
+                return self._asseoir(partie, session)
+            partie = self.fabrique_partie(session.nom, session.connexion, required_players)
+            self._enregistrer(partie, session)
+            if not en_formation:
+                self.en_formation[required_players] = partie
+        partie.annoncer_places()
+        return None
+
+    def _asseoir(self, partie, session):
+        partie.rejoindre_partie(session.nom, session.connexion)
+        self._installer(session, partie)
+        if partie.peut_rejoindre():
+            partie.annoncer_places()
+            return None
+        self._retirer_formation(partie)
+        del self.ouvertes[partie.identifiant]
+        self.en_cours[partie.identifiant] = partie
+        partie.game_started = True  # Plus personne ne peut la rejoindre
+        return partie
+
+    def _retirer_formation(self, partie):
+        if self.en_formation.get(partie.required_players) is partie:
+            del self.en_formation[partie.required_players]
+
+    def restaurer(self, partie, joueurs):
+        # -------------------------------------------------------------------
+        # Inscrit une partie recréée depuis le journal, et les sessions de
+        # ses joueurs avec leurs jetons d'origine : chacun retrouve sa place
+        # en présentant son jeton (voir reprendre).
+        #
+        # :param joueurs: [(nom, jeton)] de la partie.
+        # -------------------------------------------------------------------
+        with self.verrou:
+            self.parties[partie.identifiant] = partie
+            self.en_cours[partie.identifiant] = partie
+            for player, (nom, jeton) in zip(partie.players, joueurs):
+                session = Session(nom, player['connexion'], jeton)
+                session.partie = partie
+                self.sessions[jeton] = session
+
+    def reserver_identifiants(self, dernier):
+        # Les nouvelles parties sont numérotées après celles du journal.
+        self.identifiants = itertools.count(dernier + 1)
+
+    def observer(self, identifiant, connexion):
+        # -------------------------------------------------------------------
+        # Ajoute un spectateur à une partie, sans lui donner de place.
+        #
+        # :return: True si la partie existe et peut être regardée.
+        # -------------------------------------------------------------------
+        with self.verrou:
+            partie = self.parties.get(identifiant)
+            if partie is None or not partie.peut_observer():
+                return False
+            partie.observer(connexion)
+            return True
+
+    def resumes(self):
+        # -------------------------------------------------------------------
+        # :return: Les résumés des parties, numérotés par leur identifiant :
+        #          celles qu'on peut rejoindre d'abord, TAILLE_LISTE au plus.
+        # -------------------------------------------------------------------
+        with self.verrou:
+            parties = itertools.chain(self.ouvertes.values(), self.en_cours.values())
+            return [partie.resume() for partie in itertools.islice(parties, TAILLE_LISTE)]
+
+    def compter(self):
+        # -------------------------------------------------------------------
+        # :return: Nombre de parties par état, pour les mesures du serveur
+        #          (utils.Mesures).
+        # -------------------------------------------------------------------
+        with self.verrou:
+            terminees = sum(partie.est_terminee() for partie in self.en_cours.values())
+            return {'en_attente': len(self.ouvertes), 'en_cours': len(self.en_cours) - terminees,
+                    'terminee': terminees}
+
+    def recolter(self):
+        # -------------------------------------------------------------------
+        # Retire les parties terminées et celles que tous les joueurs ont
+        # quittées, et ferme les connexions qui y restent. Les joueurs
+        # partis d'une partie en attente libèrent leur place. Les sessions
+        # des parties retirées, et celles des joueurs partis avant d'être
+        # assis, sont oubliées.
+        #
+        # :return: Les parties retirées.
+        # -------------------------------------------------------------------
+        with self.verrou:
+            for partie in self.ouvertes.values():
+                partie.retirer_deconnectes()
+            retirees = [partie for partie in self.parties.values()
+                        if partie.est_terminee() or partie.est_abandonnee()]
+            for partie in retirees:
+                del self.parties[partie.identifiant]
+                self.ouvertes.pop(partie.identifiant, None)
+                self.en_cours.pop(partie.identifiant, None)
+                self._retirer_formation(partie)
+            oubliees = [session for session in self.sessions.values()
+                        if (session.partie is None and session.connexion.est_fermee())
+                        or (session.partie is not None and session.partie.identifiant not in self.parties)]
+            for session in oubliees:
+                del self.sessions[session.jeton]
+        for partie in retirees:
+            partie.fermer()
+        for session in oubliees:
+            if session.chat is not None:
+                session.chat.fermer()
+        return retirees
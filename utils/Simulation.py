@@ -0,0 +1,230 @@
+import argparse
+import os
+import random
+import time
+from collections import Counter
+from multiprocessing import Pool
+from typing import Optional
+
+from utils.CalculateurDeScore import CalculateurDeScore, FIGURES
+from utils.Conseiller import Conseiller
+from utils.FeuilleScore import FeuilleScore
+from utils.Solveur import TablePolitique
+from utils.Tableau import Tableau
+
+# -------------------------------------------------------------------
+# Simulation de parties complètes sans réseau, pour comparer des
+# stratégies de jeu sur un grand nombre de parties.
+#
+# Les parties suivent les règles de FeuilleScore et CalculateurDeScore
+# (13 tours, deux relances par tour, bonus de la section supérieure).
+# Le travail est découpé en lots répartis sur un pool de processus ;
+# chaque lot a son propre générateur aléatoire, dérivé de la graine
+# globale et du numéro du lot, ce qui rend les résultats reproductibles
+# quel que soit le nombre de processus.
+# -------------------------------------------------------------------
+
+FACES = range(1, 7)
+POURCENTILES = (5, 25, 50, 75, 95)
+
+
+class StrategieGloutonne:
+    # -------------------------------------------------------------------
+    # Garde les dés de la valeur la plus fréquente (la plus haute en cas
+    # d'égalité) et remplit la figure au meilleur score théorique, comme
+    # le joueur qui lit la colonne « Score théorique » d'afficher_score.
+    # -------------------------------------------------------------------
+
+    def garder(self, des: list[int], relances_restantes: int, feuille) -> int:
+        comptes = Counter(des)
+        valeur = max(comptes, key=lambda face: (comptes[face], face))
+        return sum(1 << i for i, de in enumerate(des) if de == valeur)
+
+    def choisir_figure(self, des: list[int], feuille) -> str:
+        scores = CalculateurDeScore.scores_for(des)
+        ouvertes = [position for position in range(len(FIGURES)) if not feuille.masque >> position & 1]
+        return FIGURES[max(ouvertes, key=scores.__getitem__)]
+
+
+class StrategieEsperance:
+    # -------------------------------------------------------------------
+    # Suit les conseils du Conseiller : stratégie optimale si la table de
+    # politique est disponible, meilleure espérance du tour sinon.
+    # -------------------------------------------------------------------
+
+    def __init__(self, chemin_politique: Optional[str] = None):
+        politique = TablePolitique.ouvrir(chemin_politique) if chemin_politique else None
+        self.conseiller = Conseiller(politique)
+
+    def garder(self, des: list[int], relances_restantes: int, feuille) -> int:
+        return self.conseiller.conseiller(des, relances_restantes, feuille)[0]
+
+    def choisir_figure(self, des: list[int], feuille) -> str:
+        return self.conseiller.conseil_figure(des, feuille)
+
+
+STRATEGIES = {
+    'glouton': StrategieGloutonne,
+    'esperance': StrategieEsperance,
+}
+
+
+def jouer_partie(strategie, generateur: random.Random) -> FeuilleScore:
+    # -------------------------------------------------------------------
+    # Joue une partie solitaire complète de 13 tours.
+    #
+    # :param strategie: Objet fournissant garder() et choisir_figure().
+    # :param generateur: Générateur aléatoire utilisé pour les dés.
+    # :return: La feuille de score remplie.
+    # -------------------------------------------------------------------
+    feuille = FeuilleScore(verbeux=False)
+    for _ in range(len(FIGURES)):
+        des = generateur.choices(FACES, k=5)
+        for relances_restantes in (2, 1):
+            masque = strategie.garder(des, relances_restantes, feuille)
+            if masque == 0b11111:
+                break
+            for i in range(5):
+                if not masque >> i & 1:
+                    des[i] = generateur.choice(FACES)
+        figure = strategie.choisir_figure(des, feuille)
+        feuille.noter_score(figure, CalculateurDeScore.score(figure, des))
+    return feuille
+
+
+def _simuler_lot(nom_strategie: str, nb_parties: int, graine: int, indice_lot: int,
+                 chemin_politique: Optional[str]) -> tuple[str, Counter, list[int], int]:
+    # -------------------------------------------------------------------
+    # Simule un lot de parties dans un processus du pool.
+    #
+    # :return: (stratégie, histogramme des totaux, nombre de parties où
+    #          chaque figure a rapporté des points, nombre de bonus).
+    # -------------------------------------------------------------------
+    generateur = random.Random(f"{graine}:{nom_strategie}:{indice_lot}")
+    classe = STRATEGIES[nom_strategie]
+    strategie = classe(chemin_politique) if classe is StrategieEsperance else classe()
+
+    totaux = Counter()
+    reussites = [0] * len(FIGURES)
+    bonus = 0
+    for _ in range(nb_parties):
+        feuille = jouer_partie(strategie, generateur)
+        totaux[feuille.total] += 1
+        for position, valeur in enumerate(feuille.valeurs):
+            if valeur:
+                reussites[position] += 1
+        if feuille.bonus:
+            bonus += 1
+    return nom_strategie, totaux, reussites, bonus
+
+
+def _lancer_lot(arguments):
+    return _simuler_lot(*arguments)
+
+
+class Rapport:
+    # -------------------------------------------------------------------
+    # Résultats agrégés d'une stratégie : distribution des scores totaux,
+    # parties où chaque figure a rapporté des points et bonus obtenus.
+    # -------------------------------------------------------------------
+
+    def __init__(self, strategie: str):
+        self.strategie = strategie
+        self.totaux = Counter()
+        self.reussites = [0] * len(FIGURES)
+        self.bonus = 0
+
+    @property
+    def nb_parties(self) -> int:
+        return sum(self.totaux.values())
+
+    def fusionner(self, totaux: Counter, reussites: list[int], bonus: int) -> None:
+        self.totaux.update(totaux)
+        self.reussites = [a + b for a, b in zip(self.reussites, reussites)]
+        self.bonus += bonus
+
+    def moyenne(self) -> float:
+        return sum(total * nombre for total, nombre in self.totaux.items()) / self.nb_parties
+
+    def pourcentile(self, p: float) -> int:
+        # Plus petit score tel qu'au moins p % des parties font moins ou autant.
+        seuil = p / 100 * self.nb_parties
+        cumul = 0
+        for total in sorted(self.totaux):
+            cumul += self.totaux[total]
+            if cumul >= seuil:
+                return total
+        return max(self.totaux)
+
+    def taux_reussite(self) -> dict[str, float]:
+        return {figure: nombre / self.nb_parties for figure, nombre in zip(FIGURES, self.reussites)}
+
+
+def evaluer_strategies(strategies, nb_parties: int, processus: Optional[int] = None, graine: int = 0,
+                       taille_lot: int = 500, chemin_politique: Optional[str] = None):
+    # -------------------------------------------------------------------
+    # Simule nb_parties parties pour chaque stratégie sur un pool de processus.
+    #
+    # :param strategies: Noms de stratégies (clés de STRATEGIES).
+    # :param nb_parties: Nombre de parties par stratégie.
+    # :param processus: Nombre de processus (par défaut, un par cœur).
+    # :param graine: Graine globale dont dérive chaque lot.
+    # :param taille_lot: Nombre de parties par lot envoyé à un processus.
+    # :param chemin_politique: Table de stratégie pour 'esperance' (optionnelle).
+    # :return: (dictionnaire stratégie -> Rapport, parties par seconde).
+    # :raises ValueError: Si une stratégie est inconnue, ou si nb_parties
+    #                     ou taille_lot n'est pas strictement positif.
+    # -------------------------------------------------------------------
+    if nb_parties <= 0:
+        raise ValueError(f"Nombre de parties invalide : {nb_parties}")
+    if taille_lot <= 0:
+        raise ValueError(f"Taille de lot invalide : {taille_lot}")
+    for nom in strategies:
+        if nom not in STRATEGIES:
+            raise ValueError(f"Stratégie inconnue : {nom}")
+
+    lots = []
+    for nom in strategies:
+        for indice_lot, debut in enumerate(range(0, nb_parties, taille_lot)):
+            lots.append((nom, min(taille_lot, nb_parties - debut), graine, indice_lot, chemin_politique))
+
+    rapports = {nom: Rapport(nom) for nom in strategies}
+    debut = time.perf_counter()
+    with Pool(processus or os.cpu_count()) as pool:
+        for nom, totaux, reussites, bonus in pool.imap_unordered(_lancer_lot, lots):
+            rapports[nom].fusionner(totaux, reussites, bonus)
+    duree = time.perf_counter() - debut
+    return rapports, nb_parties * len(strategies) / duree
+
+
+def afficher_rapports(rapports: dict, parties_par_seconde: float) -> str:
+    # -------------------------------------------------------------------
+    # Met en forme les résultats de plusieurs stratégies côte à côte.
+    # -------------------------------------------------------------------
+    noms = list(rapports)
+    lignes = [("Parties", *(rapports[nom].nb_parties for nom in noms)),
+              ("Moyenne", *(f"{rapports[nom].moyenne():.2f}" for nom in noms))]
+    for p in POURCENTILES:
+        lignes.append((f"Pourcentile {p}", *(rapports[nom].pourcentile(p) for nom in noms)))
+    lignes.append(("Bonus supérieur", *(f"{rapports[nom].bonus / rapports[nom].nb_parties:.1%}" for nom in noms)))
+    for figure in FIGURES:
+        lignes.append((f"Réussite {figure}", *(f"{rapports[nom].taux_reussite()[figure]:.1%}" for nom in noms)))
+
+    tableau = Tableau(headers=["Statistique", *noms], data=lignes)
+    return f"{tableau.afficher()}\nDébit : {parties_par_seconde:.0f} parties/s"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare des stratégies de Yahtzee par simulation.")
+    parser.add_argument('--parties', type=int, default=10000, help="Parties simulées par stratégie")
+    parser.add_argument('--processus', type=int, default=None, help="Nombre de processus (défaut : un par cœur)")
+    parser.add_argument('--graine', type=int, default=0, help="Graine aléatoire globale")
+    parser.add_argument('--strategies', nargs='+', default=list(STRATEGIES), choices=list(STRATEGIES))
+    parser.add_argument('--politique', default=None, help="Table de stratégie pour 'esperance'")
+    arguments = parser.parse_args()
+    if arguments.parties <= 0:
+        parser.error("--parties doit être strictement positif")
+
+    resultats, debit = evaluer_strategies(arguments.strategies, arguments.parties, arguments.processus,
+                                          arguments.graine, chemin_politique=arguments.politique)
+    print(afficher_rapports(resultats, debit))
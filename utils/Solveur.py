@@ -0,0 +1,266 @@
+import mmap
+import struct
+import sys
+import time
+from array import array
+from itertools import combinations_with_replacement
+from math import factorial
+
+from utils.CalculateurDeScore import FIGURES, LANCERS, TABLE_SCORES
+
+# -------------------------------------------------------------------
+# Solveur de Yahtzee solitaire (stratégie optimale en espérance).
+#
+# Un état de la partie entre deux tours est entièrement décrit par :
+# - le masque des figures déjà remplies (13 bits, bit i = FIGURES[i]) ;
+# - le total de la section supérieure, plafonné à 63 (seul le passage
+#   du seuil compte pour le bonus de 35 points).
+#
+# Le solveur calcule, par récurrence arrière sur le nombre de figures
+# remplies, l'espérance du score restant à marquer depuis chaque état
+# atteignable, puis l'écrit dans un fichier binaire compact (float32).
+# Le serveur projette ce fichier en mémoire (mmap) : toutes les
+# instances le partagent sans copie et chaque état se lit en O(1).
+# -------------------------------------------------------------------
+
+NB_FIGURES = len(FIGURES)
+NB_MASQUES = 1 << NB_FIGURES
+PLAFOND_SUPERIEUR = 63
+BONUS_SUPERIEUR = 35
+NB_TOTAUX = PLAFOND_SUPERIEUR + 1
+MASQUE_COMPLET = NB_MASQUES - 1
+
+# Format du fichier : magie, version, nombre de totaux, nombre de masques.
+ENTETE = struct.Struct('<4sHHI')
+MAGIE = b'YZEV'
+VERSION = 1
+CHEMIN_PAR_DEFAUT = 'politique_yahtzee.bin'
+
+
+# -------------------------------------------------------------------
+# Combinatoire des lancers et des dés gardés.
+#
+# - GARDES : les 462 multi-ensembles de 0 à 5 dés pouvant être gardés.
+# - RESULTATS_GARDE[g] : lancers obtenus (indice, probabilité) en
+#   relançant les dés non gardés de GARDES[g].
+# - SOUS_GARDES[r] : gardes distinctes possibles depuis le lancer r.
+# -------------------------------------------------------------------
+
+def _probabilite(des: tuple[int, ...]) -> float:
+    # -------------------------------------------------------------------
+    # Probabilité d'obtenir ces valeurs (sans ordre) en lançant len(des) dés.
+    # -------------------------------------------------------------------
+    permutations = factorial(len(des))
+    for face in set(des):
+        permutations //= factorial(des.count(face))
+    return permutations / 6 ** len(des)
+
+
+GARDES = [garde for taille in range(6) for garde in combinations_with_replacement(range(1, 7), taille)]
+INDEX_GARDE = {garde: indice for indice, garde in enumerate(GARDES)}
+_INDEX_LANCER = {lancer: indice for indice, lancer in enumerate(LANCERS)}
+
+RESULTATS_GARDE = [
+    [
+        (_INDEX_LANCER[tuple(sorted(garde + relance))], _probabilite(relance))
+        for relance in combinations_with_replacement(range(1, 7), 5 - len(garde))
+    ]
+    for garde in GARDES
+]
+PROBABILITES_LANCER = [0.0] * len(LANCERS)
+for _indice, _probabilite_lancer in RESULTATS_GARDE[INDEX_GARDE[()]]:
+    PROBABILITES_LANCER[_indice] = _probabilite_lancer
+
+SOUS_GARDES = [
+    sorted({INDEX_GARDE[tuple(lancer[i] for i in range(5) if choix >> i & 1)] for choix in range(32)})
+    for lancer in LANCERS
+]
+
+
+def _totaux_atteignables() -> list[list[int]]:
+    # -------------------------------------------------------------------
+    # Pour chaque masque de la section supérieure (6 bits), liste des
+    # totaux plafonnés qu'il est possible d'avoir atteints.
+    # -------------------------------------------------------------------
+    totaux = [set() for _ in range(64)]
+    totaux[0].add(0)
+    for masque in range(1, 64):
+        face = masque.bit_length()  # Figure supérieure la plus haute du masque
+        for total in totaux[masque & ~(1 << (face - 1))]:
+            for nombre in range(6):
+                totaux[masque].add(min(PLAFOND_SUPERIEUR, total + nombre * face))
+    return [sorted(ensemble) for ensemble in totaux]
+
+
+TOTAUX_ATTEIGNABLES = _totaux_atteignables()
+
+
+def etat_feuille(feuille) -> tuple[int, int]:
+    # -------------------------------------------------------------------
+    # Convertit une feuille de score en état du solveur.
+    #
+    # :param feuille: FeuilleScore du joueur.
+    # :return: (masque des figures remplies, total supérieur plafonné).
+    # -------------------------------------------------------------------
+    return feuille.masque, min(feuille.total_superieur, PLAFOND_SUPERIEUR)
+
+
+def _gain_figure(masque: int, total_sup: int, position: int, valeur_etat) -> list[float]:
+    # -------------------------------------------------------------------
+    # Valeur de la fin de partie pour chacun des 252 lancers si l'on
+    # remplit la figure `position` : score de la figure, bonus éventuel
+    # et espérance de l'état suivant.
+    # -------------------------------------------------------------------
+    suivant = masque | 1 << position
+    if position >= 6:
+        futur = valeur_etat(suivant, total_sup)
+        return [scores[position] + futur for scores in TABLE_SCORES]
+
+    # Section supérieure : le score vaut (nombre de dés) x face, 6 cas.
+    face = position + 1
+    par_nombre = []
+    for nombre in range(6):
+        total = total_sup + nombre * face
+        bonus = BONUS_SUPERIEUR if total_sup < PLAFOND_SUPERIEUR <= total else 0
+        par_nombre.append(nombre * face + bonus + valeur_etat(suivant, min(total, PLAFOND_SUPERIEUR)))
+    return [par_nombre[scores[position] // face] for scores in TABLE_SCORES]
+
+
+def evaluer_tour(masque: int, total_sup: int, valeur_etat):
+    # -------------------------------------------------------------------
+    # Évalue un tour complet (trois lancers) depuis un état donné.
+    #
+    # :param masque: Masque des figures déjà remplies.
+    # :param total_sup: Total plafonné de la section supérieure.
+    # :param valeur_etat: Fonction (masque, total) -> espérance du reste.
+    # :return: (valeur du tour, [valeurs des lancers par relances restantes
+    #          0, 1, 2], [valeurs des gardes avec 0 puis 1 relance après],
+    #          figure optimale pour chaque lancer final).
+    # -------------------------------------------------------------------
+    gains = [(position, _gain_figure(masque, total_sup, position, valeur_etat))
+             for position in range(NB_FIGURES) if not masque >> position & 1]
+
+    # Dernier lancer : on choisit la meilleure figure disponible.
+    finale = []
+    choix_figures = []
+    for indice in range(len(LANCERS)):
+        meilleure_position, meilleure_valeur = max(
+            ((position, valeurs[indice]) for position, valeurs in gains), key=lambda choix: choix[1])
+        finale.append(meilleure_valeur)
+        choix_figures.append(meilleure_position)
+
+    valeurs_lancers = [finale]
+    valeurs_gardes = []
+    for _ in range(2):
+        precedente = valeurs_lancers[-1]
+        gardes = [sum(probabilite * precedente[resultat] for resultat, probabilite in resultats)
+                  for resultats in RESULTATS_GARDE]
+        valeurs_gardes.append(gardes)
+        valeurs_lancers.append([max(gardes[garde] for garde in SOUS_GARDES[indice])
+                                for indice in range(len(LANCERS))])
+
+    valeur = sum(probabilite * valeur_lancer
+                 for probabilite, valeur_lancer in zip(PROBABILITES_LANCER, valeurs_lancers[-1]))
+    return valeur, valeurs_lancers, valeurs_gardes, choix_figures
+
+
+class Solveur:
+    # -------------------------------------------------------------------
+    # Calcule la table des espérances de tous les états atteignables.
+    #
+    # Attributs :
+    # - valeurs : Tableau float32 indexé par masque * NB_TOTAUX + total.
+    # -------------------------------------------------------------------
+
+    def __init__(self):
+        self.valeurs = array('f', bytes(4 * NB_MASQUES * NB_TOTAUX))
+
+    def valeur(self, masque: int, total_sup: int) -> float:
+        return self.valeurs[masque * NB_TOTAUX + total_sup]
+
+    def construire(self, verbeux: bool = False) -> None:
+        # -------------------------------------------------------------------
+        # Remplit la table par récurrence arrière : les états ayant le plus
+        # de figures remplies sont calculés en premier (l'état complet vaut 0).
+        #
+        # :param verbeux: Affiche l'avancement couche par couche.
+        # -------------------------------------------------------------------
+        couches = [[] for _ in range(NB_FIGURES + 1)]
+        for masque in range(NB_MASQUES):
+            couches[bin(masque).count('1')].append(masque)
+
+        debut = time.perf_counter()
+        for nombre_remplies in range(NB_FIGURES - 1, -1, -1):
+            for masque in couches[nombre_remplies]:
+                for total_sup in TOTAUX_ATTEIGNABLES[masque & 0b111111]:
+                    self.valeurs[masque * NB_TOTAUX + total_sup] = evaluer_tour(
+                        masque, total_sup, self.valeur)[0]
+            if verbeux:
+                print(f"Couche {nombre_remplies} calculée ({time.perf_counter() - debut:.0f} s)")
+
+    def sauvegarder(self, chemin: str = CHEMIN_PAR_DEFAUT) -> None:
+        # -------------------------------------------------------------------
+        # Écrit la table dans un fichier binaire (en-tête + float32 little-endian).
+        #
+        # :param chemin: Chemin du fichier à écrire.
+        # -------------------------------------------------------------------
+        valeurs = array('f', self.valeurs)
+        if sys.byteorder != 'little':
+            valeurs.byteswap()
+        with open(chemin, 'wb') as fichier:
+            fichier.write(ENTETE.pack(MAGIE, VERSION, NB_TOTAUX, NB_MASQUES))
+            valeurs.tofile(fichier)
+
+
+class TablePolitique:
+    # -------------------------------------------------------------------
+    # Table des espérances projetée en mémoire, en lecture seule.
+    #
+    # Le fichier n'est jamais copié : les pages sont partagées par tous les
+    # processus qui l'ouvrent. Les conseils (dés à garder, figure à remplir)
+    # en sont déduits par utils.Conseiller.
+    # -------------------------------------------------------------------
+
+    def __init__(self, chemin: str = CHEMIN_PAR_DEFAUT):
+        with open(chemin, 'rb') as fichier:
+            self._mmap = mmap.mmap(fichier.fileno(), 0, access=mmap.ACCESS_READ)
+        magie, version, nb_totaux, nb_masques = ENTETE.unpack_from(self._mmap)
+        if (magie, version, nb_totaux, nb_masques) != (MAGIE, VERSION, NB_TOTAUX, NB_MASQUES):
+            self._mmap.close()
+            raise ValueError(f"Fichier de politique invalide : {chemin}")
+        if len(self._mmap) != ENTETE.size + 4 * NB_MASQUES * NB_TOTAUX or sys.byteorder != 'little':
+            self._mmap.close()
+            raise ValueError(f"Fichier de politique incompatible : {chemin}")
+        self._valeurs = memoryview(self._mmap)[ENTETE.size:].cast('f')
+
+    @staticmethod
+    def ouvrir(chemin: str = CHEMIN_PAR_DEFAUT):
+        # -------------------------------------------------------------------
+        # Ouvre la table si le fichier existe.
+        #
+        # :return: La table, ou None si le fichier est absent.
+        # -------------------------------------------------------------------
+        try:
+            return TablePolitique(chemin)
+        except FileNotFoundError:
+            return None
+
+    def valeur(self, masque: int, total_sup: int) -> float:
+        # -------------------------------------------------------------------
+        # Espérance du score restant à marquer depuis un état (lecture O(1)).
+        # -------------------------------------------------------------------
+        if masque == MASQUE_COMPLET:
+            return 0.0
+        return self._valeurs[masque * NB_TOTAUX + min(total_sup, PLAFOND_SUPERIEUR)]
+
+    def fermer(self) -> None:
+        self._valeurs.release()
+        self._mmap.close()
+
+
+if __name__ == "__main__":
+    chemin = sys.argv[1] if len(sys.argv) > 1 else CHEMIN_PAR_DEFAUT
+    solveur = Solveur()
+    solveur.construire(verbeux=True)
+    solveur.sauvegarder(chemin)
+    print(f"Table écrite dans {chemin} (espérance initiale : {solveur.valeur(0, 0):.2f} points)")
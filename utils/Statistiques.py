@@ -0,0 +1,175 @@
+import queue
+import sqlite3
+import sys
+import threading
+
+from utils.CalculateurDeScore import INDEX_FIGURE
+from utils.Tableau import Tableau
+
+# -------------------------------------------------------------------
+# Statistiques des joueurs et classement général, dans une base SQLite.
+#
+# Une ligne par joueur tient ses agrégats (parties, victoires, somme et
+# meilleur des scores, Yahtzee, bonus de la section supérieure), mis à
+# jour à chaque fin de partie par une seule requête (upsert) : aucune
+# requête ne parcourt l'historique des parties. Les classements (meilleur
+# score, victoires) sont lus sur des index, en O(log n) par joueur
+# affiché, quel que soit le nombre de parties enregistrées.
+#
+# La fin d'une partie n'attend jamais le disque : les résultats sont
+# confiés à un thread rédacteur, qui enregistre tout ce qui s'est
+# accumulé en une seule transaction.
+# -------------------------------------------------------------------
+
+CHEMIN_PAR_DEFAUT = 'statistiques_yahtzee.db'
+TAILLE_CLASSEMENT = 10
+POINTS_YAHTZEE = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS joueurs (
+    nom TEXT PRIMARY KEY,
+    parties INTEGER NOT NULL,
+    victoires INTEGER NOT NULL,
+    points INTEGER NOT NULL,  -- Somme des scores, pour la moyenne
+    meilleur INTEGER NOT NULL,
+    yahtzees INTEGER NOT NULL,
+    bonus INTEGER NOT NULL  -- Parties terminées avec le bonus de la section supérieure
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS classement_meilleur ON joueurs (meilleur DESC, nom);
+CREATE INDEX IF NOT EXISTS classement_victoires ON joueurs (victoires DESC, nom);
+"""
+
+ENREGISTRER = """
+INSERT INTO joueurs VALUES (?, 1, ?, ?, ?, ?, ?)
+ON CONFLICT (nom) DO UPDATE SET
+    parties = parties + 1,
+    victoires = victoires + excluded.victoires,
+    points = points + excluded.points,
+    meilleur = max(meilleur, excluded.meilleur),
+    yahtzees = yahtzees + excluded.yahtzees,
+    bonus = bonus + excluded.bonus
+"""
+
+# Critère de classement -> colonne indexée.
+CRITERES = {'meilleur': 'meilleur', 'victoires': 'victoires'}
+
+COLONNES = ('nom', 'parties', 'victoires', 'moyenne', 'meilleur', 'yahtzees', 'taux_bonus')
+_SELECTION = ("SELECT nom, parties, victoires, CAST(points AS REAL) / parties, meilleur, yahtzees, "
+              "CAST(bonus AS REAL) / parties FROM joueurs")
+
+
+def resultats_partie(feuilles_scores):
+    # -------------------------------------------------------------------
+    # Résultats d'une partie terminée, à enregistrer.
+    #
+    # :param feuilles_scores: Nom -> FeuilleScore de chaque joueur.
+    # :return: [(nom, victoire, score, meilleur score, Yahtzee, bonus)],
+    #          dans l'ordre des colonnes de la table (victoire, Yahtzee et
+    #          bonus valent 0 ou 1 ; les ex aequo gagnent tous).
+    # -------------------------------------------------------------------
+    gagnant = max((feuille.total for feuille in feuilles_scores.values()), default=0)
+    position_yahtzee = INDEX_FIGURE['Yahtzee']
+    return [(nom, int(feuille.total == gagnant), feuille.total, feuille.total,
+             int(feuille.masque >> position_yahtzee & 1 and feuille.valeurs[position_yahtzee] == POINTS_YAHTZEE),
+             int(feuille.bonus > 0))
+            for nom, feuille in feuilles_scores.items()]
+
+
+class Statistiques:
+    # -------------------------------------------------------------------
+    # Base des statistiques d'un serveur.
+    #
+    # Le thread rédacteur a sa propre connexion ; les lectures passent par
+    # une connexion par thread lecteur. La base est en mode WAL : les
+    # lectures ne bloquent pas les écritures, et inversement.
+    #
+    # :param chemin: Fichier de la base (créé au besoin).
+    # -------------------------------------------------------------------
+
+    def __init__(self, chemin=CHEMIN_PAR_DEFAUT):
+        self.chemin = chemin
+        with self._connecter() as base:
+            base.execute("PRAGMA journal_mode = WAL")
+            base.executescript(SCHEMA)
+        self.lecteurs = threading.local()
+        self.file = queue.SimpleQueue()  # Résultats à enregistrer ; un Event demande d'attendre l'écriture
+        threading.Thread(target=self._ecrire, daemon=True).start()
+
+    def _connecter(self):
+        base = sqlite3.connect(self.chemin, timeout=30)
+        base.execute("PRAGMA synchronous = NORMAL")  # En mode WAL, une synchronisation par point de contrôle
+        return base
+
+    def enregistrer(self, resultats) -> None:
+        # -------------------------------------------------------------------
+        # Confie au rédacteur les résultats d'une partie, sans attendre.
+        #
+        # :param resultats: Résultats de la partie (voir resultats_partie).
+        # -------------------------------------------------------------------
+        self.file.put(resultats)
+
+    def vider(self, delai=None) -> bool:
+        # -------------------------------------------------------------------
+        # Attend que tous les résultats déjà confiés soient enregistrés.
+        #
+        # :return: False si le délai a expiré avant.
+        # -------------------------------------------------------------------
+        ecrit = threading.Event()
+        self.file.put(ecrit)
+        return ecrit.wait(delai)
+
+    def _ecrire(self):
+        base = self._connecter()
+        while True:
+            elements = [self.file.get()]
+            try:
+                while True:
+                    elements.append(self.file.get_nowait())
+            except queue.Empty:
+                pass
+            lignes = [ligne for element in elements if not isinstance(element, threading.Event) for ligne in element]
+            if lignes:
+                try:
+                    with base:  # Une transaction pour tout le lot
+                        base.executemany(ENREGISTRER, lignes)
+                except sqlite3.Error as erreur:
+                    print(f"Statistiques non enregistrées ({len(lignes)} résultats) : {erreur}")
+            for element in elements:
+                if isinstance(element, threading.Event):
+                    element.set()
+
+    def _lecteur(self):
+        base = getattr(self.lecteurs, 'base', None)
+        if base is None:
+            base = self.lecteurs.base = self._connecter()
+        return base
+
+    def joueur(self, nom):
+        # -------------------------------------------------------------------
+        # :return: Statistiques du joueur (dictionnaire indexé par COLONNES),
+        #          ou None s'il n'a terminé aucune partie.
+        # -------------------------------------------------------------------
+        ligne = self._lecteur().execute(_SELECTION + " WHERE nom = ?", (nom,)).fetchone()
+        return dict(zip(COLONNES, ligne)) if ligne is not None else None
+
+    def classement(self, taille=TAILLE_CLASSEMENT, critere='meilleur'):
+        # -------------------------------------------------------------------
+        # Meilleurs joueurs, lus dans l'ordre de l'index du critère.
+        #
+        # :param critere: 'meilleur' (meilleur score) ou 'victoires'.
+        # :return: Liste de tuples dans l'ordre de COLONNES.
+        # -------------------------------------------------------------------
+        colonne = CRITERES[critere]
+        return self._lecteur().execute(f"{_SELECTION} ORDER BY {colonne} DESC, nom LIMIT ?", (taille,)).fetchall()
+
+
+def rendre_classement_general(lignes) -> str:
+    return Tableau(["Joueur", "Parties", "Victoires", "Moyenne", "Meilleur", "Yahtzee", "Bonus"],
+                   [(nom, parties, victoires, f"{moyenne:.1f}", meilleur, yahtzees, f"{taux_bonus:.0%}")
+                    for nom, parties, victoires, moyenne, meilleur, yahtzees, taux_bonus in lignes]).afficher()
+
+
+if __name__ == "__main__":
+    chemin = sys.argv[1] if len(sys.argv) > 1 else CHEMIN_PAR_DEFAUT
+    critere = sys.argv[2] if len(sys.argv) > 2 else 'meilleur'
+    print(rendre_classement_general(Statistiques(chemin).classement(critere=critere)))
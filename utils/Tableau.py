@@ -1,3 +1,50 @@
+from functools import lru_cache
+
+
+class MiseEnPage:
+    # -------------------------------------------------------------------
+    # Mise en page à largeurs fixes d'un tableau console.
+    #
+    # Les lignes de séparation et d'en-têtes sont calculées une seule fois
+    # par forme de tableau ; chaque ligne de données rendue est mémorisée
+    # (cache LRU borné), de sorte que seules les cellules qui changent
+    # sont remises en forme d'un affichage à l'autre.
+    #
+    # Attributs :
+    # - headers : Liste des en-têtes du tableau.
+    # - largeurs : Largeur de chaque colonne (hors marges).
+    # -------------------------------------------------------------------
+
+    def __init__(self, headers, largeurs, taille_cache: int = 1024):
+        # -------------------------------------------------------------------
+        # :param headers: Liste des en-têtes du tableau.
+        # :param largeurs: Largeur minimale de chaque colonne ; elle est
+        #                  élargie si l'en-tête est plus long.
+        # :param taille_cache: Nombre de lignes rendues gardées en mémoire.
+        # -------------------------------------------------------------------
+        self.headers = headers
+        self.largeurs = [max(len(str(header)), largeur) for header, largeur in zip(headers, largeurs)]
+        self.separation = "+" + "+".join("-" * (largeur + 2) for largeur in self.largeurs) + "+"
+        self.entete = self._rendre_ligne(tuple(headers))
+        self.ligne = lru_cache(maxsize=taille_cache)(self._rendre_ligne)
+
+    def _rendre_ligne(self, row: tuple) -> str:
+        return "|" + "|".join(f" {str(cellule).ljust(largeur)} "
+                              for cellule, largeur in zip(row, self.largeurs)) + "|"
+
+    def afficher(self, data) -> str:
+        # -------------------------------------------------------------------
+        # Assemble le tableau à partir de ses lignes de données.
+        #
+        # :param data: Liste de tuples représentant les lignes du tableau.
+        # :return: Le tableau formaté.
+        # -------------------------------------------------------------------
+        tableau = [self.separation, self.entete, self.separation]
+        tableau.extend(self.ligne(tuple(row)) for row in data)
+        tableau.append(self.separation)
+        return "\n".join(tableau)
+
+
 class Tableau:
     # -------------------------------------------------------------------
     # Classe représentant un tableau affichable en console avec des en-têtes
@@ -26,23 +73,42 @@ class Tableau:
 
         # Calcul de la largeur maximale pour chaque colonne
         col_widths = [max(len(str(item)) for item in col) for col in zip(self.headers, *self.data)]
+        return MiseEnPage(self.headers, col_widths, taille_cache=0).afficher(self.data)
 
-        # Génération de la ligne de séparation (horizontale)
-        ligne_separation = "+".join("-" * (width + 2) for width in col_widths)
-
-        # Génération de la ligne contenant les en-têtes
-        ligne_headers = "|".join(f" {self.headers[i].ljust(col_widths[i])} " for i in range(len(self.headers)))
-
-        # Génération des lignes contenant les données
-        lignes_data = [
-            "|".join(f" {str(row[i]).ljust(col_widths[i])} " for i in range(len(row)))
-            for row in self.data
-        ]
-        tableau = []
-        tableau.append(f"+{ligne_separation}+")
-        tableau.append(f"|{ligne_headers}|")
-        tableau.append(f"+{ligne_separation}+")
-        for ligne in lignes_data:
-            tableau.append(f"|{ligne}|")
-        tableau.append(f"+{ligne_separation}+")
-        return "\n".join(tableau)
+
+# -------------------------------------------------------------------
+# Tableau des scores des joueurs (classement diffusé après chaque tour
+# et en fin de partie). L'en-tête est fixe et chaque ligne (nom, score)
+# déjà rendue est réutilisée.
+# -------------------------------------------------------------------
+_ENTETE_CLASSEMENT = f"{'Nom du joueur':<20}{'Score':<10}"
+_SEPARATION_CLASSEMENT = "-" * len(_ENTETE_CLASSEMENT)
+
+
+@lru_cache(maxsize=4096)
+def _ligne_classement(nom: str, score: int) -> str:
+    return f"{nom:<20}{score:<10}"
+
+
+def rendre_classement(scores: dict) -> str:
+    # -------------------------------------------------------------------
+    # Met en forme le tableau des scores des joueurs.
+    #
+    # :param scores: Dictionnaire nom du joueur -> score total.
+    # :return: Le tableau, entouré de sauts de ligne.
+    # -------------------------------------------------------------------
+    lignes = "\n".join(_ligne_classement(nom, score) for nom, score in scores.items())
+    return f"\n{_ENTETE_CLASSEMENT}\n{_SEPARATION_CLASSEMENT}\n{lignes}\n"
+
+
+def rendre_fin_partie(scores: dict) -> str:
+    # -------------------------------------------------------------------
+    # Met en forme le message de fin de partie : tableau final et gagnant.
+    #
+    # :param scores: Dictionnaire nom du joueur -> score total.
+    # :return: Le message final.
+    # -------------------------------------------------------------------
+    winner = max(scores, key=scores.get)
+    final_message = "La partie est terminée!\n\n" + rendre_classement(scores)
+    final_message += f"\nLe gagnant est {winner} avec un score de {scores[winner]} points! Félicitations!\n"
+    return final_message
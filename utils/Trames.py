@@ -0,0 +1,125 @@
+import asyncio
+import struct
+
+# -------------------------------------------------------------------
+# Découpage des échanges réseau en trames.
+#
+# Chaque message est précédé de sa longueur sur 4 octets (ordre réseau).
+# Un lecteur peut ainsi retrouver exactement les messages envoyés, qu'ils
+# arrivent fusionnés dans une même lecture ou coupés en plusieurs, et
+# plusieurs trames peuvent partir en une seule écriture.
+#
+# Ces fonctions sont communes au serveur (threadé et asyncio) et au client.
+# -------------------------------------------------------------------
+
+ENTETE = struct.Struct('!I')
+TAILLE_MAX = 1 << 20  # Une trame plus grande est considérée comme une erreur de protocole
+TAILLE_LECTURE = 65536
+
+
+def encoder_trame(donnees: bytes) -> bytes:
+    # -------------------------------------------------------------------
+    # Préfixe un message de sa longueur.
+    #
+    # :param donnees: Contenu du message.
+    # :return: La trame prête à être envoyée.
+    # -------------------------------------------------------------------
+    return ENTETE.pack(len(donnees)) + donnees
+
+
+def encoder_trames(*messages: bytes) -> bytes:
+    # -------------------------------------------------------------------
+    # Encode plusieurs messages en un seul tampon, pour les envoyer en
+    # une écriture.
+    # -------------------------------------------------------------------
+    return b"".join(encoder_trame(message) for message in messages)
+
+
+def envoyer_trames(socket, *messages: bytes) -> None:
+    # -------------------------------------------------------------------
+    # Envoie un ou plusieurs messages en une seule écriture.
+    #
+    # :param socket: Socket de destination.
+    # :param messages: Messages à envoyer, dans l'ordre.
+    # -------------------------------------------------------------------
+    socket.sendall(encoder_trames(*messages))
+
+
+class LecteurTrames:
+    # -------------------------------------------------------------------
+    # Lit des trames sur un socket bloquant.
+    #
+    # Les octets reçus sont accumulés dans un tampon : une lecture peut
+    # contenir plusieurs trames (gardées pour les appels suivants) ou
+    # seulement une partie d'une trame (complétée par les lectures suivantes).
+    #
+    # :param socket: Socket à lire.
+    # -------------------------------------------------------------------
+
+    def __init__(self, socket):
+        self.socket = socket
+        self.tampon = bytearray()
+
+    def extraire(self):
+        # -------------------------------------------------------------------
+        # Retire une trame complète du tampon, sans lire le socket.
+        #
+        # :return: Le contenu de la trame, ou None si elle est incomplète.
+        # :raises ConnectionResetError: Si la trame annoncée est trop longue.
+        # -------------------------------------------------------------------
+        if len(self.tampon) < ENTETE.size:
+            return None
+        (taille,) = ENTETE.unpack_from(self.tampon)
+        if taille > TAILLE_MAX:
+            raise ConnectionResetError(f"Trame trop longue ({taille} octets)")
+        fin = ENTETE.size + taille
+        if len(self.tampon) < fin:
+            return None
+        trame = bytes(self.tampon[ENTETE.size:fin])
+        del self.tampon[:fin]
+        return trame
+
+    def lire(self) -> bytes:
+        # -------------------------------------------------------------------
+        # Retourne la prochaine trame, en lisant le socket si nécessaire.
+        #
+        # :raises ConnectionResetError: Si le pair ferme la connexion.
+        # -------------------------------------------------------------------
+        while True:
+            trame = self.extraire()
+            if trame is not None:
+                return trame
+            self.remplir()
+
+    def remplir(self) -> None:
+        # -------------------------------------------------------------------
+        # Lit le socket une fois et ajoute les octets reçus au tampon.
+        #
+        # :raises ConnectionResetError: Si le pair ferme la connexion, ou si
+        #                               elle est rompue (pair injoignable).
+        # :raises BlockingIOError: Si un socket non bloquant n'a rien à lire.
+        # -------------------------------------------------------------------
+        try:
+            donnees = self.socket.recv(TAILLE_LECTURE)
+        except (ConnectionResetError, BlockingIOError):
+            raise
+        except OSError as erreur:
+            raise ConnectionResetError(f"Connexion rompue : {erreur}") from None
+        if not donnees:
+            raise ConnectionResetError("Connexion fermée par le pair")
+        self.tampon += donnees
+
+
+async def lire_trame_async(reader: asyncio.StreamReader) -> bytes:
+    # -------------------------------------------------------------------
+    # Lit la prochaine trame sur un flux asyncio.
+    #
+    # :raises ConnectionResetError: Si le pair ferme la connexion.
+    # -------------------------------------------------------------------
+    try:
+        (taille,) = ENTETE.unpack(await reader.readexactly(ENTETE.size))
+        if taille > TAILLE_MAX:
+            raise ConnectionResetError(f"Trame trop longue ({taille} octets)")
+        return await reader.readexactly(taille)
+    except asyncio.IncompleteReadError:
+        raise ConnectionResetError("Connexion fermée par le pair") from None